@@ -0,0 +1,40 @@
+import inspect
+import logging
+from typing import Any, Awaitable, Callable, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+StepCallback = Callable[[Any, Any, int], Union[None, Awaitable[None]]]
+
+
+def chain_step_callbacks(*callbacks: Optional[StepCallback]) -> Optional[Callable[[Any, Any, int], Awaitable[None]]]:
+    """
+    Combine several agent step callbacks into one.
+
+    browser_use agents accept a single `register_new_step_callback`, which they
+    await. Each chained callback is called in order and awaited if it returns
+    an awaitable, so both plain functions and coroutine functions can be
+    chained. A failing callback is logged without affecting the others or the
+    agent run.
+
+    Args:
+        *callbacks: Callbacks taking (state, model_output, step); None entries are skipped
+
+    Returns:
+        Optional[Callable[[Any, Any, int], Awaitable[None]]]: The combined coroutine callback,
+            or None if there is nothing to call
+    """
+    active = [callback for callback in callbacks if callback is not None]
+    if not active:
+        return None
+
+    async def on_step(state: Any, model_output: Any, step: int) -> None:
+        for callback in active:
+            try:
+                result = callback(state, model_output, step)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logger.error(f"Step callback {getattr(callback, '__qualname__', callback)} failed: {str(e)}", exc_info=True)
+
+    return on_step
@@ -1,10 +1,11 @@
-from langchain_anthropic import ChatAnthropic
 from browser_use.agent.service import Agent, Controller
 from browser_use.browser.browser import Browser, BrowserConfig
 from browser_use.browser.context import BrowserContextConfig
+import asyncio
+from contextlib import nullcontext
 import requests
-from fastapi import FastAPI, Request, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, Header, Request, HTTPException
+from fastapi.responses import FileResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, validator
 from typing import Optional, Dict, Any
@@ -16,31 +17,35 @@ import signal
 import logging
 from dotenv import load_dotenv
 
-# Configure logging with level from environment
-VALID_LOG_LEVELS = {
-    'DEBUG': logging.DEBUG,
-    'INFO': logging.INFO,
-    'WARNING': logging.WARNING,
-    'ERROR': logging.ERROR,
-    'CRITICAL': logging.CRITICAL
-}
+from agent_hooks import chain_step_callbacks
+from artifacts import new_run_id, run_dir
+from checkpoint import RunCheckpointer, build_resume_task, create_checkpoint_store
+from domain_scheduler import ContextPool, DomainLimit, DomainScheduler, parse_domain_limits
+from domains import extract_domains
+from fetch_cache import create_fetch_cache
+from health import BrowserWatchdog, HealthMonitor
+from history_spill import HistorySpiller
+from llm_router import build_router
+from logging_config import bind_task, configure_logging, describe_task, resolve_log_level, track_step
+from planner import run_planned
+from profiling import PROFILE_ARTIFACTS, TaskProfiler, parse_profile_header
+from recording import TaskRecorder, find_recording, is_segment_name
+from result_store import STATUS_SUCCEEDED, IdempotencyConflict, ResultStore, request_fingerprint
+from semantic_cache import create_semantic_cache
+from settings import Settings, SettingsManager
+from sinks import build_result_record, create_result_sinks
 
-# Get log level from environment or default to INFO
-log_level_name = os.getenv('LOG_LEVEL', 'INFO').upper()
-if log_level_name not in VALID_LOG_LEVELS:
-    print(f"Warning: Invalid LOG_LEVEL '{log_level_name}'. Defaulting to INFO.")
-    log_level = logging.INFO
-else:
-    log_level = VALID_LOG_LEVELS[log_level_name]
+# Configure logging with level from environment
+log_level_name, log_level = resolve_log_level(os.getenv('LOG_LEVEL', 'INFO'))
 
-# Configure logging with detailed format
-logging.basicConfig(
+# Log through a background queue: console text plus size-rotated JSON file
+log_listener = configure_logging(
+    'api',
+    'api.log',
     level=log_level,
-    format='%(asctime)s - %(levelname)s - [%(name)s:%(lineno)d] - %(message)s',
-    handlers=[
-        logging.StreamHandler(),  # Console handler
-        logging.FileHandler('api.log')  # File handler
-    ]
+    max_bytes=int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024)),
+    backup_count=int(os.getenv('LOG_BACKUP_COUNT', 5)),
+    debug_sample_rate=float(os.getenv('LOG_DEBUG_SAMPLE_RATE', 1.0))
 )
 logger = logging.getLogger(__name__)
 logger.info(f"Initializing Browser Agent API with log level: {log_level_name}")
@@ -66,12 +71,22 @@ logger.info("All required environment variables found")
 logger.info("Initializing core services")
 
 try:
+    # Load tuning settings: defaults, CONFIG_FILE, then environment; reloaded when the file changes
+    logger.info("Loading settings")
+    settings_manager = SettingsManager(
+        "api",
+        os.getenv("CONFIG_FILE") or None,
+        reload_interval=float(os.getenv("CONFIG_RELOAD_INTERVAL", 5))
+    )
+    startup_settings = settings_manager.settings
+    logger.info(f"Settings loaded{f' from {settings_manager.config_file}' if settings_manager.config_file else ''}")
+
     # Initialize browser with custom configuration
     logger.info("Setting up browser configuration")
     browser = Browser(
         config=BrowserConfig(
             disable_security=True,  # Required for certain automation tasks
-            headless=False,  # GUI mode for development
+            headless=startup_settings.headless,
             new_context_config=BrowserContextConfig(),
         )
     )
@@ -82,12 +97,18 @@ try:
     controller = Controller()
     logger.info("Controller initialized successfully")
 
-    # Initialize language model
-    logger.info("Setting up Claude language model")
-    llm = ChatAnthropic(
-        model='claude-3-5-sonnet-latest', 
-        api_key=os.getenv("ANTHROPIC_API_KEY")
+    # Initialize language model router (ordered fallback, hedging, per-provider limits)
+    logger.info("Setting up language model router")
+    llm_routes = startup_settings.llm_routes
+    llm_options = {} if startup_settings.llm_temperature is None else {"temperature": startup_settings.llm_temperature}
+    llm = build_router(
+        llm_routes,
+        cheap_route=startup_settings.llm_cheap_route,
+        max_concurrency=startup_settings.llm_max_concurrency,
+        hedge=startup_settings.llm_hedge,
+        **llm_options
     )
+    logger.info(f"LLM routes: {', '.join(llm_routes)}")
     logger.info("Language model initialized successfully")
 
     # Initialize Redis connection
@@ -98,6 +119,93 @@ try:
     redis_client.ping()
     logger.info("Redis connection established successfully")
 
+    # Configure task recordings
+    logger.info(f"Task recording format: {startup_settings.recording_format}")
+
+    # Initialize durable result store for idempotent submissions
+    logger.info("Setting up idempotency result store")
+    result_store = ResultStore(
+        redis_client,
+        result_ttl=startup_settings.idempotency_result_ttl,
+        pending_ttl=startup_settings.idempotency_pending_ttl
+    )
+    logger.info("Result store initialized successfully")
+
+    # Initialize checkpoint store for resuming interrupted runs
+    logger.info("Setting up checkpoint store")
+    checkpoint_store = create_checkpoint_store(
+        startup_settings.checkpoint_backend,
+        redis_client=redis_client,
+        directory=startup_settings.checkpoint_dir,
+        lease_ttl=startup_settings.checkpoint_lease_ttl
+    )
+    resumed_runs = set()
+    logger.info("Checkpoint store initialized successfully")
+
+    # Optional lookup of cached results for paraphrased tasks
+    semantic_cache = create_semantic_cache(
+        startup_settings.semantic_cache_enabled,
+        redis_client,
+        threshold=startup_settings.semantic_cache_threshold,
+        domains=startup_settings.semantic_cache_domains,
+        model=startup_settings.semantic_cache_model
+    )
+    if semantic_cache:
+        logger.info(f"Semantic cache enabled with threshold {semantic_cache.threshold}")
+
+    # Per-domain concurrency and rate limits shared by all workers
+    logger.info("Setting up domain scheduler")
+    domain_scheduler = DomainScheduler(
+        redis_client,
+        DomainLimit(
+            max_concurrency=startup_settings.domain_max_concurrency,
+            rate_per_minute=startup_settings.domain_rate_per_minute
+        ),
+        overrides=parse_domain_limits(startup_settings.domain_limits),
+        max_wait=startup_settings.domain_max_wait
+    )
+
+    # Optional HTTP response cache shared by all browser contexts on this host
+    fetch_cache = create_fetch_cache(
+        startup_settings.fetch_cache_enabled,
+        directory=startup_settings.fetch_cache_dir,
+        max_bytes=startup_settings.fetch_cache_max_bytes,
+        domain_ttls=startup_settings.fetch_cache_domain_ttls
+    )
+    if fetch_cache:
+        logger.info(f"Fetch cache enabled at {fetch_cache.directory}")
+
+    # Browser contexts kept warm (cookies, connections) for later tasks on the same domains
+    context_pool = ContextPool(
+        browser,
+        max_idle=startup_settings.context_pool_size,
+        idle_ttl=startup_settings.context_pool_idle_ttl,
+        on_new_context=fetch_cache.attach if fetch_cache else None
+    )
+    logger.info("Domain scheduler initialized successfully")
+
+    # Watchdog recycling a hung browser, and health reporting for /healthz and /readyz
+    browser_watchdog = BrowserWatchdog(
+        browser,
+        interval=startup_settings.browser_watchdog_interval,
+        probe_timeout=startup_settings.browser_probe_timeout,
+        failure_threshold=startup_settings.browser_failure_threshold,
+        page_failure_threshold=startup_settings.browser_page_failure_threshold,
+        is_context_busy=context_pool.is_leased,
+        on_recycle=context_pool.reset
+    )
+    health_monitor = HealthMonitor("api", redis_client, watchdog=browser_watchdog)
+
+    # Batched result delivery to files, databases, a postback URL or Ably (at-least-once)
+    result_sinks = create_result_sinks(
+        os.getenv("RESULT_SINKS", ""),
+        spool_dir=os.path.join(startup_settings.result_sink_spool_dir, "api"),
+        batch_size=startup_settings.result_sink_batch_size,
+        flush_interval=startup_settings.result_sink_flush_interval,
+    )
+    if result_sinks:
+        logger.info(f"Result sinks: {', '.join(writer.sink.name for writer in result_sinks.writers)}")
+
 except Exception as e:
     logger.error(f"Critical error during service initialization: {str(e)}", exc_info=True)
     sys.exit(1)
@@ -126,6 +234,10 @@ app.add_middleware(
 class TaskRequest(BaseModel):
     task: str
     postback_url: Optional[str] = None
+    planner: bool = False
+    profile: bool = False
+    profile_browser_trace: bool = False
+    settings: Optional[Dict[str, Any]] = None
 
     @validator('task')
     def validate_task(cls, v):
@@ -139,12 +251,101 @@ class TaskRequest(BaseModel):
             raise ValueError("Postback URL must start with http:// or https://")
         return v
 
-async def fetch_result(task: str) -> Dict[str, Any]:
+def store_cached_result(cache_key: str, result: str, ttl: int):
+    """Cache a task result for ttl seconds, logging rather than failing on Redis errors."""
+    if ttl <= 0:
+        return
+    try:
+        logger.debug("Attempting to cache result")
+        redis_client.setex(cache_key, ttl, json.dumps(result))
+        logger.info(f"Result cached successfully with TTL: {ttl} seconds")
+    except redis.RedisError as e:
+        logger.error(f"Redis error while setting cache: {str(e)}", exc_info=True)
+        logger.warning("Continuing without caching due to Redis error")
+
+def fetch_similar_cached_result(task: str):
+    """
+    Look up the cached result of a paraphrase of the task, if the semantic cache
+    is enabled for the task's domains.
+    
+    Returns:
+        Optional[Any]: The decoded cached result, or None
+    """
+    if not semantic_cache or not semantic_cache.enabled_for(task):
+        return None
+    match = semantic_cache.lookup(task)
+    if not match:
+        return None
+    similar_task, similarity = match
+    cached_result = redis_client.get(f"browseragent:cache:{similar_task}")
+    if not cached_result:
+        return None
+    logger.info(f"Similar cache hit for {describe_task(similar_task)} (similarity {similarity:.3f})")
+    return json.loads(cached_result)
+
+async def fetch_planned_result(task: str, task_id: str, cache_key: str, settings: Settings,
+                               checkpoint_meta: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Run a task in planner mode: split it into independent sub-tasks, run them in
+    parallel on separate browser contexts and merge their results.
+    
+    Every sub-task goes through fetch_result with its own task id, so it has its
+    own cache entry, step budget and recording. A sub-task's step budget is
+    planner_subtask_max_steps, lowered to the task's max_steps if that is
+    smaller, e.g. by a per-request override. Sub-tasks are not checkpointed:
+    a resumed sub-task would have no parent to deliver its result to. A task that
+    cannot be split runs as a normal run under the request's task id.
+    
+    Args:
+        task (str): The task description to process
+        task_id (str): Identifier of the request's run
+        cache_key (str): Cache key for the merged result
+        settings (Settings): Settings of the task, including its planner settings
+        checkpoint_meta (Optional[Dict[str, Any]]): Data needed to deliver the result after a resume
+        
+    Returns:
+        Dict[str, Any]: Merged result, cache status and per sub-task outcomes
+    """
+    subtask_max_steps = min(settings.planner_subtask_max_steps, settings.max_steps)
+
+    async def run_subtask(subtask: str) -> Dict[str, Any]:
+        return await fetch_result(subtask, new_run_id(), settings=settings, max_steps=subtask_max_steps,
+                                  checkpoint=False)
+
+    async def run_single(single_task: str) -> Dict[str, Any]:
+        return await fetch_result(single_task, task_id, checkpoint_meta, settings=settings)
+
+    planned = await run_planned(
+        task,
+        llm,
+        run_subtask,
+        run_single,
+        max_subtasks=settings.planner_max_subtasks,
+        max_parallel=settings.planner_max_parallel
+    )
+    if "subtasks" in planned:
+        store_cached_result(cache_key, planned["result"], settings.cache_ttl)
+    return {**planned, "cached": planned.get("cached", False)}
+
+async def fetch_result(task: str, task_id: str, checkpoint_meta: Optional[Dict[str, Any]] = None,
+                       resume_from: Optional[Dict[str, Any]] = None, planner: bool = False,
+                       settings: Optional[Settings] = None, max_steps: Optional[int] = None,
+                       checkpoint: bool = True) -> Dict[str, Any]:
     """
     Fetch result for a given task, either from cache or by running the browser agent.
     
+    Agent runs are checkpointed after every step so that a run interrupted by a
+    shutdown or crash can be resumed by resume_interrupted_runs().
+    
     Args:
         task (str): The task description to process
+        task_id (str): Identifier of this run, used for its artifact directory
+        checkpoint_meta (Optional[Dict[str, Any]]): Data needed to deliver the result after a resume
+        resume_from (Optional[Dict[str, Any]]): Checkpoint of an interrupted run to continue
+        planner (bool): Split the task into parallel sub-tasks, see fetch_planned_result()
+        settings (Optional[Settings]): Settings of the task, the current ones if not given
+        max_steps (Optional[int]): Step budget of the agent run, settings.max_steps if not given
+        checkpoint (bool): Checkpoint the run so that it can be resumed
         
     Returns:
         Dict[str, Any]: Result dictionary containing the task result and cache status
@@ -152,39 +353,106 @@ async def fetch_result(task: str) -> Dict[str, Any]:
     Raises:
         HTTPException: On various error conditions with appropriate status codes
     """
-    logger.info(f"Processing task: {task}")
+    bind_task(task_id)
+    logger.info(f"Processing {describe_task(task)}")
+    settings = settings or settings_manager.settings
+    max_steps = max_steps or settings.max_steps
     try:
-        cache_key = f"browseragent:cache:{task}"
-        logger.debug(f"Generated cache key: {cache_key}")
+        cache_key = f"browseragent:cache:planned:{task}" if planner else f"browseragent:cache:{task}"
         
         # Try to get from cache
         try:
             logger.debug("Attempting to fetch from cache")
             cached_result = redis_client.get(cache_key)
             if cached_result:
-                logger.info(f"Cache hit for task: {task}")
+                logger.info("Cache hit")
                 decoded_result = json.loads(cached_result)
                 logger.debug(f"Successfully decoded cached result: {type(decoded_result)}")
+                if resume_from and checkpoint_store:
+                    checkpoint_store.delete(task_id)
                 return {"result": decoded_result, "cached": True}
             logger.debug("Cache miss")
+            if not planner:
+                similar_result = fetch_similar_cached_result(task)
+                if similar_result is not None:
+                    if resume_from and checkpoint_store:
+                        checkpoint_store.delete(task_id)
+                    return {"result": similar_result, "cached": "similar"}
         except redis.RedisError as e:
             logger.error(f"Redis error while fetching cache: {str(e)}", exc_info=True)
             logger.warning("Continuing without cache due to Redis error")
         
+        # A checkpoint is always of a single run, so a resumed planner task continues it instead of re-planning
+        if planner and not resume_from:
+            return await fetch_planned_result(task, task_id, cache_key, settings, checkpoint_meta)
+        
         # Initialize and run agent with detailed logging
+        recorder = None
+        checkpointer = None
         try:
-            logger.info("Initializing browser agent")
-            agent = Agent(
-                llm=llm,
-                task=task,
-                browser=browser,
-                controller=controller,
-                validate_output=True
-            )
-            agent.browser.headless = True
-            logger.info("Starting agent execution")
+            spiller = HistorySpiller(run_dir(task_id) / "history", window=settings.history_memory_window)
+            if settings.recording_format != "none":
+                recorder = TaskRecorder(
+                    run_dir(task_id),
+                    fmt=settings.recording_format,
+                    max_width=settings.recording_max_width,
+                    append=resume_from is not None
+                )
+
+            agent_task = task
+            if checkpoint_store and checkpoint:
+                checkpointer = RunCheckpointer(
+                    checkpoint_store,
+                    task_id,
+                    service="api",
+                    task=task,
+                    max_steps=max_steps,
+                    meta=checkpoint_meta,
+                    resume_from=resume_from
+                )
+                if resume_from:
+                    agent_task = build_resume_task(resume_from)
+                    max_steps = checkpointer.remaining_steps
+                    logger.info(f"Resuming run {task_id} with {max_steps} steps remaining")
+
+            # Wait for a slot on the task's domains and reuse a context warm for them
+            domains = extract_domains(task)
+            async with domain_scheduler.acquire(domains), context_pool.lease(domains) as browser_context:
+                logger.info("Initializing browser agent")
+                agent = Agent(
+                    llm=llm,
+                    task=agent_task,
+                    browser=browser,
+                    browser_context=browser_context,
+                    controller=controller,
+                    validate_output=True,
+                    generate_gif=False,
+                    register_new_step_callback=chain_step_callbacks(
+                        track_step,
+                        recorder.on_step if recorder else None,
+                        spiller.on_step
+                    )
+                )
+                spiller.attach(agent)
+                if checkpointer:
+                    checkpointer.attach(agent)
+                logger.info("Starting agent execution")
             
-            result = await agent.run()
+                try:
+                    async with checkpointer.heartbeat() if checkpointer else nullcontext():
+                        result = await agent.run(max_steps=max_steps)
+                except asyncio.CancelledError:
+                    # Keep the checkpoint so the run resumes after restart
+                    if checkpointer:
+                        checkpointer.suspend()
+                        checkpointer = None
+                    raise
+                finally:
+                    if recorder:
+                        await recorder.close()
+            if checkpointer:
+                checkpointer.finish()
+                checkpointer = None
             logger.debug("Agent execution completed")
             
             if not result or not result.history:
@@ -198,25 +466,24 @@ async def fetch_result(task: str) -> Dict[str, Any]:
             logger.debug(f"Serialized result length: {len(result_serializable)}")
             
             # Try to cache the result
-            try:
-                logger.debug("Attempting to cache result")
-                redis_client.setex(cache_key, 300, json.dumps(result_serializable))
-                logger.info(f"Result cached successfully with TTL: 300 seconds")
-            except redis.RedisError as e:
-                logger.error(f"Redis error while setting cache: {str(e)}", exc_info=True)
-                logger.warning("Continuing without caching due to Redis error")
+            store_cached_result(cache_key, result_serializable, settings.cache_ttl)
+            if semantic_cache and settings.cache_ttl > 0 and semantic_cache.enabled_for(task):
+                semantic_cache.add(task, settings.cache_ttl)
             
             logger.info("Task processing completed successfully")
-            return {"result": result_serializable, "cached": False}
+            result_data = {"result": result_serializable, "cached": False}
+            if recorder and recorder.path:
+                result_data["recording_url"] = f"/recordings/{task_id}"
+            return result_data
             
         except Exception as e:
-            logger.error(f"Agent error during task execution: {str(e)}", exc_info=True)
-            error_context = {
-                "task": task,
-                "error_type": type(e).__name__,
-                "error_details": str(e)
-            }
-            logger.error(f"Error context: {json.dumps(error_context, indent=2)}")
+            logger.error(
+                f"Agent error during task execution: {str(e)}",
+                exc_info=True,
+                extra={"error_type": type(e).__name__, "error_details": str(e)}
+            )
+            if checkpointer:
+                checkpointer.finish()
             raise HTTPException(
                 status_code=500,
                 detail=f"Failed to process task: {str(e)}"
@@ -224,46 +491,166 @@ async def fetch_result(task: str) -> Dict[str, Any]:
             
     except Exception as e:
         logger.error(f"Critical error in fetch_result: {str(e)}", exc_info=True)
-        logger.error(f"Stack trace:", stack_info=True)
         raise HTTPException(
             status_code=500,
             detail="Internal server error - Please check server logs for details"
         )
 
-@app.post("/task", response_model=Dict[str, Any], description="Execute a browser automation task")
-async def run_task(request: TaskRequest):
+async def process_task(task: str, task_id: str, postback_url: Optional[str] = None,
+                       idempotency_key: Optional[str] = None, fingerprint: Optional[str] = None,
+                       resume_from: Optional[Dict[str, Any]] = None, planner: bool = False,
+                       profile: bool = False, browser_trace: bool = False,
+                       settings: Optional[Settings] = None) -> Dict[str, Any]:
     """
-    Execute a browser automation task and optionally send results to a postback URL.
+    Run a task, deliver its result to the postback URL and record it for idempotent retries.
     
     Args:
-        request (TaskRequest): The task request containing the task description and optional postback URL
+        task (str): The task description to process
+        task_id (str): Identifier of this run
+        postback_url (Optional[str]): URL the result is posted to
+        idempotency_key (Optional[str]): Idempotency key claimed for this run
+        fingerprint (Optional[str]): Fingerprint of the original request body
+        resume_from (Optional[Dict[str, Any]]): Checkpoint of an interrupted run to continue
+        planner (bool): Run the task in planner mode
+        profile (bool): Profile the run, see TaskProfiler
+        browser_trace (bool): Include a browser performance trace in the profile
+        settings (Optional[Settings]): Settings of the task, the current ones if not given
         
     Returns:
-        Dict[str, Any]: Response containing task result and execution details
+        Dict[str, Any]: Response body for the task
     """
-    logger.info(f"Received task request: {request.task[:100]}...")  # Log first 100 chars of task
+    settings = settings or settings_manager.settings
+    checkpoint_meta = {
+        "postback_url": postback_url,
+        "idempotency_key": idempotency_key,
+        "fingerprint": fingerprint,
+        "planner": planner,
+        "settings": settings.request_values()
+    }
+    profiler = None
     try:
-        result_data = await fetch_result(request.task)
+        # Per-task profiling (X-Profile header or TaskRequest.profile), off unless the operator enables it
+        if profile and not settings.profiling_enabled:
+            logger.info("Profiling requested but PROFILING_ENABLED is off, running without it")
+        if profile and settings.profiling_enabled:
+            profiler = TaskProfiler(run_dir(task_id) / "profile", browser_trace=browser_trace,
+                                    interval=settings.profile_sample_interval)
+            await profiler.start(browser)
+        try:
+            # Keep the idempotency key claimed for as long as the run takes
+            async with result_store.hold(idempotency_key, task_id) if idempotency_key else nullcontext():
+                result_data = await fetch_result(task, task_id, checkpoint_meta, resume_from=resume_from,
+                                                 planner=planner, settings=settings)
+        finally:
+            if profiler:
+                await profiler.stop()
+        result_data["task_id"] = task_id
+        if profiler:
+            result_data["profile_url"] = f"/profiles/{task_id}"
+        if result_sinks:
+            result_sinks.submit(build_result_record(
+                task_id, "api", task, result_data["result"], cached=result_data.get("cached", False)
+            ))
         
-        if request.postback_url:
+        if postback_url:
             try:
                 response = requests.post(
-                    request.postback_url,
+                    postback_url,
                     json={"result": result_data["result"]},
-                    timeout=10
+                    timeout=settings.postback_timeout
                 )
                 response.raise_for_status()
-                logger.info(f"Successfully posted result to {request.postback_url}")
+                logger.info(f"Successfully posted result to {postback_url}")
             except requests.exceptions.RequestException as e:
-                logger.error(f"Failed to post result to {request.postback_url}: {str(e)}")
+                logger.error(f"Failed to post result to {postback_url}: {str(e)}")
                 # Don't fail the request, but include the error in response
                 result_data["postback_error"] = str(e)
         
-        return {
+        response_body = {
             "status": "success",
             "data": result_data
         }
+        if idempotency_key:
+            try:
+                result_store.complete(idempotency_key, fingerprint, response_body)
+            except redis.RedisError as e:
+                logger.error(f"Redis error while storing idempotent result: {str(e)}", exc_info=True)
+        return response_body
+        
+    except Exception:
+        if idempotency_key:
+            try:
+                result_store.release(idempotency_key, task_id)
+            except redis.RedisError as redis_err:
+                logger.error(f"Redis error while releasing idempotency key: {str(redis_err)}", exc_info=True)
+        raise
+
+@app.post("/task", response_model=Dict[str, Any], description="Execute a browser automation task")
+async def run_task(
+    request: TaskRequest,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    x_profile: Optional[str] = Header(None, alias="X-Profile")
+):
+    """
+    Execute a browser automation task and optionally send results to a postback URL.
+    
+    When an Idempotency-Key header is supplied, retries with the same key and body
+    return the original run's response, or a 202 with its status while it is still
+    running, instead of starting a second run.
+    
+    Args:
+        request (TaskRequest): The task request containing the task description and optional postback URL
+        idempotency_key (Optional[str]): Client chosen key identifying this submission
+        x_profile (Optional[str]): 'true' to profile the run, 'browser' to also trace the browser
         
+    Returns:
+        Dict[str, Any]: Response containing task result and execution details
+    """
+    task_id = new_run_id()
+    bind_task(task_id)
+    logger.info(f"Received {describe_task(request.task)}")
+    profile_options = parse_profile_header(x_profile)
+    try:
+        settings = settings_manager.settings.with_overrides(request.settings or {})
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"Invalid settings: {str(e)}")
+    fingerprint = None
+    if idempotency_key:
+        fingerprint = request_fingerprint(request.dict())
+        try:
+            existing = result_store.claim(idempotency_key, fingerprint, task_id)
+        except IdempotencyConflict as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        except redis.RedisError as e:
+            logger.error(f"Redis error while claiming idempotency key: {str(e)}", exc_info=True)
+            logger.warning("Continuing without idempotency due to Redis error")
+            idempotency_key = None
+        else:
+            if existing is not None:
+                headers = {"Idempotent-Replayed": "true"}
+                if existing["status"] == STATUS_SUCCEEDED:
+                    return JSONResponse(content=existing["response"], headers=headers)
+                return JSONResponse(
+                    status_code=202,
+                    content={
+                        "status": existing["status"],
+                        "data": {"task_id": existing.get("task_id")}
+                    },
+                    headers=headers
+                )
+
+    try:
+        return await process_task(
+            request.task,
+            task_id,
+            postback_url=request.postback_url,
+            idempotency_key=idempotency_key,
+            fingerprint=fingerprint,
+            planner=request.planner,
+            profile=request.profile or profile_options["profile"],
+            browser_trace=request.profile_browser_trace or profile_options["browser_trace"],
+            settings=settings
+        )
     except HTTPException:
         raise
     except Exception as e:
@@ -273,6 +660,192 @@ async def run_task(request: TaskRequest):
             detail="Internal server error"
         )
 
+async def resume_interrupted_runs():
+    """
+    Resume API runs whose checkpoints are not owned by a live worker.
+    
+    The original HTTP client is gone, so a resumed run delivers its result
+    through the postback URL and the idempotency store of the original request.
+    At most CHECKPOINT_RESUME_CONCURRENCY resumed runs are in flight per worker.
+    """
+    if not checkpoint_store:
+        return
+    try:
+        run_ids = checkpoint_store.list_runs("api")
+    except Exception as e:
+        logger.error(f"Failed to list checkpoints: {str(e)}", exc_info=True)
+        return
+
+    for run_id in run_ids:
+        if len(resumed_runs) >= settings_manager.settings.checkpoint_resume_concurrency:
+            logger.info(f"{len(resumed_runs)} resumed runs in flight, leaving the rest for a later check")
+            break
+        try:
+            if not checkpoint_store.claim(run_id):
+                continue
+            checkpoint = checkpoint_store.load(run_id)
+            if not checkpoint:
+                checkpoint_store.release(run_id)
+                continue
+        except Exception as e:
+            logger.error(f"Failed to claim checkpoint {run_id}: {str(e)}", exc_info=True)
+            continue
+
+        logger.info(f"Resuming interrupted run {run_id}")
+        meta = checkpoint.get("meta") or {}
+        try:
+            settings = settings_manager.settings.with_overrides(meta.get("settings") or {})
+        except ValueError as e:
+            logger.warning(f"Settings of run {run_id} are no longer valid, resuming with the current ones: {str(e)}")
+            settings = settings_manager.settings
+        resumed = asyncio.create_task(process_task(
+            checkpoint["task"],
+            run_id,
+            postback_url=meta.get("postback_url"),
+            idempotency_key=meta.get("idempotency_key"),
+            fingerprint=meta.get("fingerprint"),
+            resume_from=checkpoint,
+            planner=meta.get("planner", False),
+            settings=settings
+        ))
+        resumed_runs.add(resumed)
+        resumed.add_done_callback(resumed_runs.discard)
+        resumed.add_done_callback(_log_resumed_run_outcome)
+
+def _log_resumed_run_outcome(task: asyncio.Task):
+    if not task.cancelled() and task.exception():
+        logger.error(f"Resumed run failed: {str(task.exception())}")
+
+async def resume_interrupted_runs_periodically():
+    """Check for interrupted runs at startup and then every checkpoint_resume_interval seconds."""
+    while True:
+        await resume_interrupted_runs()
+        await asyncio.sleep(settings_manager.settings.checkpoint_resume_interval)
+
+@app.on_event("startup")
+async def start_checkpoint_resumer():
+    if checkpoint_store:
+        app.state.checkpoint_resumer = asyncio.create_task(
+            resume_interrupted_runs_periodically()
+        )
+
+@app.on_event("startup")
+async def start_settings_watcher():
+    app.state.settings_watcher = asyncio.create_task(settings_manager.watch())
+
+@app.on_event("startup")
+async def start_browser_watchdog():
+    app.state.browser_watchdog = asyncio.create_task(browser_watchdog.run())
+
+@app.on_event("startup")
+async def start_result_sinks():
+    if result_sinks:
+        result_sinks.start()
+
+@app.on_event("shutdown")
+async def close_context_pool():
+    health_monitor.shutting_down = True
+    if result_sinks:
+        await result_sinks.close()
+    await context_pool.close()
+    if fetch_cache:
+        fetch_cache.close()
+
+@app.get("/healthz", description="Liveness probe")
+async def healthz():
+    """Return 200 while the service is alive, 503 otherwise."""
+    alive, report = health_monitor.liveness()
+    return JSONResponse(status_code=200 if alive else 503, content=report)
+
+@app.get("/readyz", description="Readiness probe")
+async def readyz():
+    """
+    Return 200 when the service can take tasks: Redis answers and the browser is
+    healthy. Returns 503 with the failing checks while degraded or shutting down.
+    """
+    ready, report = await health_monitor.readiness()
+    return JSONResponse(status_code=200 if ready else 503, content=report)
+
+@app.get("/debug/config", description="Show the effective settings")
+async def debug_config():
+    """
+    Return the settings in effect, the source of each (default, config file or
+    environment), and changed settings that only apply after a restart.
+    """
+    return {"status": "success", "data": settings_manager.describe()}
+
+def get_task_dir(task_id: str):
+    """Return the artifact directory of an existing task or raise a 404."""
+    try:
+        directory = run_dir(task_id, create=False)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Task not found")
+    if not directory.is_dir():
+        raise HTTPException(status_code=404, detail="Task not found")
+    return directory
+
+@app.get("/recordings/{task_id}", description="Download the recording of a task")
+async def get_recording(task_id: str):
+    """
+    Return the recording of a task: the GIF itself, or for segmented formats
+    the JSON manifest listing the segment files.
+
+    Args:
+        task_id (str): The task identifier returned by POST /task
+    """
+    recording_path = find_recording(get_task_dir(task_id))
+    if not recording_path:
+        raise HTTPException(status_code=404, detail="Recording not found")
+    return FileResponse(recording_path)
+
+@app.get("/recordings/{task_id}/{segment}", description="Download a segment of a task recording")
+async def get_recording_segment(task_id: str, segment: str):
+    """
+    Return one segment file of a segmented (WebP or MP4) recording.
+
+    Args:
+        task_id (str): The task identifier returned by POST /task
+        segment (str): Segment file name as listed in the recording manifest
+    """
+    segment_path = get_task_dir(task_id) / segment
+    if not is_segment_name(segment) or not segment_path.is_file():
+        raise HTTPException(status_code=404, detail="Recording segment not found")
+    return FileResponse(segment_path)
+
+@app.get("/profiles/{task_id}", description="List the profiling artifacts of a task")
+async def get_profile(task_id: str):
+    """
+    Return download links for the profile of a task run with profiling enabled.
+
+    Args:
+        task_id (str): The task identifier returned by POST /task
+    """
+    profile_dir = get_task_dir(task_id) / "profile"
+    artifacts = [name for name in PROFILE_ARTIFACTS if (profile_dir / name).is_file()]
+    if not artifacts:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return {
+        "status": "success",
+        "data": {
+            "task_id": task_id,
+            "artifacts": {name: f"/profiles/{task_id}/{name}" for name in artifacts}
+        }
+    }
+
+@app.get("/profiles/{task_id}/{artifact}", description="Download a profiling artifact of a task")
+async def get_profile_artifact(task_id: str, artifact: str):
+    """
+    Return one profiling artifact: cpu.folded, waits.json or browser-trace.json.
+
+    Args:
+        task_id (str): The task identifier returned by POST /task
+        artifact (str): Artifact file name as listed by GET /profiles/{task_id}
+    """
+    artifact_path = get_task_dir(task_id) / "profile" / artifact
+    if artifact not in PROFILE_ARTIFACTS or not artifact_path.is_file():
+        raise HTTPException(status_code=404, detail="Profile artifact not found")
+    return FileResponse(artifact_path)
+
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
     return JSONResponse(
@@ -306,6 +879,11 @@ def cleanup():
         browser.close()
         logger.info("Browser closed successfully")
         
+        # Hand interrupted runs over to the next worker straight away
+        if checkpoint_store:
+            logger.debug("Releasing claimed checkpoints")
+            checkpoint_store.release_all()
+        
         # Close Redis connection
         logger.debug("Closing Redis connection")
         redis_client.close()
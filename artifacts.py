@@ -0,0 +1,40 @@
+import os
+import uuid
+from pathlib import Path
+from typing import Optional
+
+# Root directory for per-run artifacts (recordings, profiles, spilled history)
+DEFAULT_ARTIFACTS_ROOT = 'artifacts'
+
+
+def new_run_id() -> str:
+    """Return a new opaque identifier for a single agent run."""
+    return uuid.uuid4().hex
+
+
+def get_artifacts_root() -> Path:
+    """Return the artifacts root directory, honouring ARTIFACTS_DIR."""
+    return Path(os.getenv('ARTIFACTS_DIR', DEFAULT_ARTIFACTS_ROOT))
+
+
+def run_dir(run_id: str, root: Optional[Path] = None, create: bool = True) -> Path:
+    """
+    Return the artifact directory for a run, creating it if needed.
+
+    Args:
+        run_id (str): Identifier of the run, as returned by new_run_id()
+        root (Optional[Path]): Artifacts root, defaults to get_artifacts_root()
+        create (bool): Create the directory if it does not exist
+
+    Returns:
+        Path: Directory that only this run writes to
+
+    Raises:
+        ValueError: If run_id would escape the artifacts root
+    """
+    if not run_id or os.sep in run_id or run_id in ('.', '..') or (os.altsep and os.altsep in run_id):
+        raise ValueError(f"Invalid run id: {run_id!r}")
+    path = (root or get_artifacts_root()) / run_id
+    if create:
+        path.mkdir(parents=True, exist_ok=True)
+    return path
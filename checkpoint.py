@@ -0,0 +1,428 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import redis
+
+logger = logging.getLogger(__name__)
+
+# Extend a run's lease if this worker owns it or nobody does; 0 if another worker owns it.
+_RENEW_SCRIPT = """
+local owner = redis.call('GET', KEYS[1])
+if owner and owner ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+return 1
+"""
+
+# Maximum characters of extracted content carried per step into a resumed task
+RESUME_CONTENT_LIMIT = 500
+
+
+def worker_id() -> str:
+    """Return an identifier for this worker process, used as the owner of claimed runs."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class CheckpointStore:
+    """
+    Base class for storing step-level checkpoints of agent runs.
+
+    A checkpoint is a JSON document holding the task, service specific metadata
+    and the agent history completed so far. A run is owned by one worker at a
+    time through a lease that is renewed on every save and while a step is in
+    flight (see RunCheckpointer.heartbeat); when a worker stops
+    without finishing a run the lease is released or expires, and another
+    worker (or the same one after a restart) can claim the run and resume it.
+    """
+
+    def __init__(self, lease_ttl: int = 300, owner: Optional[str] = None):
+        """
+        Args:
+            lease_ttl (int): Seconds a claimed run stays owned without a new checkpoint
+            owner (Optional[str]): Owner identifier, defaults to worker_id()
+        """
+        self.lease_ttl = lease_ttl
+        self.owner = owner or worker_id()
+        self._claimed: set = set()
+
+    def save(self, run_id: str, checkpoint: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    def load(self, run_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def delete(self, run_id: str) -> None:
+        raise NotImplementedError
+
+    def list_runs(self, service: str) -> List[str]:
+        raise NotImplementedError
+
+    def claim(self, run_id: str) -> bool:
+        raise NotImplementedError
+
+    def renew(self, run_id: str) -> bool:
+        """
+        Extend this worker's lease on a run.
+
+        Returns:
+            bool: False if another worker owns the run
+        """
+        raise NotImplementedError
+
+    def release(self, run_id: str) -> None:
+        raise NotImplementedError
+
+    def release_all(self) -> None:
+        """Release every run claimed by this worker so they can be resumed immediately."""
+        for run_id in list(self._claimed):
+            try:
+                self.release(run_id)
+            except Exception as e:
+                logger.error(f"Failed to release checkpoint {run_id}: {str(e)}", exc_info=True)
+
+
+class RedisCheckpointStore(CheckpointStore):
+    """Checkpoint store shared by all workers through Redis."""
+
+    def __init__(self, redis_client: redis.Redis, prefix: str = 'browseragent:checkpoint', **kwargs):
+        super().__init__(**kwargs)
+        self.redis = redis_client
+        self.prefix = prefix
+        self._renew_script = redis_client.register_script(_RENEW_SCRIPT)
+
+    def _key(self, run_id: str) -> str:
+        return f"{self.prefix}:{run_id}"
+
+    def _lock_key(self, run_id: str) -> str:
+        return f"{self.prefix}:{run_id}:lock"
+
+    def _index_key(self, service: str) -> str:
+        return f"{self.prefix}s:{service}"
+
+    def save(self, run_id: str, checkpoint: Dict[str, Any]) -> None:
+        pipe = self.redis.pipeline()
+        pipe.set(self._key(run_id), json.dumps(checkpoint))
+        pipe.sadd(self._index_key(checkpoint['service']), run_id)
+        pipe.set(self._lock_key(run_id), self.owner, ex=self.lease_ttl)
+        pipe.execute()
+        self._claimed.add(run_id)
+
+    def load(self, run_id: str) -> Optional[Dict[str, Any]]:
+        raw = self.redis.get(self._key(run_id))
+        return json.loads(raw) if raw else None
+
+    def delete(self, run_id: str) -> None:
+        checkpoint = self.load(run_id)
+        pipe = self.redis.pipeline()
+        pipe.delete(self._key(run_id), self._lock_key(run_id))
+        if checkpoint:
+            pipe.srem(self._index_key(checkpoint['service']), run_id)
+        pipe.execute()
+        self._claimed.discard(run_id)
+
+    def list_runs(self, service: str) -> List[str]:
+        return [run_id.decode() if isinstance(run_id, bytes) else run_id
+                for run_id in self.redis.smembers(self._index_key(service))]
+
+    def claim(self, run_id: str) -> bool:
+        if self.redis.set(self._lock_key(run_id), self.owner, nx=True, ex=self.lease_ttl):
+            self._claimed.add(run_id)
+            return True
+        return False
+
+    def renew(self, run_id: str) -> bool:
+        return bool(self._renew_script(keys=[self._lock_key(run_id)], args=[self.owner, self.lease_ttl]))
+
+    def release(self, run_id: str) -> None:
+        lock_key = self._lock_key(run_id)
+        owner = self.redis.get(lock_key)
+        if owner is not None and owner.decode() == self.owner:
+            self.redis.delete(lock_key)
+        self._claimed.discard(run_id)
+
+
+class DiskCheckpointStore(CheckpointStore):
+    """Checkpoint store on local disk, for single-host deployments without shared Redis."""
+
+    def __init__(self, directory: Path, **kwargs):
+        super().__init__(**kwargs)
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, run_id: str) -> Path:
+        return self.directory / f"{run_id}.json"
+
+    def _lock_path(self, run_id: str) -> Path:
+        return self.directory / f"{run_id}.lock"
+
+    def _write_lock(self, run_id: str) -> None:
+        tmp_path = self._lock_path(run_id).with_suffix('.lock.tmp')
+        tmp_path.write_text(json.dumps({'owner': self.owner, 'expires_at': time.time() + self.lease_ttl}))
+        os.replace(tmp_path, self._lock_path(run_id))
+
+    def save(self, run_id: str, checkpoint: Dict[str, Any]) -> None:
+        tmp_path = self._path(run_id).with_suffix('.json.tmp')
+        tmp_path.write_text(json.dumps(checkpoint))
+        os.replace(tmp_path, self._path(run_id))
+        self._write_lock(run_id)
+        self._claimed.add(run_id)
+
+    def load(self, run_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            return json.loads(self._path(run_id).read_text())
+        except FileNotFoundError:
+            return None
+
+    def delete(self, run_id: str) -> None:
+        for path in (self._path(run_id), self._lock_path(run_id)):
+            path.unlink(missing_ok=True)
+        self._claimed.discard(run_id)
+
+    def list_runs(self, service: str) -> List[str]:
+        run_ids = []
+        for path in self.directory.glob('*.json'):
+            checkpoint = self.load(path.stem)
+            if checkpoint and checkpoint.get('service') == service:
+                run_ids.append(path.stem)
+        return run_ids
+
+    def claim(self, run_id: str) -> bool:
+        lock_path = self._lock_path(run_id)
+        lock_data = json.dumps({'owner': self.owner, 'expires_at': time.time() + self.lease_ttl})
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            with os.fdopen(fd, 'w') as lock_file:
+                lock_file.write(lock_data)
+            self._claimed.add(run_id)
+            return True
+        except FileExistsError:
+            try:
+                lock = json.loads(lock_path.read_text())
+            except (OSError, ValueError):
+                lock = {}
+            if lock.get('expires_at', 0) > time.time():
+                return False
+        self._write_lock(run_id)
+        self._claimed.add(run_id)
+        return True
+
+    def renew(self, run_id: str) -> bool:
+        try:
+            lock = json.loads(self._lock_path(run_id).read_text())
+        except (OSError, ValueError):
+            lock = {}
+        if lock.get('owner') not in (None, self.owner) and lock.get('expires_at', 0) > time.time():
+            return False
+        self._write_lock(run_id)
+        return True
+
+    def release(self, run_id: str) -> None:
+        try:
+            lock = json.loads(self._lock_path(run_id).read_text())
+            if lock.get('owner') == self.owner:
+                self._lock_path(run_id).unlink(missing_ok=True)
+        except (OSError, ValueError):
+            pass
+        self._claimed.discard(run_id)
+
+
+def dump_history(history: Any) -> List[Dict[str, Any]]:
+    """
+    Serialize an agent history for a checkpoint, dropping screenshots.
+
+    Args:
+        history: browser_use AgentHistoryList
+
+    Returns:
+        List[Dict[str, Any]]: One JSON-serializable entry per completed step
+    """
+    items = history.model_dump().get('history', [])
+    for item in items:
+        state = item.get('state') or {}
+        state.pop('screenshot', None)
+    return items
+
+
+def build_resume_task(checkpoint: Dict[str, Any]) -> str:
+    """
+    Build the task prompt for continuing an interrupted run.
+
+    The resumed agent starts with a fresh browser context and message history,
+    so the prompt summarises the completed steps and where the browser was.
+
+    Args:
+        checkpoint (Dict[str, Any]): Checkpoint of the interrupted run
+
+    Returns:
+        str: Original task followed by a summary of the progress so far
+    """
+    lines = [
+        checkpoint['task'],
+        '',
+        'This task was interrupted and is being resumed. Steps already completed:',
+    ]
+    last_url = None
+    for number, item in enumerate(checkpoint.get('history', []), 1):
+        state = item.get('state') or {}
+        model_output = item.get('model_output') or {}
+        goal = (model_output.get('current_state') or {}).get('next_goal') or 'step'
+        last_url = state.get('url') or last_url
+        lines.append(f"{number}. {goal} ({state.get('url', 'unknown page')})")
+        for result in item.get('result') or []:
+            content = result.get('extracted_content')
+            if content:
+                lines.append(f"   Result: {content[:RESUME_CONTENT_LIMIT]}")
+    if last_url:
+        lines.append(f"The browser was last on {last_url}.")
+    lines.append('Continue from there without repeating the completed steps.')
+    return '\n'.join(lines)
+
+
+class RunCheckpointer:
+    """
+    Saves a checkpoint of one agent run after every step.
+
+    Call `attach(agent)` once the agent exists, and run the agent inside
+    `heartbeat()` so that a slow step does not let the lease expire while
+    the run is still alive. Call `finish()` when the run ends
+    for good (success or failure), or `suspend()` when it is interrupted and
+    should be resumed later.
+    """
+
+    def __init__(
+        self,
+        store: CheckpointStore,
+        run_id: str,
+        service: str,
+        task: str,
+        max_steps: int,
+        meta: Optional[Dict[str, Any]] = None,
+        resume_from: Optional[Dict[str, Any]] = None,
+    ):
+        """
+        Args:
+            store (CheckpointStore): Where checkpoints are written
+            run_id (str): Identifier of the run
+            service (str): Service that owns the run and will resume it
+            task (str): Original task description
+            max_steps (int): Step budget of the whole run
+            meta (Optional[Dict[str, Any]]): Service specific data needed to deliver the result
+            resume_from (Optional[Dict[str, Any]]): Checkpoint this run continues from
+        """
+        self.store = store
+        self.run_id = run_id
+        self.service = service
+        self.task = task
+        self.max_steps = max_steps
+        self.meta = meta or {}
+        self.previous_history = (resume_from or {}).get('history', [])
+        self.created_at = (resume_from or {}).get('created_at', time.time())
+        self._agent = None
+
+    @property
+    def remaining_steps(self) -> int:
+        """Steps left in the budget after those completed before a resume."""
+        return max(1, self.max_steps - len(self.previous_history))
+
+    def attach(self, agent: Any) -> None:
+        """
+        Checkpoint the agent's progress each time one of its steps has finished.
+
+        browser_use calls step callbacks before the step's actions run and its
+        history item is added, so the agent's step method is wrapped instead.
+        """
+        self._agent = agent
+        run_step = agent.step
+
+        async def step(*args: Any, **kwargs: Any) -> None:
+            await run_step(*args, **kwargs)
+            try:
+                self.save()
+            except Exception as e:
+                logger.error(f"Failed to checkpoint run {self.run_id}: {str(e)}", exc_info=True)
+
+        agent.step = step
+
+    def save(self) -> None:
+        """Write the current progress of the run."""
+        history = list(self.previous_history)
+        if self._agent is not None:
+            history.extend(dump_history(self._agent.state.history))
+        self.store.save(self.run_id, {
+            'run_id': self.run_id,
+            'service': self.service,
+            'task': self.task,
+            'max_steps': self.max_steps,
+            'meta': self.meta,
+            'history': history,
+            'created_at': self.created_at,
+            'updated_at': time.time(),
+        })
+
+    async def _renew_lease(self) -> None:
+        while True:
+            await asyncio.sleep(self.store.lease_ttl / 3)
+            try:
+                if not self.store.renew(self.run_id):
+                    logger.warning(f"Run {self.run_id} is now owned by another worker")
+            except Exception as e:
+                logger.error(f"Failed to renew lease of run {self.run_id}: {str(e)}", exc_info=True)
+
+    @asynccontextmanager
+    async def heartbeat(self) -> AsyncIterator[None]:
+        """Keep renewing the run's lease for the duration of the block."""
+        renewer = asyncio.create_task(self._renew_lease())
+        try:
+            yield
+        finally:
+            renewer.cancel()
+
+    def finish(self) -> None:
+        """Remove the checkpoint of a run that will not be resumed."""
+        try:
+            self.store.delete(self.run_id)
+        except Exception as e:
+            logger.error(f"Failed to delete checkpoint {self.run_id}: {str(e)}", exc_info=True)
+
+    def suspend(self) -> None:
+        """Save a final checkpoint and release the run so it can be resumed."""
+        try:
+            self.save()
+            self.store.release(self.run_id)
+            logger.info(f"Run {self.run_id} suspended, it will resume from its last checkpoint")
+        except Exception as e:
+            logger.error(f"Failed to suspend run {self.run_id}: {str(e)}", exc_info=True)
+
+
+def create_checkpoint_store(backend: str, redis_client: Optional[redis.Redis] = None,
+                            directory: str = 'checkpoints', lease_ttl: int = 300) -> Optional[CheckpointStore]:
+    """
+    Create the configured checkpoint store.
+
+    Args:
+        backend (str): 'redis', 'disk' or 'none'
+        redis_client (Optional[redis.Redis]): Connection for the redis backend
+        directory (str): Directory for the disk backend
+        lease_ttl (int): Seconds a claimed run stays owned without a new checkpoint
+
+    Returns:
+        Optional[CheckpointStore]: The store, or None when checkpointing is disabled
+
+    Raises:
+        ValueError: If the backend is unknown
+    """
+    if backend == 'none':
+        return None
+    if backend == 'redis':
+        return RedisCheckpointStore(redis_client, lease_ttl=lease_ttl)
+    if backend == 'disk':
+        return DiskCheckpointStore(Path(directory), lease_ttl=lease_ttl)
+    raise ValueError(f"Unknown checkpoint backend '{backend}', expected redis, disk or none")
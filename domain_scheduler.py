@@ -0,0 +1,321 @@
+import asyncio
+import logging
+import random
+import time
+import uuid
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence
+from urllib.parse import urlparse
+
+import redis
+from browser_use.browser.browser import Browser
+from browser_use.browser.context import BrowserContext, BrowserContextConfig
+
+from domains import normalize_domain
+
+logger = logging.getLogger(__name__)
+
+# Atomically drop expired entries, then take a concurrency slot and a rate token.
+# Returns 1 on success, 0 if the domain is at its concurrency limit, -1 if rate limited.
+_ACQUIRE_SCRIPT = """
+local now = tonumber(ARGV[1])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', now - 60)
+if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[3]) then
+    return 0
+end
+if redis.call('ZCARD', KEYS[2]) >= tonumber(ARGV[4]) then
+    return -1
+end
+redis.call('ZADD', KEYS[1], tonumber(ARGV[2]), ARGV[5])
+redis.call('ZADD', KEYS[2], now, ARGV[5])
+redis.call('EXPIRE', KEYS[1], ARGV[6])
+redis.call('EXPIRE', KEYS[2], 120)
+return 1
+"""
+
+# Extend the lease of a token on every given active set, re-adding it if the
+# entry is gone, and keep each set alive for as long as the lease.
+_RENEW_SCRIPT = """
+for _, key in ipairs(KEYS) do
+    redis.call('ZADD', key, tonumber(ARGV[1]), ARGV[2])
+    redis.call('EXPIRE', key, ARGV[3])
+end
+return #KEYS
+"""
+
+
+@dataclass
+class DomainLimit:
+    """Limits applied to one domain across all workers."""
+
+    max_concurrency: int
+    rate_per_minute: int
+
+
+def parse_domain_limits(spec: str) -> Dict[str, DomainLimit]:
+    """
+    Parse per-domain overrides of the form 'example.com=2:30,other.org=1:10'
+    (concurrent tasks : task starts per minute).
+
+    Raises:
+        ValueError: If an entry is malformed
+    """
+    limits = {}
+    for entry in filter(None, (part.strip() for part in spec.split(','))):
+        domain, _, values = entry.partition('=')
+        concurrency, _, rate = values.partition(':')
+        if not domain or not concurrency.isdigit() or not rate.isdigit():
+            raise ValueError(f"Invalid domain limit '{entry}', expected domain=concurrency:rate_per_minute")
+        limits[normalize_domain(domain)] = DomainLimit(int(concurrency), int(rate))
+    return limits
+
+
+class DomainScheduler:
+    """
+    Coordinates how many tasks hit each domain, across all workers, through Redis.
+
+    A task acquires a slot for every domain it refers to before it starts.
+    Slots enforce a per-domain concurrency limit and a per-domain limit on
+    task starts per minute. Slots are leases that are renewed while the task
+    runs, so a crashed worker's slots expire on their own. If Redis is
+    unavailable, tasks run unthrottled rather than fail.
+    """
+
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        default_limit: DomainLimit,
+        overrides: Optional[Dict[str, DomainLimit]] = None,
+        lease_ttl: int = 120,
+        poll_interval: float = 0.5,
+        max_wait: float = 300.0,
+        prefix: str = 'browseragent:domain',
+    ):
+        """
+        Args:
+            redis_client (redis.Redis): Connection shared by all workers
+            default_limit (DomainLimit): Limit for domains without an override
+            overrides (Optional[Dict[str, DomainLimit]]): Per-domain limits
+            lease_ttl (int): Seconds a slot is held without renewal
+            poll_interval (float): Base delay between attempts while a domain is busy
+            max_wait (float): Seconds to wait for a slot before running anyway
+            prefix (str): Key prefix for scheduler state
+        """
+        self.redis = redis_client
+        self.default_limit = default_limit
+        self.overrides = overrides or {}
+        self.lease_ttl = lease_ttl
+        self.poll_interval = poll_interval
+        self.max_wait = max_wait
+        self.prefix = prefix
+        self._acquire_script = redis_client.register_script(_ACQUIRE_SCRIPT)
+        self._renew_script = redis_client.register_script(_RENEW_SCRIPT)
+
+    def limit_for(self, domain: str) -> DomainLimit:
+        return self.overrides.get(domain, self.default_limit)
+
+    def _keys(self, domain: str) -> List[str]:
+        return [f"{self.prefix}:{domain}:active", f"{self.prefix}:{domain}:starts"]
+
+    async def _acquire_one(self, domain: str, token: str) -> bool:
+        limit = self.limit_for(domain)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+        while True:
+            now = time.time()
+            try:
+                acquired = self._acquire_script(
+                    keys=self._keys(domain),
+                    args=[now, now + self.lease_ttl, limit.max_concurrency, limit.rate_per_minute,
+                          token, self.lease_ttl * 2],
+                )
+            except redis.RedisError as e:
+                logger.error(f"Redis error in domain scheduler: {str(e)}", exc_info=True)
+                logger.warning(f"Continuing without throttling for {domain}")
+                return False
+            if acquired == 1:
+                return True
+            if loop.time() >= deadline:
+                logger.warning(f"Waited {self.max_wait}s for a slot on {domain}, continuing without one")
+                return False
+            logger.debug(f"Domain {domain} is {'at capacity' if acquired == 0 else 'rate limited'}, waiting")
+            await asyncio.sleep(self.poll_interval * (1 + random.random()))
+
+    def _release(self, domains: Sequence[str], token: str) -> None:
+        for domain in domains:
+            try:
+                self.redis.zrem(self._keys(domain)[0], token)
+            except redis.RedisError as e:
+                logger.error(f"Redis error releasing slot on {domain}: {str(e)}", exc_info=True)
+
+    def _extend(self, domains: Sequence[str], token: str) -> None:
+        """
+        Extend the slots held by a token on the given domains, atomically.
+
+        The slot is re-added if its entry was dropped, e.g. because the active
+        set expired while Redis was unreachable, so a running task keeps
+        counting against the domain's limit.
+        """
+        try:
+            self._renew_script(
+                keys=[self._keys(domain)[0] for domain in domains],
+                args=[time.time() + self.lease_ttl, token, self.lease_ttl * 2],
+            )
+        except redis.RedisError as e:
+            logger.error(f"Redis error renewing slots on {', '.join(domains)}: {str(e)}", exc_info=True)
+
+    async def _renew(self, domains: Sequence[str], token: str) -> None:
+        while True:
+            await asyncio.sleep(self.lease_ttl / 3)
+            self._extend(domains, token)
+
+    @asynccontextmanager
+    async def acquire(self, domains: Sequence[str]) -> AsyncIterator[None]:
+        """
+        Hold a slot on every given domain for the duration of the block.
+
+        Domains are acquired in sorted order so that tasks touching several
+        domains cannot deadlock each other.
+        """
+        token = uuid.uuid4().hex
+        held: List[str] = []
+        renewer = None
+        try:
+            for domain in sorted(set(domains)):
+                if await self._acquire_one(domain, token):
+                    held.append(domain)
+            if held:
+                renewer = asyncio.create_task(self._renew(held, token))
+            yield
+        finally:
+            if renewer:
+                renewer.cancel()
+            self._release(held, token)
+
+
+@dataclass
+class _PooledContext:
+    context: BrowserContext
+    warm_domains: set = field(default_factory=set)
+    last_used: float = field(default_factory=time.monotonic)
+
+
+class ContextPool:
+    """
+    Keeps finished browser contexts warm for reuse by later tasks.
+
+    A task leases the idle context whose cookies and connections are warm for
+    the most of its domains, or a fresh one when none is. When the task ends,
+    the domains of its open pages are added to the context's warm set. Idle
+    contexts beyond `max_idle` or older than `idle_ttl` are closed. A context
+    whose task failed is closed instead of being returned to the pool.
+    """
+
+    def __init__(self, browser: Browser, config: Optional[BrowserContextConfig] = None,
+                 max_idle: int = 4, idle_ttl: float = 600.0,
+                 on_new_context: Optional[Callable[[Any], Awaitable[None]]] = None):
+        """
+        Args:
+            browser (Browser): Browser the contexts are created in
+            config (Optional[BrowserContextConfig]): Configuration of new contexts
+            max_idle (int): Idle contexts kept for reuse
+            idle_ttl (float): Seconds an idle context is kept
+            on_new_context (Optional[Callable[[Any], Awaitable[None]]]): Called with the
+                Playwright context of every new context, e.g. to install request routes
+        """
+        self.browser = browser
+        self.config = config or browser.config.new_context_config
+        self.max_idle = max_idle
+        self.idle_ttl = idle_ttl
+        self.on_new_context = on_new_context
+        self._idle: List[_PooledContext] = []
+        self._leased: List[_PooledContext] = []
+        self._lock = asyncio.Lock()
+
+    async def _checkout(self, domains: Sequence[str]) -> _PooledContext:
+        async with self._lock:
+            await self._evict(keep=self.max_idle)
+            wanted = set(domains)
+            best = max(self._idle, key=lambda entry: (len(entry.warm_domains & wanted), entry.last_used), default=None)
+            if best is not None and (best.warm_domains & wanted or not wanted):
+                self._idle.remove(best)
+                logger.debug(f"Reusing warm browser context for {', '.join(sorted(best.warm_domains & wanted)) or 'task'}")
+                return best
+        entry = _PooledContext(BrowserContext(browser=self.browser, config=self.config))
+        if self.on_new_context:
+            try:
+                session = await entry.context.get_session()
+                await self.on_new_context(session.context)
+            except Exception:
+                await self._close(entry)
+                raise
+        return entry
+
+    async def _checkin(self, entry: _PooledContext, domains: Sequence[str]) -> None:
+        entry.warm_domains.update(domains)
+        try:
+            session = entry.context.session
+            if session is not None:
+                for page in session.context.pages:
+                    host = urlparse(page.url).hostname
+                    if host:
+                        entry.warm_domains.add(normalize_domain(host))
+        except Exception as e:
+            logger.debug(f"Could not read pages of browser context: {str(e)}")
+        entry.last_used = time.monotonic()
+        async with self._lock:
+            self._idle.append(entry)
+            await self._evict(keep=self.max_idle)
+
+    async def _evict(self, keep: int) -> None:
+        now = time.monotonic()
+        expired = [entry for entry in self._idle if now - entry.last_used > self.idle_ttl]
+        surplus = sorted(self._idle, key=lambda entry: entry.last_used)[:max(0, len(self._idle) - keep)]
+        for entry in {id(entry): entry for entry in expired + surplus}.values():
+            self._idle.remove(entry)
+            await self._close(entry)
+
+    async def _close(self, entry: _PooledContext) -> None:
+        try:
+            await entry.context.close()
+        except Exception as e:
+            logger.error(f"Failed to close browser context: {str(e)}", exc_info=True)
+
+    @asynccontextmanager
+    async def lease(self, domains: Sequence[str]) -> AsyncIterator[BrowserContext]:
+        """
+        Lease a browser context for one task, preferring one warm for its domains.
+
+        Args:
+            domains (Sequence[str]): Domains the task refers to
+        """
+        entry = await self._checkout(domains)
+        self._leased.append(entry)
+        try:
+            yield entry.context
+        except BaseException:
+            self._leased.remove(entry)
+            await self._close(entry)
+            raise
+        else:
+            self._leased.remove(entry)
+            await self._checkin(entry, domains)
+
+    def is_leased(self, playwright_context: Any) -> bool:
+        """Whether a Playwright context belongs to a context currently leased by a task."""
+        return any(
+            entry.context.session is not None and entry.context.session.context is playwright_context
+            for entry in self._leased
+        )
+
+    async def close(self) -> None:
+        """Close every idle context."""
+        async with self._lock:
+            await self._evict(keep=0)
+
+    async def reset(self) -> None:
+        """Forget every idle context without closing it, e.g. after its browser was killed."""
+        async with self._lock:
+            self._idle.clear()
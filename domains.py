@@ -0,0 +1,49 @@
+import re
+from typing import List
+from urllib.parse import urlparse
+
+_URL_PATTERN = re.compile(r'https?://[^\s\'"<>)]+', re.IGNORECASE)
+_DOMAIN_PATTERN = re.compile(r'\b((?:[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?\.)+([a-z]{2,24}))\b', re.IGNORECASE)
+
+# Top-level domains recognized in bare host names. URLs are taken as they are,
+# but a bare "name.ext" is only a domain if ext is listed here, so that file
+# names like README.md or report.py don't count. Country codes that are also
+# common file extensions or attribute names (md, py, rs, sh, so, ps, pl, id) are
+# left out on purpose.
+KNOWN_TLDS = frozenset({
+    'com', 'org', 'net', 'edu', 'gov', 'mil', 'int', 'info', 'biz', 'pro',
+    'io', 'co', 'ai', 'app', 'dev', 'me', 'tv', 'cc', 'fm', 'gg', 'ly', 'to', 'xyz',
+    'online', 'site', 'shop', 'store', 'tech', 'cloud', 'blog', 'news', 'travel', 'jobs',
+    'us', 'ca', 'mx', 'br', 'ar', 'cl', 'uk', 'ie', 'de', 'fr', 'es', 'it', 'nl', 'be',
+    'ch', 'at', 'se', 'no', 'dk', 'fi', 'is', 'cz', 'hu', 'ro', 'gr', 'tr', 'ua', 'ru',
+    'eu', 'il', 'ae', 'in', 'cn', 'jp', 'kr', 'hk', 'tw', 'sg', 'my', 'th', 'vn',
+    'ph', 'au', 'nz', 'za', 'ng', 'ke',
+})
+
+
+def normalize_domain(host: str) -> str:
+    """Lower-case a host name and strip a leading 'www.'."""
+    host = host.lower().strip('.')
+    return host[4:] if host.startswith('www.') else host
+
+
+def extract_domains(task: str) -> List[str]:
+    """
+    Return the domains a task refers to, from URLs and from bare host names
+    with a known top-level domain (see KNOWN_TLDS).
+
+    Args:
+        task (str): The task description
+
+    Returns:
+        List[str]: Normalized domains in order of first appearance
+    """
+    domains: List[str] = []
+    for url in _URL_PATTERN.findall(task):
+        host = urlparse(url).hostname
+        if host:
+            domains.append(normalize_domain(host))
+    for host, tld in _DOMAIN_PATTERN.findall(_URL_PATTERN.sub(' ', task)):
+        if tld.lower() in KNOWN_TLDS:
+            domains.append(normalize_domain(host))
+    return list(dict.fromkeys(domains))
@@ -0,0 +1,375 @@
+import asyncio
+import email.utils
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Mapping, Optional
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FETCH_CACHE_DIR = 'fetch_cache'
+
+CACHEABLE_STATUSES = (200, 203, 301, 404, 410)
+
+# Headers that describe the original transfer rather than the cached body
+_DROPPED_HEADERS = {'connection', 'keep-alive', 'transfer-encoding', 'content-encoding', 'content-length', 'set-cookie'}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    url TEXT NOT NULL,
+    variant TEXT NOT NULL,
+    vary TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    headers TEXT NOT NULL,
+    body_hash TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    last_access REAL NOT NULL,
+    PRIMARY KEY (url, variant)
+);
+CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access);
+CREATE INDEX IF NOT EXISTS entries_body_hash ON entries (body_hash);
+"""
+
+
+def parse_cache_control(value: str) -> Dict[str, Optional[str]]:
+    """Parse a Cache-Control header into lower-cased directives."""
+    directives: Dict[str, Optional[str]] = {}
+    for part in value.split(','):
+        name, _, argument = part.strip().partition('=')
+        if name:
+            directives[name.lower()] = argument.strip('"') or None
+    return directives
+
+
+def _seconds(value: Optional[str]) -> Optional[int]:
+    try:
+        return max(0, int(value)) if value is not None else None
+    except ValueError:
+        return None
+
+
+def freshness_lifetime(headers: Mapping[str, str], override_ttl: Optional[int] = None) -> Optional[int]:
+    """
+    Seconds a response may be served from a shared cache, following RFC 9111.
+
+    Args:
+        headers (Mapping[str, str]): Lower-cased response headers
+        override_ttl (Optional[int]): Per-domain lifetime replacing the headers' one; 0 disables caching
+
+    Returns:
+        Optional[int]: Lifetime in seconds (0 means store but revalidate on every use),
+            or None if the response must not be stored
+    """
+    directives = parse_cache_control(headers.get('cache-control', ''))
+    if 'no-store' in directives or 'set-cookie' in headers or headers.get('vary', '').strip() == '*':
+        return None
+    if override_ttl is not None:
+        return override_ttl or None
+    if 'private' in directives:
+        return None
+    if 'no-cache' in directives:
+        lifetime = 0
+    elif _seconds(directives.get('s-maxage')) is not None:
+        lifetime = _seconds(directives['s-maxage'])
+    elif _seconds(directives.get('max-age')) is not None:
+        lifetime = _seconds(directives['max-age'])
+    elif 'expires' in headers:
+        expires = email.utils.parsedate_to_datetime(headers['expires']) if _is_http_date(headers['expires']) else None
+        date = email.utils.parsedate_to_datetime(headers['date']) if _is_http_date(headers.get('date', '')) else None
+        if expires is None:
+            return None
+        lifetime = int((expires - date).total_seconds()) if date else int(expires.timestamp() - time.time())
+    else:
+        lifetime = 0
+    lifetime = max(0, lifetime - (_seconds(headers.get('age')) or 0))
+    if lifetime == 0 and 'etag' not in headers and 'last-modified' not in headers:
+        return None
+    return lifetime
+
+
+def is_credentialed(request_headers: Mapping[str, str]) -> bool:
+    """Return True if a request carries cookies or credentials (lower-cased headers)."""
+    return 'cookie' in request_headers or 'authorization' in request_headers
+
+
+def _is_http_date(value: str) -> bool:
+    try:
+        return email.utils.parsedate_to_datetime(value) is not None
+    except (TypeError, ValueError):
+        return False
+
+
+def parse_domain_ttls(spec: str) -> Dict[str, int]:
+    """
+    Parse per-domain lifetime overrides of the form 'cdn.example.com=3600,api.example.com=0'.
+
+    Raises:
+        ValueError: If an entry is malformed
+    """
+    ttls = {}
+    for entry in filter(None, (part.strip() for part in spec.split(','))):
+        domain, _, ttl = entry.partition('=')
+        if not domain or not ttl.isdigit():
+            raise ValueError(f"Invalid fetch cache override '{entry}', expected domain=seconds")
+        ttls[domain.lower()] = int(ttl)
+    return ttls
+
+
+@dataclass
+class CachedResponse:
+    """A stored response and whether it can be served without revalidation."""
+
+    status: int
+    headers: Dict[str, str]
+    body: bytes
+    fresh: bool
+    url: str
+    variant: str
+
+
+class FetchCache:
+    """
+    Disk-backed, content-addressed HTTP response cache for browser contexts.
+
+    Response bodies are stored once per SHA-256 digest under `blobs/`, and an
+    SQLite index maps each URL (and the request headers it varies on) to a
+    body, its headers and its expiry. The directory can be shared by every
+    process on a host. Cache-Control, Expires, Age and Vary are honoured;
+    responses that set cookies, are private or carry Vary: * are not stored.
+    Requests with a Cookie or Authorization header may be answered for one
+    user only, so their responses are stored and served only if explicitly
+    marked `Cache-Control: public`; otherwise they always go to the origin.
+    Stale entries with an ETag or Last-Modified are revalidated with a
+    conditional request. Per-domain overrides replace the lifetime from the
+    headers (0 disables caching for the domain). When the bodies exceed
+    `max_bytes`, the least recently used entries are evicted.
+
+    Call `attach(context)` on a Playwright browser context to serve its GET
+    requests through the cache.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        max_bytes: int = 512 * 1024 * 1024,
+        max_object_bytes: int = 16 * 1024 * 1024,
+        domain_ttls: Optional[Dict[str, int]] = None,
+    ):
+        """
+        Args:
+            directory (Path): Cache directory, shared by all processes on the host
+            max_bytes (int): Size cap of the stored bodies
+            max_object_bytes (int): Larger responses are not stored
+            domain_ttls (Optional[Dict[str, int]]): Per-domain lifetime overrides in seconds;
+                a domain also matches its subdomains
+        """
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.max_object_bytes = max_object_bytes
+        self.domain_ttls = domain_ttls or {}
+        (self.directory / 'blobs').mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.directory / 'index.sqlite', timeout=30, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.executescript(_SCHEMA)
+
+    def override_ttl(self, url: str) -> Optional[int]:
+        host = (urlparse(url).hostname or '').lower()
+        while host:
+            if host in self.domain_ttls:
+                return self.domain_ttls[host]
+            host = host.partition('.')[2]
+        return None
+
+    def _blob_path(self, body_hash: str) -> Path:
+        return self.directory / 'blobs' / body_hash[:2] / body_hash
+
+    @staticmethod
+    def _variant(vary: str, request_headers: Mapping[str, str]) -> str:
+        names = sorted(filter(None, (name.strip().lower() for name in vary.split(','))))
+        return json.dumps({name: request_headers.get(name, '') for name in names}, sort_keys=True)
+
+    def lookup(self, url: str, request_headers: Mapping[str, str]) -> Optional[CachedResponse]:
+        """
+        Find a stored response matching a GET request.
+
+        Returns:
+            Optional[CachedResponse]: The response, fresh or due for revalidation, or None
+        """
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT variant, vary, status, headers, body_hash, expires_at FROM entries WHERE url = ?', (url,)
+            ).fetchall()
+            credentialed = is_credentialed(request_headers)
+            for variant, vary, status, headers, body_hash, expires_at in rows:
+                if self._variant(vary, request_headers) != variant:
+                    continue
+                headers = json.loads(headers)
+                if credentialed and 'public' not in parse_cache_control(headers.get('cache-control', '')):
+                    continue
+                try:
+                    body = self._blob_path(body_hash).read_bytes()
+                except OSError:
+                    self._db.execute('DELETE FROM entries WHERE url = ? AND variant = ?', (url, variant))
+                    self._db.commit()
+                    return None
+                self._db.execute(
+                    'UPDATE entries SET last_access = ? WHERE url = ? AND variant = ?', (time.time(), url, variant)
+                )
+                self._db.commit()
+                return CachedResponse(status, headers, body, time.time() < expires_at, url, variant)
+        return None
+
+    def store(self, url: str, request_headers: Mapping[str, str], status: int,
+              headers: Mapping[str, str], body: bytes) -> bool:
+        """
+        Store a response if its status and headers allow it.
+
+        Returns:
+            bool: True if the response was stored
+        """
+        headers = {name.lower(): value for name, value in headers.items()}
+        if status not in CACHEABLE_STATUSES or len(body) > self.max_object_bytes:
+            return False
+        if is_credentialed(request_headers) and 'public' not in parse_cache_control(headers.get('cache-control', '')):
+            return False
+        lifetime = freshness_lifetime(headers, self.override_ttl(url))
+        if lifetime is None:
+            return False
+
+        body_hash = hashlib.sha256(body).hexdigest()
+        path = self._blob_path(body_hash)
+        if not path.exists():
+            path.parent.mkdir(exist_ok=True)
+            temporary = path.with_suffix(f'.{os.getpid()}.{threading.get_ident()}.tmp')
+            temporary.write_bytes(body)
+            os.replace(temporary, path)
+
+        vary = headers.get('vary', '')
+        stored_headers = {name: value for name, value in headers.items() if name not in _DROPPED_HEADERS}
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (url, self._variant(vary, request_headers), vary, status, json.dumps(stored_headers),
+                 body_hash, len(body), now + lifetime, now)
+            )
+            self._db.commit()
+            self._evict()
+        return True
+
+    def refresh(self, cached: CachedResponse, headers: Mapping[str, str]) -> None:
+        """Extend a revalidated entry using the headers of a 304 response."""
+        headers = {name.lower(): value for name, value in headers.items()}
+        lifetime = freshness_lifetime({**cached.headers, **headers}, self.override_ttl(cached.url)) or 0
+        with self._lock:
+            self._db.execute(
+                'UPDATE entries SET expires_at = ? WHERE url = ? AND variant = ?',
+                (time.time() + lifetime, cached.url, cached.variant)
+            )
+            self._db.commit()
+
+    def total_bytes(self) -> int:
+        row = self._db.execute('SELECT SUM(size) FROM (SELECT DISTINCT body_hash, size FROM entries)').fetchone()
+        return row[0] or 0
+
+    def _evict(self) -> None:
+        total = self.total_bytes()
+        if total <= self.max_bytes:
+            return
+        target = self.max_bytes * 0.9
+        rows = self._db.execute('SELECT url, variant, body_hash, size FROM entries ORDER BY last_access').fetchall()
+        for url, variant, body_hash, size in rows:
+            if total <= target:
+                break
+            self._db.execute('DELETE FROM entries WHERE url = ? AND variant = ?', (url, variant))
+            if not self._db.execute('SELECT 1 FROM entries WHERE body_hash = ? LIMIT 1', (body_hash,)).fetchone():
+                self._blob_path(body_hash).unlink(missing_ok=True)
+                total -= size
+        self._db.commit()
+        logger.debug(f"Fetch cache evicted down to {total} bytes")
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    async def attach(self, context: Any) -> None:
+        """Serve the GET requests of a Playwright browser context through the cache."""
+        await context.route('**/*', self._handle_route)
+
+    async def _handle_route(self, route: Any) -> None:
+        request = route.request
+        if request.method != 'GET' or not request.url.startswith(('http://', 'https://')):
+            await route.fallback()
+            return
+        if self.override_ttl(request.url) == 0:
+            await route.fallback()
+            return
+        # request.headers leaves out Cookie, which decides whether a response may be shared
+        request_headers = {name.lower(): value for name, value in (await request.all_headers()).items()}
+
+        try:
+            cached = await asyncio.to_thread(self.lookup, request.url, request_headers)
+        except Exception as e:
+            logger.error(f"Fetch cache lookup failed: {str(e)}", exc_info=True)
+            cached = None
+        if cached and cached.fresh:
+            await route.fulfill(status=cached.status, headers=cached.headers, body=cached.body)
+            return
+
+        fetch_headers = dict(request.headers)
+        if cached:
+            if 'etag' in cached.headers:
+                fetch_headers['if-none-match'] = cached.headers['etag']
+            if 'last-modified' in cached.headers:
+                fetch_headers['if-modified-since'] = cached.headers['last-modified']
+        try:
+            response = await route.fetch(headers=fetch_headers, max_redirects=0)
+        except Exception as e:
+            logger.debug(f"Fetch cache could not fetch {request.url}: {str(e)}")
+            await route.fallback()
+            return
+
+        if response.status == 304 and cached:
+            await asyncio.to_thread(self.refresh, cached, response.headers)
+            await route.fulfill(status=cached.status, headers=cached.headers, body=cached.body)
+            return
+
+        body = await response.body()
+        # The body is already decoded; cookies still have to reach the browser
+        headers = {
+            name: value for name, value in response.headers.items()
+            if name.lower() == 'set-cookie' or name.lower() not in _DROPPED_HEADERS
+        }
+        await route.fulfill(status=response.status, headers=headers, body=body)
+        try:
+            await asyncio.to_thread(self.store, request.url, request_headers, response.status, response.headers, body)
+        except Exception as e:
+            logger.error(f"Fetch cache store failed: {str(e)}", exc_info=True)
+
+
+def create_fetch_cache(enabled: bool, directory: str = DEFAULT_FETCH_CACHE_DIR, max_bytes: int = 512 * 1024 * 1024,
+                       domain_ttls: str = '') -> Optional[FetchCache]:
+    """
+    Create the host-wide fetch cache from service configuration.
+
+    Args:
+        enabled (bool): Whether the cache is used at all
+        directory (str): Cache directory
+        max_bytes (int): Size cap of the stored bodies
+        domain_ttls (str): Per-domain overrides, see parse_domain_ttls()
+
+    Returns:
+        Optional[FetchCache]: The cache, or None if disabled
+    """
+    if not enabled:
+        return None
+    return FetchCache(Path(directory), max_bytes=max_bytes, domain_ttls=parse_domain_ttls(domain_ttls))
@@ -0,0 +1,336 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import psutil
+import redis
+from browser_use.browser.browser import Browser
+
+logger = logging.getLogger(__name__)
+
+
+def _browser_processes(pid: int) -> list:
+    """
+    Return a browser process and its children, if it was started by this process.
+
+    Only the given browser's process tree is returned, never other browsers
+    launched by the same service (e.g. by concurrent UI sessions).
+    """
+    try:
+        descendants = {child.pid for child in psutil.Process().children(recursive=True)}
+        if pid not in descendants:
+            return []
+        process = psutil.Process(pid)
+        return [process] + process.children(recursive=True)
+    except psutil.Error:
+        return []
+
+
+class BrowserWatchdog:
+    """
+    Detects stuck pages and an unresponsive browser, and recycles the browser.
+
+    Every `interval` seconds the watchdog asks the browser for its version over
+    CDP and evaluates a trivial expression in every open page, each bounded by
+    `probe_timeout`. Pages of contexts that a task is using (`is_context_busy`)
+    are not probed, since a page that is loading a slow site is not stuck. A
+    page that misses `page_failure_threshold` probes in a row is closed. After
+    `failure_threshold` consecutive failed browser checks the browser is
+    closed, or its process tree killed if closing hangs, and the browser_use
+    Browser is reset so that the next task launches a fresh one. The service
+    keeps running throughout.
+    """
+
+    def __init__(
+        self,
+        browser: Browser,
+        interval: float = 15.0,
+        probe_timeout: float = 10.0,
+        failure_threshold: int = 2,
+        page_failure_threshold: int = 3,
+        is_context_busy: Optional[Callable[[Any], bool]] = None,
+        on_recycle: Optional[Callable[[], Awaitable[None]]] = None,
+    ):
+        """
+        Args:
+            browser (Browser): The browser shared by the service's tasks
+            interval (float): Seconds between checks
+            probe_timeout (float): Seconds a browser or page has to answer a probe
+            failure_threshold (int): Consecutive failed checks before the browser is recycled
+            page_failure_threshold (int): Consecutive failed probes before a page is closed
+            is_context_busy (Optional[Callable[[Any], bool]]): Whether a Playwright context
+                is in use by a task, whose pages are then left alone
+            on_recycle (Optional[Callable[[], Awaitable[None]]]): Called after a recycle,
+                e.g. to drop pooled contexts of the old browser
+        """
+        self.browser = browser
+        self.interval = interval
+        self.probe_timeout = probe_timeout
+        self.failure_threshold = failure_threshold
+        self.page_failure_threshold = page_failure_threshold
+        self.is_context_busy = is_context_busy
+        self.on_recycle = on_recycle
+        self.browser_pid: Optional[int] = None
+        self._probed_browser: Any = None
+        self._page_failures: Dict[Any, int] = {}
+        self.consecutive_failures = 0
+        self.recycles = 0
+        self.recycling = False
+        self.last_check: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    @property
+    def healthy(self) -> bool:
+        return not self.recycling and self.consecutive_failures == 0
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            'healthy': self.healthy,
+            'launched': self.browser.playwright_browser is not None,
+            'recycling': self.recycling,
+            'consecutive_failures': self.consecutive_failures,
+            'recycles': self.recycles,
+            'last_check_age': None if self.last_check is None else round(time.monotonic() - self.last_check, 1),
+            'last_error': self.last_error,
+        }
+
+    async def _probe_browser(self, playwright_browser: Any) -> None:
+        cdp = await playwright_browser.new_browser_cdp_session()
+        try:
+            await cdp.send('Browser.getVersion')
+            if self._probed_browser is not playwright_browser:
+                # Remember the browser's process while it answers, to kill it if it hangs later
+                self._probed_browser = playwright_browser
+                self.browser_pid = None
+                try:
+                    info = await cdp.send('SystemInfo.getProcessInfo')
+                    self.browser_pid = next(
+                        (process['id'] for process in info.get('processInfo', []) if process.get('type') == 'browser'),
+                        None
+                    )
+                except Exception as e:
+                    logger.debug(f"Could not read browser process id: {str(e)}")
+        finally:
+            await cdp.detach()
+
+    async def _check_pages(self, playwright_browser: Any) -> int:
+        """Close pages that repeatedly do not answer; return how many were closed."""
+        stuck = 0
+        failures: Dict[Any, int] = {}
+        for context in list(playwright_browser.contexts):
+            if self.is_context_busy and self.is_context_busy(context):
+                continue
+            for page in list(context.pages):
+                try:
+                    await asyncio.wait_for(page.evaluate('1'), self.probe_timeout)
+                except asyncio.TimeoutError:
+                    failures[page] = self._page_failures.get(page, 0) + 1
+                    if failures[page] < self.page_failure_threshold:
+                        logger.info(f"Page {page.url} did not answer ({failures[page]}/{self.page_failure_threshold})")
+                        continue
+                    del failures[page]
+                    stuck += 1
+                    logger.warning(f"Page {page.url} is not responding, closing it")
+                    try:
+                        await asyncio.wait_for(page.close(), self.probe_timeout)
+                    except Exception as e:
+                        raise RuntimeError(f"Could not close stuck page {page.url}: {str(e)}") from e
+                except Exception:
+                    # Pages that closed or navigated during the probe are not stuck
+                    continue
+        # Pages that answered, closed or became busy start counting from zero again
+        self._page_failures = failures
+        return stuck
+
+    async def check(self) -> bool:
+        """
+        Probe the browser and its pages once.
+
+        Returns:
+            bool: True if the browser answered (or has not been launched yet)
+        """
+        self.last_check = time.monotonic()
+        playwright_browser = self.browser.playwright_browser
+        if playwright_browser is None:
+            self.consecutive_failures = 0
+            return True
+        try:
+            if not playwright_browser.is_connected():
+                raise RuntimeError("Browser is disconnected")
+            await asyncio.wait_for(self._probe_browser(playwright_browser), self.probe_timeout)
+            stuck = await self._check_pages(playwright_browser)
+            if stuck:
+                logger.warning(f"Closed {stuck} stuck page(s)")
+        except Exception as e:
+            self.consecutive_failures += 1
+            self.last_error = f"{type(e).__name__}: {str(e) or 'no answer within ' + str(self.probe_timeout) + 's'}"
+            logger.warning(f"Browser health check failed ({self.consecutive_failures}/{self.failure_threshold}): {self.last_error}")
+            return False
+        self.consecutive_failures = 0
+        return True
+
+    async def recycle(self) -> None:
+        """Close (or kill) the browser and reset it so the next task launches a new one."""
+        self.recycling = True
+        try:
+            logger.warning("Recycling unresponsive browser")
+            try:
+                await asyncio.wait_for(self.browser.close(), self.probe_timeout)
+            except Exception as e:
+                logger.error(f"Browser did not close cleanly, killing it: {str(e) or type(e).__name__}")
+                try:
+                    processes = _browser_processes(self.browser_pid) if self.browser_pid else []
+                    if not processes:
+                        logger.error("Browser process not known, leaving it running")
+                    for process in processes:
+                        try:
+                            process.kill()
+                        except psutil.Error:
+                            continue
+                finally:
+                    self.browser.playwright_browser = None
+                    self.browser.playwright = None
+                    self.browser_pid = None
+                    self._probed_browser = None
+            if self.on_recycle:
+                await self.on_recycle()
+            self.recycles += 1
+            self.consecutive_failures = 0
+            logger.info("Browser recycled, the next task launches a fresh one")
+        finally:
+            self.recycling = False
+
+    async def run(self) -> None:
+        """Check the browser every interval, recycling it after repeated failures."""
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                if not await self.check() and self.consecutive_failures >= self.failure_threshold:
+                    await self.recycle()
+            except Exception as e:
+                logger.error(f"Browser watchdog error: {str(e)}", exc_info=True)
+
+
+class HealthMonitor:
+    """
+    Liveness and readiness of a service.
+
+    Liveness means the event loop is serving and every registered heartbeat
+    (e.g. a polling loop) is fresh. Readiness additionally requires Redis to
+    answer a ping and the browser watchdog to report a healthy browser, so an
+    orchestrator can route load away from a degraded replica.
+    """
+
+    def __init__(self, service: str, redis_client: redis.Redis,
+                 watchdog: Optional[BrowserWatchdog] = None, redis_timeout: float = 2.0):
+        """
+        Args:
+            service (str): Service name included in reports
+            redis_client (redis.Redis): Connection checked for readiness
+            watchdog (Optional[BrowserWatchdog]): Watchdog reporting browser health
+            redis_timeout (float): Seconds Redis has to answer a ping
+        """
+        self.service = service
+        self.redis = redis_client
+        self.watchdog = watchdog
+        self.redis_timeout = redis_timeout
+        self.started = time.monotonic()
+        self.shutting_down = False
+        self._heartbeats: Dict[str, Tuple[float, float]] = {}
+
+    def heartbeat(self, name: str, stale_after: float) -> None:
+        """Record that a background loop is alive; it is stale after stale_after seconds."""
+        self._heartbeats[name] = (time.monotonic(), stale_after)
+
+    def heartbeat_callback(self, name: str, stale_after: float) -> Callable[[Any, Any, int], Awaitable[None]]:
+        """Return a browser_use step callback (a coroutine function) that records a heartbeat on every agent step."""
+        async def on_step(state: Any, model_output: Any, step: int) -> None:
+            self.heartbeat(name, stale_after)
+        return on_step
+
+    def _stale_heartbeats(self) -> Dict[str, float]:
+        now = time.monotonic()
+        return {
+            name: round(now - beat, 1)
+            for name, (beat, stale_after) in self._heartbeats.items()
+            if now - beat > stale_after
+        }
+
+    async def _ping_redis(self) -> Optional[str]:
+        try:
+            await asyncio.wait_for(asyncio.to_thread(self.redis.ping), self.redis_timeout)
+        except asyncio.TimeoutError:
+            return f"no answer within {self.redis_timeout}s"
+        except redis.RedisError as e:
+            return str(e)
+        return None
+
+    def liveness(self) -> Tuple[bool, Dict[str, Any]]:
+        stale = self._stale_heartbeats()
+        return not stale, {
+            'status': 'ok' if not stale else 'stale',
+            'service': self.service,
+            'uptime': round(time.monotonic() - self.started, 1),
+            'stale_heartbeats': stale,
+        }
+
+    async def readiness(self) -> Tuple[bool, Dict[str, Any]]:
+        alive, report = self.liveness()
+        redis_error = await self._ping_redis()
+        browser = self.watchdog.status() if self.watchdog else None
+        ready = (
+            alive
+            and not self.shutting_down
+            and redis_error is None
+            and (browser is None or browser['healthy'])
+        )
+        report.update({
+            'status': 'ready' if ready else 'not ready',
+            'shutting_down': self.shutting_down,
+            'redis': {'ok': redis_error is None, 'error': redis_error},
+            'browser': browser,
+        })
+        return ready, report
+
+
+async def serve_health(monitor: HealthMonitor, host: str = '0.0.0.0', port: int = 8080,
+                       routes: Optional[Dict[str, Callable[[], Any]]] = None) -> asyncio.AbstractServer:
+    """
+    Serve GET /healthz and GET /readyz for services without an HTTP server.
+
+    Returns 200 or 503 with the JSON report of HealthMonitor. Extra `routes`
+    map a path to a callable whose JSON-serializable result is returned with 200.
+
+    Returns:
+        asyncio.AbstractServer: The running server; close() stops it
+    """
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), 5)
+            parts = request_line.decode('latin-1').split()
+            path = parts[1].split('?')[0] if len(parts) >= 2 else ''
+            if path == '/healthz':
+                ok, body = monitor.liveness()
+            elif path == '/readyz':
+                ok, body = await monitor.readiness()
+            elif routes and path in routes:
+                ok, body = True, routes[path]()
+            else:
+                ok, body = None, {'status': 'error', 'message': 'Not found'}
+            status = '404 Not Found' if ok is None else '200 OK' if ok else '503 Service Unavailable'
+            payload = json.dumps(body).encode()
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode() + payload
+            )
+            await writer.drain()
+        except Exception as e:
+            logger.debug(f"Health request failed: {str(e)}")
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    logger.info(f"Health endpoints listening on {host}:{port}")
+    return server
@@ -0,0 +1,103 @@
+import gzip
+import json
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SpilledStep:
+    """Lazy reference to an agent history step that was moved to disk."""
+
+    index: int
+    path: Path
+    url: Optional[str]
+    has_screenshot: bool
+
+    def load(self) -> Dict[str, Any]:
+        """Read the full step back from disk, screenshot included."""
+        with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+            return json.load(f)
+
+    def screenshot(self) -> Optional[str]:
+        """Return the step's base64 screenshot, if it had one."""
+        if not self.has_screenshot:
+            return None
+        return (self.load().get('state') or {}).get('screenshot')
+
+
+class HistorySpiller:
+    """
+    Bounds the memory held by an agent's history during a run.
+
+    The newest `window` steps stay untouched in memory. Older steps are written
+    to compressed files in the run's directory, and their screenshots, which
+    are the bulk of each step, are dropped from memory. Everything else in the
+    history is kept, so the final result, errors and checkpoints work as
+    before, and the dropped screenshots can still be read back through the
+    lazy `spilled` references.
+
+    Register `on_step` as (part of) the agent's step callback and call
+    `attach(agent)` once the agent exists.
+    """
+
+    def __init__(self, directory: Path, window: int = 3):
+        """
+        Args:
+            directory (Path): Directory the spilled steps are written to
+            window (int): Number of most recent steps kept fully in memory
+        """
+        self.directory = directory
+        self.window = max(1, window)
+        self.spilled: List[SpilledStep] = []
+        self._agent = None
+
+    def attach(self, agent: Any) -> None:
+        self._agent = agent
+
+    async def on_step(self, state: Any, model_output: Any, step: int) -> None:
+        """Step callback for browser_use agents, which await it; spills steps that left the window."""
+        self.spill()
+
+    def spill(self) -> None:
+        """Move every step older than the in-memory window to disk."""
+        if self._agent is None:
+            return
+        items = self._agent.state.history.history
+        while len(self.spilled) < len(items) - self.window:
+            index = len(self.spilled)
+            self.spilled.append(self._spill_item(index, items[index]))
+
+    def _spill_item(self, index: int, item: Any) -> SpilledStep:
+        state = getattr(item, 'state', None)
+        screenshot = getattr(state, 'screenshot', None)
+        path = self.directory / f"step-{index + 1:05d}.json.gz"
+        self.directory.mkdir(parents=True, exist_ok=True)
+        try:
+            with gzip.open(path, 'wt', encoding='utf-8', compresslevel=5) as f:
+                json.dump(item.model_dump(), f)
+        except Exception as e:
+            logger.error(f"Failed to spill history step {index + 1}: {str(e)}", exc_info=True)
+            return SpilledStep(index, path, getattr(state, 'url', None), False)
+        if state is not None:
+            state.screenshot = None
+        return SpilledStep(index, path, getattr(state, 'url', None), bool(screenshot))
+
+    def iter_screenshots(self) -> Iterator[str]:
+        """
+        Yield the screenshots of the whole run in order, loading spilled ones lazily.
+
+        This is enough to rebuild a recording, e.g. by feeding TaskRecorder.add_frame.
+        """
+        for step in self.spilled:
+            screenshot = step.screenshot()
+            if screenshot:
+                yield screenshot
+        if self._agent is not None:
+            for item in self._agent.state.history.history[len(self.spilled):]:
+                screenshot = getattr(getattr(item, 'state', None), 'screenshot', None)
+                if screenshot:
+                    yield screenshot
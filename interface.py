@@ -1,21 +1,22 @@
-import asyncio
+import hashlib
 import os
-import time
 from dataclasses import dataclass
-from typing import List, Optional
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 
 import gradio as gr
 from gradio import Blocks, Markdown, Row, Column, Textbox, Dropdown, Checkbox, Button
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
-from langchain_anthropic import ChatAnthropic
-from langchain_google_genai import ChatGoogleGenerativeAI
 from rich.console import Console
 from rich.panel import Panel
 from rich.text import Text
 
 from browser_use import Agent, Browser
-from browser_use.browser.browser import BrowserContext
+from browser_use.browser.browser import BrowserConfig
+
+from artifacts import new_run_id, run_dir
+from llm_router import create_chat_model
+from recording import TaskRecorder
 
 load_dotenv()
 
@@ -53,37 +54,51 @@ def parse_agent_history(history_str: str) -> None:
 			console.print()
 
 
+# One browser process shared by every session; each run gets its own context
+_browser: Optional[Browser] = None
+
+
+def get_browser() -> Browser:
+	global _browser
+	if _browser is None:
+		_browser = Browser(config=BrowserConfig(headless=True))
+	return _browser
+
+
+def get_session_llm(session_llms: Dict[Tuple[str, str, str], object], provider: str, model: str, api_key: str):
+	key = (provider, model, hashlib.sha256(api_key.encode()).hexdigest())
+	if key not in session_llms:
+		# Pass the key to the client directly so sessions never share credentials via os.environ
+		session_llms[key] = create_chat_model(provider, model, api_key=api_key)
+	return session_llms[key]
+
+
 async def run_browser_task(
 	task: str,
 	api_key: str,
 	provider: str = 'openai',
 	model: str = 'gpt-4-vision',
-	headless: bool = True,
-) -> str:
+	session_llms: Optional[Dict[Tuple[str, str, str], object]] = None,
+) -> Tuple[str, Optional[Path]]:
 	if not api_key.strip():
-		return 'Please provide an API key'
-
-	if provider == 'openai':
-		os.environ['OPENAI_API_KEY'] = api_key
-		llm = ChatOpenAI(model=model)
-	elif provider == 'anthropic':
-		os.environ['ANTHROPIC_API_KEY'] = api_key
-		llm = ChatAnthropic(model=model)
-	else:  # google
-		os.environ['GOOGLE_API_KEY'] = api_key
-		llm = ChatGoogleGenerativeAI(model=model)
+		return 'Please provide an API key', None
+
+	llm = get_session_llm(session_llms if session_llms is not None else {}, provider, model, api_key)
+	recorder = TaskRecorder(run_dir(new_run_id()), fmt='gif')
 
 	try:
 		agent = Agent(
 			task=task,
 			llm=llm,
-			browser=Browser(BrowserContext(headless=True))
+			browser=get_browser(),
+			generate_gif=False,
+			register_new_step_callback=recorder.on_step,
 		)
 		result = await agent.run()
 		#  TODO: The result cloud be parsed better
-		return result
+		return result, await recorder.close()
 	except Exception as e:
-		return f'Error: {str(e)}'
+		return f'Error: {str(e)}', await recorder.close()
 
 
 def create_ui():
@@ -145,17 +160,20 @@ def create_ui():
 			outputs=[model]
 		)
 
-		def on_task_complete(*args):
-			result = asyncio.run(run_browser_task(*args))
-			# Give a moment for the gif to be generated
-			time.sleep(2)
-			if os.path.exists("agent_history.gif"):
-				return result, "agent_history.gif", "agent_history.gif"
+		session_llms = gr.State({})
+
+		async def on_task_complete(task, api_key, provider, model, session_llms):
+			result, recording_path = await run_browser_task(
+				task, api_key, provider, model, session_llms=session_llms
+			)
+			# The recording is complete once run_browser_task returns
+			if recording_path:
+				return result, str(recording_path), str(recording_path)
 			return result, None, None
 
 		submit_btn.click(
 			fn=on_task_complete,
-			inputs=[task, api_key, provider, model],
+			inputs=[task, api_key, provider, model, session_llms],
 			outputs=[output, gif_output, download_btn],
 		)
 
@@ -164,4 +182,5 @@ def create_ui():
 
 if __name__ == '__main__':
 	demo = create_ui()
+	demo.queue(default_concurrency_limit=int(os.getenv('GRADIO_CONCURRENCY', 4)))
 	demo.launch(share=True)
@@ -0,0 +1,405 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import Runnable, RunnableConfig
+from pydantic import Field
+
+logger = logging.getLogger(__name__)
+
+PROVIDERS = ('openai', 'anthropic', 'google')
+
+# Last-message size (in characters) under which a step counts as easy
+EASY_STEP_MAX_CHARS = 4000
+
+
+def create_chat_model(provider: str, model: str, api_key: Optional[str] = None, **kwargs: Any):
+    """
+    Create a LangChain chat model for one of the supported providers.
+
+    Args:
+        provider (str): One of 'openai', 'anthropic' or 'google'
+        model (str): Provider model name
+        api_key (Optional[str]): API key; the provider's environment variable is used if omitted
+        **kwargs: Extra model parameters such as temperature
+
+    Returns:
+        BaseChatModel: The chat model client
+
+    Raises:
+        ValueError: If the provider is not supported
+    """
+    if provider == 'openai':
+        from langchain_openai import ChatOpenAI
+        return ChatOpenAI(model=model, api_key=api_key, **kwargs) if api_key else ChatOpenAI(model=model, **kwargs)
+    elif provider == 'anthropic':
+        from langchain_anthropic import ChatAnthropic
+        return ChatAnthropic(model=model, api_key=api_key, **kwargs) if api_key else ChatAnthropic(model=model, **kwargs)
+    elif provider == 'google':
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        if api_key:
+            return ChatGoogleGenerativeAI(model=model, google_api_key=api_key, **kwargs)
+        return ChatGoogleGenerativeAI(model=model, **kwargs)
+    raise ValueError(f"Unsupported LLM provider '{provider}', expected one of {PROVIDERS}")
+
+
+def parse_route(spec: str) -> Tuple[str, str]:
+    """
+    Parse a 'provider:model' route specification.
+
+    Raises:
+        ValueError: If the specification is malformed or the provider unknown
+    """
+    provider, sep, model = spec.strip().partition(':')
+    if not sep or not model or provider not in PROVIDERS:
+        raise ValueError(f"Invalid LLM route '{spec}', expected provider:model with provider in {PROVIDERS}")
+    return provider, model
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """Return True if an LLM client error is an HTTP 429 / rate limit response."""
+    status = getattr(error, 'status_code', None)
+    if status is None:
+        status = getattr(getattr(error, 'response', None), 'status_code', None)
+    return status == 429 or 'ratelimit' in type(error).__name__.lower() or 'resource_exhausted' in str(error).lower()
+
+
+def is_easy_step(messages: Any) -> bool:
+    """
+    Default heuristic for steps that a cheaper model can handle.
+
+    A step is easy when its newest message is short text without images, e.g.
+    a small page state when vision is disabled.
+    """
+    if not isinstance(messages, Sequence) or not messages:
+        return False
+    last = messages[-1]
+    content = last.content if isinstance(last, BaseMessage) else last
+    if isinstance(content, str):
+        return len(content) <= EASY_STEP_MAX_CHARS
+    if isinstance(content, list):
+        if any(isinstance(part, dict) and part.get('type') in ('image', 'image_url') for part in content):
+            return False
+        text = ''.join(part.get('text', '') if isinstance(part, dict) else str(part) for part in content)
+        return len(text) <= EASY_STEP_MAX_CHARS
+    return False
+
+
+class ProviderState:
+    """Concurrency limit, latency statistics and rate-limit cooldown of one provider route."""
+
+    def __init__(self, name: str, max_concurrency: int, latency_window: int = 200):
+        self.name = name
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.latencies: deque = deque(maxlen=latency_window)
+        self.cooldown_until = 0.0
+
+    def record_latency(self, seconds: float) -> None:
+        self.latencies.append(seconds)
+
+    def p95(self, min_samples: int) -> Optional[float]:
+        """Return the 95th percentile latency, or None until min_samples calls were seen."""
+        if len(self.latencies) < min_samples:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+    def cool_down(self, seconds: float) -> None:
+        self.cooldown_until = time.monotonic() + seconds
+
+    @property
+    def cooling_down(self) -> bool:
+        return time.monotonic() < self.cooldown_until
+
+
+class RouteSet:
+    """
+    Routes calls across several runnables; the policy shared by LLMRouter and
+    the runnables derived from it.
+
+    - Ordered fallback: routes are tried in order; an error moves on to the next
+      route, and a rate limit (429) also takes the route out of rotation for
+      `cooldown_seconds`.
+    - Hedging: when a call takes longer than the route's observed p95 latency,
+      the same request is sent to the next route and the first answer wins.
+    - Per-provider concurrency limits through a semaphore per route.
+    - Easy steps (see `is_easy_step`) go to `cheap_route` first when configured.
+    """
+
+    def __init__(
+        self,
+        routes: List[Tuple[ProviderState, Runnable]],
+        cheap_route: Optional[Tuple[ProviderState, Runnable]] = None,
+        hedge: bool = True,
+        hedge_min_samples: int = 20,
+        hedge_min_delay: float = 1.0,
+        cooldown_seconds: float = 30.0,
+        easy_step: Callable[[Any], bool] = is_easy_step,
+    ):
+        """
+        Args:
+            routes (List[Tuple[ProviderState, Runnable]]): Routes in fallback order
+            cheap_route (Optional[Tuple[ProviderState, Runnable]]): Faster model for easy steps
+            hedge (bool): Send slow calls to a second route
+            hedge_min_samples (int): Calls observed on a route before it is hedged
+            hedge_min_delay (float): Lower bound in seconds for the hedging delay
+            cooldown_seconds (float): Time a rate limited route is skipped
+            easy_step (Callable[[Any], bool]): Predicate deciding which inputs are easy
+
+        Raises:
+            ValueError: If no routes are given
+        """
+        if not routes:
+            raise ValueError("LLMRouter needs at least one route")
+        self.routes = routes
+        self.cheap_route = cheap_route
+        self.hedge = hedge
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_min_delay = hedge_min_delay
+        self.cooldown_seconds = cooldown_seconds
+        self.easy_step = easy_step
+
+    def derive(self, transform: Callable[[Runnable], Runnable]) -> 'RouteSet':
+        """Return a route set over transformed runnables that shares limits and statistics."""
+        return RouteSet(
+            [(state, transform(model)) for state, model in self.routes],
+            cheap_route=(self.cheap_route[0], transform(self.cheap_route[1])) if self.cheap_route else None,
+            hedge=self.hedge,
+            hedge_min_samples=self.hedge_min_samples,
+            hedge_min_delay=self.hedge_min_delay,
+            cooldown_seconds=self.cooldown_seconds,
+            easy_step=self.easy_step,
+        )
+
+    def _candidates(self, input: Any) -> List[Tuple[ProviderState, Runnable]]:
+        routes = list(self.routes)
+        if self.cheap_route and self.easy_step(input):
+            routes.insert(0, self.cheap_route)
+        available = [route for route in routes if not route[0].cooling_down]
+        return available or routes
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        last_error: Optional[BaseException] = None
+        for state, model in self._candidates(input):
+            started = time.monotonic()
+            try:
+                result = model.invoke(input, config, **kwargs)
+            except Exception as e:
+                last_error = self._record_failure(state, e)
+                continue
+            state.record_latency(time.monotonic() - started)
+            return result
+        raise last_error
+
+    async def ainvoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        candidates = self._candidates(input)
+        pending: Dict[asyncio.Task, ProviderState] = {}
+        next_index = 0
+        last_error: Optional[BaseException] = None
+
+        def launch() -> None:
+            nonlocal next_index
+            state, model = candidates[next_index]
+            next_index += 1
+            pending[asyncio.create_task(self._call_route(state, model, input, config, kwargs))] = state
+
+        try:
+            while True:
+                if not pending:
+                    if next_index >= len(candidates):
+                        raise last_error
+                    launch()
+
+                timeout = None
+                if self.hedge and len(pending) == 1 and next_index < len(candidates):
+                    p95 = next(iter(pending.values())).p95(self.hedge_min_samples)
+                    if p95 is not None:
+                        timeout = max(p95, self.hedge_min_delay)
+
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    state = next(iter(pending.values()))
+                    logger.info(f"LLM route {state.name} exceeded p95 latency, hedging to {candidates[next_index][0].name}")
+                    launch()
+                    continue
+
+                for task in done:
+                    state = pending.pop(task)
+                    error = task.exception()
+                    if error is None:
+                        return task.result()
+                    last_error = self._record_failure(state, error)
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _call_route(self, state: ProviderState, model: Runnable, input: Any,
+                          config: Optional[RunnableConfig], kwargs: Dict[str, Any]) -> Any:
+        async with state.semaphore:
+            started = time.monotonic()
+            result = await model.ainvoke(input, config, **kwargs)
+            state.record_latency(time.monotonic() - started)
+            return result
+
+    def _record_failure(self, state: ProviderState, error: BaseException) -> BaseException:
+        if is_rate_limit_error(error):
+            logger.warning(f"LLM route {state.name} is rate limited, cooling down for {self.cooldown_seconds}s")
+            state.cool_down(self.cooldown_seconds)
+        else:
+            logger.warning(f"LLM route {state.name} failed: {type(error).__name__}: {str(error)}")
+        return error
+
+
+class RoutedRunnable(Runnable):
+    """A runnable derived from an LLMRouter, e.g. by with_structured_output, routed the same way."""
+
+    def __init__(self, route_set: RouteSet):
+        self.route_set = route_set
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        return self.route_set.invoke(input, config, **kwargs)
+
+    async def ainvoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        return await self.route_set.ainvoke(input, config, **kwargs)
+
+
+def _structured_output_kwargs(model: Runnable, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Pick the structured output method browser_use would pick for the model itself.
+
+    Agents only choose a method by the model's class name, which for a router
+    is LLMRouter, so OpenAI routes would otherwise lose function calling.
+    """
+    if kwargs.get('method') is None and type(model).__name__ in ('ChatOpenAI', 'AzureChatOpenAI'):
+        return {**kwargs, 'method': 'function_calling'}
+    return kwargs
+
+
+class LLMRouter(BaseChatModel):
+    """
+    Chat model that routes every call across several providers (see RouteSet).
+
+    It is a regular LangChain chat model, so browser_use agents accept it as
+    `llm` and `page_extraction_llm`. `with_structured_output` and `bind_tools`
+    return runnables routed over the derived runnables of every route, sharing
+    the same limits and statistics, which is how browser_use agents call the
+    model. Any chat model can be a route, including local fake chat models.
+    """
+
+    route_set: RouteSet = Field(exclude=True)
+    model_name: str = 'llm-router'
+
+    def __init__(
+        self,
+        routes: List[Tuple[ProviderState, Runnable]],
+        cheap_route: Optional[Tuple[ProviderState, Runnable]] = None,
+        hedge: bool = True,
+        hedge_min_samples: int = 20,
+        hedge_min_delay: float = 1.0,
+        cooldown_seconds: float = 30.0,
+        easy_step: Callable[[Any], bool] = is_easy_step,
+        **kwargs: Any,
+    ):
+        """
+        Args:
+            routes (List[Tuple[ProviderState, Runnable]]): Routes in fallback order
+            cheap_route (Optional[Tuple[ProviderState, Runnable]]): Faster model for easy steps
+            hedge (bool): Send slow calls to a second route
+            hedge_min_samples (int): Calls observed on a route before it is hedged
+            hedge_min_delay (float): Lower bound in seconds for the hedging delay
+            cooldown_seconds (float): Time a rate limited route is skipped
+            easy_step (Callable[[Any], bool]): Predicate deciding which inputs are easy
+            **kwargs: Passed to BaseChatModel, e.g. callbacks
+
+        Raises:
+            ValueError: If no routes are given
+        """
+        route_set = RouteSet(
+            routes,
+            cheap_route=cheap_route,
+            hedge=hedge,
+            hedge_min_samples=hedge_min_samples,
+            hedge_min_delay=hedge_min_delay,
+            cooldown_seconds=cooldown_seconds,
+            easy_step=easy_step,
+        )
+        primary = routes[0][1]
+        model_name = getattr(primary, 'model_name', None) or getattr(primary, 'model', None) or routes[0][0].name
+        super().__init__(route_set=route_set, model_name=str(model_name), **kwargs)
+
+    @classmethod
+    def from_models(cls, models: List[Tuple[str, Runnable]], max_concurrency: int = 8,
+                    cheap_model: Optional[Tuple[str, Runnable]] = None, **kwargs: Any) -> 'LLMRouter':
+        """
+        Build a router from (name, chat model) pairs.
+
+        Args:
+            models (List[Tuple[str, Runnable]]): Named models in fallback order
+            max_concurrency (int): Concurrent calls allowed per route
+            cheap_model (Optional[Tuple[str, Runnable]]): Named model for easy steps
+            **kwargs: Passed to LLMRouter
+        """
+        routes = [(ProviderState(name, max_concurrency), model) for name, model in models]
+        cheap_route = (ProviderState(cheap_model[0], max_concurrency), cheap_model[1]) if cheap_model else None
+        return cls(routes, cheap_route=cheap_route, **kwargs)
+
+    @property
+    def _llm_type(self) -> str:
+        return 'llm-router'
+
+    @property
+    def routes(self) -> List[Tuple[ProviderState, Runnable]]:
+        return self.route_set.routes
+
+    def with_structured_output(self, schema: Any, **kwargs: Any) -> Runnable:
+        return RoutedRunnable(self.route_set.derive(
+            lambda model: model.with_structured_output(schema, **_structured_output_kwargs(model, kwargs))
+        ))
+
+    def bind_tools(self, tools: Any, **kwargs: Any) -> Runnable:
+        return RoutedRunnable(self.route_set.derive(lambda model: model.bind_tools(tools, **kwargs)))
+
+    def get_num_tokens(self, text: str) -> int:
+        return self.routes[0][1].get_num_tokens(text)
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        message = self.route_set.invoke(messages, stop=stop, **kwargs)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        message = await self.route_set.ainvoke(messages, stop=stop, **kwargs)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+def build_router(
+    routes: List[str],
+    cheap_route: Optional[str] = None,
+    max_concurrency: int = 8,
+    hedge: bool = True,
+    **model_kwargs: Any,
+) -> LLMRouter:
+    """
+    Build a router from 'provider:model' specifications.
+
+    API keys are taken from each provider's usual environment variable.
+
+    Args:
+        routes (List[str]): Route specifications in fallback order
+        cheap_route (Optional[str]): Route specification for easy steps
+        max_concurrency (int): Concurrent calls allowed per route
+        hedge (bool): Send slow calls to a second route
+        **model_kwargs: Extra model parameters such as temperature
+
+    Returns:
+        LLMRouter: The configured router
+    """
+    models = [(spec, create_chat_model(*parse_route(spec), **model_kwargs)) for spec in routes]
+    cheap_model = (cheap_route, create_chat_model(*parse_route(cheap_route), **model_kwargs)) if cheap_route else None
+    return LLMRouter.from_models(models, max_concurrency=max_concurrency, cheap_model=cheap_model, hedge=hedge)
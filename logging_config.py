@@ -0,0 +1,173 @@
+import atexit
+import contextvars
+import copy
+import hashlib
+import logging
+import logging.handlers
+import queue
+import random
+from typing import Optional, Tuple
+
+from pythonjsonlogger import jsonlogger
+
+VALID_LOG_LEVELS = {
+    'DEBUG': logging.DEBUG,
+    'INFO': logging.INFO,
+    'WARNING': logging.WARNING,
+    'ERROR': logging.ERROR,
+    'CRITICAL': logging.CRITICAL
+}
+
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - [%(name)s:%(lineno)d] [task=%(task_id)s step=%(step)s] - %(message)s'
+JSON_FORMAT = '%(asctime)s %(levelname)s %(name)s %(lineno)d %(message)s %(task_id)s %(step)s'
+
+# Correlation ids of the task and agent step currently being processed
+task_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar('task_id', default=None)
+step_var: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar('step', default=None)
+
+
+def resolve_log_level(name: str) -> Tuple[str, int]:
+    """
+    Map a LOG_LEVEL name to a logging level, defaulting to INFO.
+
+    Returns:
+        Tuple[str, int]: The effective level name and its numeric value
+    """
+    name = name.upper()
+    if name not in VALID_LOG_LEVELS:
+        print(f"Warning: Invalid LOG_LEVEL '{name}'. Defaulting to INFO.")
+        return 'INFO', logging.INFO
+    return name, VALID_LOG_LEVELS[name]
+
+
+def bind_task(task_id: str) -> Tuple[contextvars.Token, contextvars.Token]:
+    """
+    Tag all following log records of the current asyncio task with task_id.
+
+    Returns:
+        Tuple[contextvars.Token, contextvars.Token]: Pass to reset_task() once the task is done,
+            for code that handles several tasks in one asyncio task
+    """
+    return task_id_var.set(task_id), step_var.set(None)
+
+
+def reset_task(tokens: Tuple[contextvars.Token, contextvars.Token]) -> None:
+    """Restore the correlation ids that were in place before the matching bind_task()."""
+    task_token, step_token = tokens
+    step_var.reset(step_token)
+    task_id_var.reset(task_token)
+
+
+def set_step(step: int) -> None:
+    """Tag all following log records of the current asyncio task with the agent step."""
+    step_var.set(step)
+
+
+async def track_step(state, model_output, step: int) -> None:
+    """
+    Step callback for browser_use agents that updates the step correlation id.
+
+    browser_use awaits the callback in the agent's own asyncio task, so the
+    step applies to that run's log records only.
+    """
+    set_step(step)
+
+
+def describe_task(task: str) -> str:
+    """Return a short, log-safe description of a task instead of the full task text."""
+    digest = hashlib.sha256(task.encode()).hexdigest()[:12]
+    return f"task#{digest} ({len(task)} chars)"
+
+
+class CorrelationFilter(logging.Filter):
+    """Adds the task_id and step correlation ids to every record."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.task_id = task_id_var.get()
+        record.step = step_var.get()
+        return True
+
+
+class DebugSampler(logging.Filter):
+    """Passes only a random fraction of DEBUG records; other levels always pass."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno > logging.DEBUG or random.random() < self.rate
+
+
+class _InProcessQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler for an in-process queue.
+
+    The stock handler formats the record eagerly so it can be pickled; records
+    never leave the process here, so only the message is resolved and the
+    formatting is left to the listener thread.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def configure_logging(
+    service: str,
+    log_file: str,
+    level: int = logging.INFO,
+    max_bytes: int = 10 * 1024 * 1024,
+    backup_count: int = 5,
+    debug_sample_rate: float = 1.0,
+) -> logging.handlers.QueueListener:
+    """
+    Configure root logging to go through a background queue listener.
+
+    Callers only pay for putting the record on an in-memory queue. A listener
+    thread writes human-readable lines to the console and JSON lines to a
+    size-rotated log file. Every record carries the task_id and step
+    correlation ids, and DEBUG records are sampled at debug_sample_rate.
+
+    Args:
+        service (str): Service name added to every JSON record
+        log_file (str): Path of the JSON log file
+        level (int): Root log level
+        max_bytes (int): Size at which the log file is rotated
+        backup_count (int): Number of rotated files kept
+        debug_sample_rate (float): Fraction of DEBUG records kept, between 0 and 1
+
+    Returns:
+        logging.handlers.QueueListener: The running listener; stop() flushes it
+    """
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+    file_handler = logging.handlers.RotatingFileHandler(
+        log_file, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8'
+    )
+    file_handler.setFormatter(jsonlogger.JsonFormatter(
+        JSON_FORMAT,
+        rename_fields={'asctime': 'timestamp', 'levelname': 'level', 'name': 'logger'},
+        static_fields={'service': service},
+    ))
+
+    log_queue: queue.Queue = queue.Queue(-1)
+    queue_handler = _InProcessQueueHandler(log_queue)
+    queue_handler.addFilter(DebugSampler(debug_sample_rate))
+    queue_handler.addFilter(CorrelationFilter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    listener = logging.handlers.QueueListener(
+        log_queue, console_handler, file_handler, respect_handler_level=True
+    )
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
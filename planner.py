@@ -0,0 +1,155 @@
+import asyncio
+import json
+import logging
+import re
+from typing import Any, Awaitable, Callable, Dict, List
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+logger = logging.getLogger(__name__)
+
+DECOMPOSE_PROMPT = """You split browser automation tasks into independent sub-tasks.
+If the task needs information from several websites or items that can be collected
+independently (for example comparing a price on sites A, B and C), return one
+self-contained sub-task per site or item. Each sub-task must make sense on its own
+and must not depend on another sub-task's result. If the task cannot be split,
+return a single sub-task equal to the original task.
+Reply with a JSON array of strings only, at most {max_subtasks} items."""
+
+AGGREGATE_PROMPT = """You combine the results of independent browser sub-tasks into
+the final answer to the original task. Use only the information in the sub-task
+results, say which sub-tasks failed, and answer in the form the original task asks for."""
+
+SubtaskRunner = Callable[[str], Awaitable[Dict[str, Any]]]
+
+
+def _message_text(message: Any) -> str:
+    content = getattr(message, 'content', message)
+    if isinstance(content, list):
+        return ''.join(part.get('text', '') if isinstance(part, dict) else str(part) for part in content)
+    return str(content)
+
+
+def parse_subtasks(text: str, max_subtasks: int) -> List[str]:
+    """
+    Extract the list of sub-tasks from the planner model's reply.
+
+    Returns:
+        List[str]: Sub-tasks, empty if the reply holds no usable JSON array
+    """
+    match = re.search(r'\[.*\]', text, re.DOTALL)
+    if not match:
+        return []
+    try:
+        items = json.loads(match.group(0))
+    except ValueError:
+        return []
+    subtasks = [item.strip() for item in items if isinstance(item, str) and item.strip()]
+    return subtasks[:max_subtasks]
+
+
+async def decompose_task(llm: Any, task: str, max_subtasks: int = 5) -> List[str]:
+    """
+    Split a task into independent sub-tasks with the language model.
+
+    Args:
+        llm: Chat model or router used for planning
+        task (str): The original task
+        max_subtasks (int): Upper bound on the number of sub-tasks
+
+    Returns:
+        List[str]: Sub-tasks, or [task] if the task cannot be split
+    """
+    try:
+        reply = await llm.ainvoke([
+            SystemMessage(content=DECOMPOSE_PROMPT.format(max_subtasks=max_subtasks)),
+            HumanMessage(content=task),
+        ])
+        subtasks = parse_subtasks(_message_text(reply), max_subtasks)
+    except Exception as e:
+        logger.error(f"Task decomposition failed, running as a single task: {str(e)}", exc_info=True)
+        return [task]
+    return subtasks if len(subtasks) > 1 else [task]
+
+
+async def aggregate_results(llm: Any, task: str, outcomes: List[Dict[str, Any]]) -> str:
+    """
+    Merge sub-task outcomes into the final answer with the language model.
+
+    Args:
+        llm: Chat model or router used for aggregation
+        task (str): The original task
+        outcomes (List[Dict[str, Any]]): One entry per sub-task with its result or error
+
+    Returns:
+        str: The final answer
+    """
+    sections = []
+    for number, outcome in enumerate(outcomes, 1):
+        body = f"Result: {outcome['result']}" if 'result' in outcome else f"Failed: {outcome['error']}"
+        sections.append(f"Sub-task {number}: {outcome['task']}\n{body}")
+    reply = await llm.ainvoke([
+        SystemMessage(content=AGGREGATE_PROMPT),
+        HumanMessage(content=f"Original task: {task}\n\n" + "\n\n".join(sections)),
+    ])
+    return _message_text(reply)
+
+
+async def run_planned(
+    task: str,
+    llm: Any,
+    run_subtask: SubtaskRunner,
+    run_single: SubtaskRunner,
+    max_subtasks: int = 5,
+    max_parallel: int = 3,
+) -> Dict[str, Any]:
+    """
+    Run a task as parallel independent sub-tasks and merge their results.
+
+    Each sub-task is executed by `run_subtask`, which is expected to run its own
+    agent on its own browser context with its own cache entry and step budget.
+
+    Args:
+        task (str): The original task
+        llm: Chat model or router used for planning and aggregation
+        run_subtask (SubtaskRunner): Coroutine returning {"result": ..., "cached": ...} for a sub-task
+        run_single (SubtaskRunner): Coroutine running the original task as a normal, unplanned
+            run if it cannot be split
+        max_subtasks (int): Upper bound on the number of sub-tasks
+        max_parallel (int): Sub-tasks running at the same time
+
+    Returns:
+        Dict[str, Any]: The merged result and the outcome of every sub-task
+
+    Raises:
+        Exception: If the task cannot be split and its single run fails, or if every sub-task fails
+    """
+    subtasks = await decompose_task(llm, task, max_subtasks)
+    if len(subtasks) == 1:
+        logger.info("Planner found no independent sub-tasks, running as a single task")
+        return await run_single(task)
+
+    logger.info(f"Planner split task into {len(subtasks)} sub-tasks")
+    semaphore = asyncio.Semaphore(max_parallel)
+
+    async def run_limited(subtask: str) -> Dict[str, Any]:
+        async with semaphore:
+            return await run_subtask(subtask)
+
+    results = await asyncio.gather(*(run_limited(subtask) for subtask in subtasks), return_exceptions=True)
+    outcomes = []
+    for subtask, result in zip(subtasks, results):
+        if isinstance(result, BaseException):
+            detail = getattr(result, 'detail', None) or str(result)
+            logger.warning(f"Sub-task failed: {detail}")
+            outcomes.append({'task': subtask, 'error': detail})
+        else:
+            outcomes.append({'task': subtask, 'result': result['result'], 'cached': result.get('cached', False)})
+
+    if all('error' in outcome for outcome in outcomes):
+        raise RuntimeError("All sub-tasks failed")
+
+    return {
+        'result': await aggregate_results(llm, task, outcomes),
+        'subtasks': outcomes,
+    }
@@ -0,0 +1,278 @@
+import asyncio
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from types import FrameType
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CPU_PROFILE_FILENAME = 'cpu.folded'
+WAITS_FILENAME = 'waits.json'
+BROWSER_TRACE_FILENAME = 'browser-trace.json'
+PROFILE_ARTIFACTS = (CPU_PROFILE_FILENAME, WAITS_FILENAME, BROWSER_TRACE_FILENAME)
+
+# Path fragments deciding what an awaiting task is waiting on, innermost frame first
+WAIT_CATEGORIES = (
+    ('llm', ('langchain', 'anthropic', 'openai', f'google{os.sep}genai', 'llm_router')),
+    ('browser', ('playwright', f'browser_use{os.sep}browser', f'browser_use{os.sep}dom', f'browser_use{os.sep}controller')),
+    ('redis', (f'{os.sep}redis{os.sep}', 'domain_scheduler')),
+    ('recording', ('recording',)),
+)
+
+# Leaf frames of threads that are blocked rather than using the CPU
+_IDLE_FILES = ('selectors.py', 'threading.py', 'queue.py')
+
+# Only one browser-wide Chromium trace can run at a time
+_browser_trace_lock = asyncio.Lock()
+
+
+def _frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """
+    Samples the Python stacks of every busy thread in the process.
+
+    Each sample is aggregated into folded stacks ("frame;frame;frame count"),
+    which flamegraph.pl and speedscope read directly. Threads that are
+    blocked in a selector, lock or queue are not counted, so the result
+    approximates where the process spends CPU. The whole process is sampled,
+    so concurrent tasks show up too.
+    """
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name='profiler-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for thread in threading.enumerate():
+                names[thread.ident] = thread.name
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id or os.path.basename(frame.f_code.co_filename) in _IDLE_FILES:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def write(self, path: Path) -> None:
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def awaited_frames(task: asyncio.Task) -> List[FrameType]:
+    """Return the frames of a suspended task's await chain, outermost first."""
+    frames = []
+    awaitable: Any = task.get_coro()
+    while awaitable is not None:
+        frame = getattr(awaitable, 'cr_frame', None) or getattr(awaitable, 'ag_frame', None) \
+            or getattr(awaitable, 'gi_frame', None)
+        if frame is None:
+            # A future: follow it into the task it wraps, if any
+            coro = awaitable.get_coro() if isinstance(awaitable, asyncio.Task) else None
+            awaitable = coro
+            continue
+        frames.append(frame)
+        awaitable = getattr(awaitable, 'cr_await', None) or getattr(awaitable, 'ag_await', None) \
+            or getattr(awaitable, 'gi_yieldfrom', None)
+    return frames
+
+
+def classify_wait(frames: List[FrameType]) -> Tuple[str, Optional[FrameType]]:
+    """
+    Name what an await chain is waiting on, judging by its innermost recognised
+    frame. Chains that end in asyncio.sleep without passing through a known
+    library count as 'sleep'.
+
+    Returns:
+        Tuple[str, Optional[FrameType]]: The category and the frame that decided it
+    """
+    for frame in reversed(frames):
+        filename = frame.f_code.co_filename
+        for category, fragments in WAIT_CATEGORIES:
+            if any(fragment in filename for fragment in fragments):
+                return category, frame
+    leaf = frames[-1] if frames else None
+    if leaf is not None and leaf.f_code.co_name == 'sleep' and 'asyncio' in leaf.f_code.co_filename:
+        return 'sleep', leaf
+    return 'other', leaf
+
+
+class TaskWaitSampler:
+    """
+    Breaks down where an asyncio task spends its time while it is suspended.
+
+    A sampler coroutine wakes up every `interval` seconds, walks the target
+    task's await chain and attributes the time since its previous sample to
+    the category (llm, browser, redis, ...) and innermost frame it is
+    waiting in. Late wake-ups mean the event loop was busy; that time is
+    counted as 'loop busy'.
+    """
+
+    def __init__(self, task: asyncio.Task, interval: float = 0.01):
+        self.task = task
+        self.interval = interval
+        self.seconds: Counter = Counter()
+        self.frames: Counter = Counter()
+        self._sampler: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._sampler = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._sampler:
+            self._sampler.cancel()
+            try:
+                await self._sampler
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        previous = loop.time()
+        while not self.task.done():
+            await asyncio.sleep(self.interval)
+            now = loop.time()
+            elapsed = now - previous
+            previous = now
+            lateness = max(0.0, elapsed - self.interval * 1.5)
+            if lateness:
+                self.seconds['loop busy'] += lateness
+            category, frame = classify_wait(awaited_frames(self.task))
+            self.seconds[category] += elapsed - lateness
+            if frame is not None:
+                self.frames[f"{category}: {_frame_label(frame)}"] += elapsed - lateness
+
+    def write(self, path: Path) -> None:
+        total = sum(self.seconds.values()) or 1.0
+        report = {
+            'interval': self.interval,
+            'total_seconds': round(total, 3),
+            'seconds': {category: round(seconds, 3) for category, seconds in self.seconds.most_common()},
+            'share': {category: round(seconds / total, 4) for category, seconds in self.seconds.most_common()},
+            'top_waits': [
+                {'frame': frame, 'seconds': round(seconds, 3)} for frame, seconds in self.frames.most_common(25)
+            ],
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+class TaskProfiler:
+    """
+    Opt-in profile of one task run, written to a directory of artifacts.
+
+    - cpu.folded: sampled Python stacks of the worker process (StackSampler)
+    - waits.json: what the calling asyncio task was waiting on (TaskWaitSampler)
+    - browser-trace.json: optional Chromium performance trace, viewable in
+      Chrome DevTools' Performance panel or chrome://tracing. The trace covers
+      the whole browser and only one can run at a time, so it is skipped
+      while another task is being traced.
+
+    Call `start()` from the task to profile and `stop()` when it is done.
+    """
+
+    def __init__(self, directory: Path, browser_trace: bool = False, interval: float = 0.01):
+        """
+        Args:
+            directory (Path): Directory the artifacts are written to
+            browser_trace (bool): Also record a Chromium performance trace
+            interval (float): Sampling interval in seconds
+        """
+        self.directory = directory
+        self.browser_trace = browser_trace
+        self.interval = interval
+        self._stacks = StackSampler(interval)
+        self._waits: Optional[TaskWaitSampler] = None
+        self._traced_browser: Any = None
+        self._started = 0.0
+
+    async def start(self, browser: Any = None) -> None:
+        """
+        Start profiling the current asyncio task.
+
+        Args:
+            browser: browser_use Browser to trace when browser_trace is set
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._started = time.monotonic()
+        self._stacks.start()
+        self._waits = TaskWaitSampler(asyncio.current_task(), self.interval)
+        self._waits.start()
+        if self.browser_trace and browser is not None:
+            if _browser_trace_lock.locked():
+                logger.warning("Another task is recording a browser trace, skipping it for this task")
+                return
+            await _browser_trace_lock.acquire()
+            try:
+                playwright_browser = await browser.get_playwright_browser()
+                await playwright_browser.start_tracing(
+                    path=str(self.directory / BROWSER_TRACE_FILENAME), screenshots=True
+                )
+                self._traced_browser = playwright_browser
+            except Exception as e:
+                _browser_trace_lock.release()
+                logger.error(f"Failed to start browser trace: {str(e)}", exc_info=True)
+
+    async def stop(self) -> List[str]:
+        """
+        Stop profiling and write the artifacts.
+
+        Returns:
+            List[str]: File names of the artifacts written
+        """
+        self._stacks.stop()
+        if self._waits:
+            await self._waits.stop()
+        if self._traced_browser is not None:
+            try:
+                await self._traced_browser.stop_tracing()
+            except Exception as e:
+                logger.error(f"Failed to stop browser trace: {str(e)}", exc_info=True)
+            finally:
+                self._traced_browser = None
+                _browser_trace_lock.release()
+
+        await asyncio.to_thread(self._stacks.write, self.directory / CPU_PROFILE_FILENAME)
+        if self._waits:
+            await asyncio.to_thread(self._waits.write, self.directory / WAITS_FILENAME)
+        logger.info(f"Profile written after {time.monotonic() - self._started:.1f}s")
+        return [name for name in PROFILE_ARTIFACTS if (self.directory / name).is_file()]
+
+
+def parse_profile_header(value: Optional[str]) -> Dict[str, bool]:
+    """
+    Parse an X-Profile header: 'true'/'1' enables profiling, 'browser' also
+    enables the browser trace. Anything else leaves profiling off.
+
+    Returns:
+        Dict[str, bool]: {'profile': ..., 'browser_trace': ...}
+    """
+    options = {part.strip().lower() for part in (value or '').split(',')}
+    browser_trace = 'browser' in options
+    return {'profile': browser_trace or bool(options & {'1', 'true', 'yes', 'on'}), 'browser_trace': browser_trace}
@@ -1,4 +1,5 @@
 import asyncio
+from contextlib import nullcontext
 import time
 from ably import AblyRest
 from browser_use.agent.service import Agent, Controller
@@ -7,7 +8,6 @@ from browser_use.browser.context import (
     BrowserContextConfig,
     BrowserContextWindowSize,
 )
-from langchain_anthropic import ChatAnthropic
 from ably.types.message import Message
 import redis
 import json
@@ -17,6 +17,23 @@ import signal
 import logging
 from dotenv import load_dotenv
 import threading
+from typing import Any, Dict, Optional
+
+from agent_hooks import chain_step_callbacks
+from artifacts import new_run_id, run_dir
+from checkpoint import RunCheckpointer, build_resume_task, create_checkpoint_store
+from domain_scheduler import ContextPool, DomainLimit, DomainScheduler, parse_domain_limits
+from domains import extract_domains
+from fetch_cache import create_fetch_cache
+from health import BrowserWatchdog, HealthMonitor, serve_health
+from history_spill import HistorySpiller
+from llm_router import build_router
+from logging_config import bind_task, configure_logging, describe_task, reset_task, resolve_log_level, track_step
+from recording import TaskRecorder
+from semantic_cache import create_semantic_cache
+from settings import Settings, SettingsManager
+from sinks import build_result_record, create_result_sinks
+
 # Clear the console
 os.system('cls' if os.name == 'nt' else 'clear')
 # ASCII Art Banner
@@ -42,30 +59,16 @@ print("""
 """)
 
 # Configure logging with level from environment
-VALID_LOG_LEVELS = {
-    'DEBUG': logging.DEBUG,
-    'INFO': logging.INFO,
-    'WARNING': logging.WARNING,
-    'ERROR': logging.ERROR,
-    'CRITICAL': logging.CRITICAL
-}
+log_level_name, log_level = resolve_log_level(os.getenv('LOG_LEVEL', 'INFO'))
 
-# Get log level from environment or default to INFO
-log_level_name = os.getenv('LOG_LEVEL', 'INFO').upper()
-if log_level_name not in VALID_LOG_LEVELS:
-    print(f"Warning: Invalid LOG_LEVEL '{log_level_name}'. Defaulting to INFO.")
-    log_level = logging.INFO
-else:
-    log_level = VALID_LOG_LEVELS[log_level_name]
-
-# Configure logging with detailed format
-logging.basicConfig(
+# Log through a background queue: console text plus size-rotated JSON file
+log_listener = configure_logging(
+    'realtime',
+    'realtime.log',
     level=log_level,
-    format='%(asctime)s - %(levelname)s - [%(name)s:%(lineno)d] - %(message)s',
-    handlers=[
-        logging.StreamHandler(),  # Console handler
-        logging.FileHandler('realtime.log')  # File handler
-    ]
+    max_bytes=int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024)),
+    backup_count=int(os.getenv('LOG_BACKUP_COUNT', 5)),
+    debug_sample_rate=float(os.getenv('LOG_DEBUG_SAMPLE_RATE', 1.0))
 )
 logger = logging.getLogger(__name__)
 logger.info(f"Initializing Browser Agent Realtime Service with log level: {log_level_name}")
@@ -93,9 +96,19 @@ logger.info("All required environment variables found")
 logger.info("Initializing core services")
 
 try:
+    # Load tuning settings: defaults, CONFIG_FILE, then environment; reloaded when the file changes
+    logger.info("Loading settings")
+    settings_manager = SettingsManager(
+        "realtime",
+        os.getenv("CONFIG_FILE") or None,
+        reload_interval=float(os.getenv("CONFIG_RELOAD_INTERVAL", 5))
+    )
+    startup_settings = settings_manager.settings
+    logger.info(f"Settings loaded{f' from {settings_manager.config_file}' if settings_manager.config_file else ''}")
+
     # Initialize browser with production configuration
     logger.info("Setting up browser configuration")
-    browser = Browser(BrowserConfig(headless=True))
+    browser = Browser(BrowserConfig(headless=startup_settings.headless))
     logger.info("Browser initialized successfully")
 
     # Initialize Ably client
@@ -109,12 +122,18 @@ try:
     controller = Controller()
     logger.info("Controller initialized successfully")
 
-    # Initialize language model
-    logger.info("Setting up OpenAI language model")
-    llm = ChatAnthropic(
-        model="claude-3-5-sonnet-20241022",
-        temperature=0.5,
+    # Initialize language model router (ordered fallback, hedging, per-provider limits)
+    logger.info("Setting up language model router")
+    llm_routes = startup_settings.llm_routes
+    llm_options = {} if startup_settings.llm_temperature is None else {"temperature": startup_settings.llm_temperature}
+    llm = build_router(
+        llm_routes,
+        cheap_route=startup_settings.llm_cheap_route,
+        max_concurrency=startup_settings.llm_max_concurrency,
+        hedge=startup_settings.llm_hedge,
+        **llm_options
     )
+    logger.info(f"LLM routes: {', '.join(llm_routes)}")
     logger.info("Language model initialized successfully")
 
     # Initialize Redis connection
@@ -125,19 +144,153 @@ try:
     redis_client.ping()
     logger.info("Redis connection established successfully")
 
+    # Configure task recordings
+    logger.info(f"Task recording format: {startup_settings.recording_format}")
+
+    # Initialize checkpoint store for resuming interrupted runs
+    logger.info("Setting up checkpoint store")
+    checkpoint_store = create_checkpoint_store(
+        startup_settings.checkpoint_backend,
+        redis_client=redis_client,
+        directory=startup_settings.checkpoint_dir,
+        lease_ttl=startup_settings.checkpoint_lease_ttl
+    )
+    resumed_runs = set()
+    logger.info("Checkpoint store initialized successfully")
+
+    # Optional lookup of cached results for paraphrased tasks
+    semantic_cache = create_semantic_cache(
+        startup_settings.semantic_cache_enabled,
+        redis_client,
+        threshold=startup_settings.semantic_cache_threshold,
+        domains=startup_settings.semantic_cache_domains,
+        model=startup_settings.semantic_cache_model
+    )
+    if semantic_cache:
+        logger.info(f"Semantic cache enabled with threshold {semantic_cache.threshold}")
+
+    # Per-domain concurrency and rate limits shared by all workers
+    logger.info("Setting up domain scheduler")
+    domain_scheduler = DomainScheduler(
+        redis_client,
+        DomainLimit(
+            max_concurrency=startup_settings.domain_max_concurrency,
+            rate_per_minute=startup_settings.domain_rate_per_minute
+        ),
+        overrides=parse_domain_limits(startup_settings.domain_limits),
+        max_wait=startup_settings.domain_max_wait
+    )
+
+    # Optional HTTP response cache shared by all browser contexts on this host
+    fetch_cache = create_fetch_cache(
+        startup_settings.fetch_cache_enabled,
+        directory=startup_settings.fetch_cache_dir,
+        max_bytes=startup_settings.fetch_cache_max_bytes,
+        domain_ttls=startup_settings.fetch_cache_domain_ttls
+    )
+    if fetch_cache:
+        logger.info(f"Fetch cache enabled at {fetch_cache.directory}")
+
+    # Browser contexts kept warm (cookies, connections) for later tasks on the same domains
+    context_pool = ContextPool(
+        browser,
+        max_idle=startup_settings.context_pool_size,
+        idle_ttl=startup_settings.context_pool_idle_ttl,
+        on_new_context=fetch_cache.attach if fetch_cache else None
+    )
+    logger.info("Domain scheduler initialized successfully")
+
+    # Watchdog recycling a hung browser, and health reporting on HEALTH_PORT
+    browser_watchdog = BrowserWatchdog(
+        browser,
+        interval=startup_settings.browser_watchdog_interval,
+        probe_timeout=startup_settings.browser_probe_timeout,
+        failure_threshold=startup_settings.browser_failure_threshold,
+        page_failure_threshold=startup_settings.browser_page_failure_threshold,
+        is_context_busy=context_pool.is_leased,
+        on_recycle=context_pool.reset
+    )
+    health_monitor = HealthMonitor("realtime", redis_client, watchdog=browser_watchdog)
+
+    # Batched result delivery to files, databases, a postback URL or Ably (at-least-once)
+    result_sinks = create_result_sinks(
+        os.getenv("RESULT_SINKS", ""),
+        spool_dir=os.path.join(startup_settings.result_sink_spool_dir, "realtime"),
+        batch_size=startup_settings.result_sink_batch_size,
+        flush_interval=startup_settings.result_sink_flush_interval,
+        ably=ably,
+    )
+    if result_sinks:
+        logger.info(f"Result sinks: {', '.join(writer.sink.name for writer in result_sinks.writers)}")
+
 except Exception as e:
     logger.error(f"Critical error during service initialization: {str(e)}", exc_info=True)
     sys.exit(1)
 
 logger.info("All core services initialized successfully")
 
-async def fetch_result(task: str, session: str):
+def fetch_similar_cached_result(task: str):
+    """
+    Look up the cached result of a paraphrase of the task, if the semantic cache
+    is enabled for the task's domains.
+    
+    Returns:
+        Optional[Any]: The decoded cached result, or None
+    """
+    if not semantic_cache or not semantic_cache.enabled_for(task):
+        return None
+    match = semantic_cache.lookup(task)
+    if not match:
+        return None
+    similar_task, similarity = match
+    cached_result = redis_client.get(f"browseragent:cache:{similar_task}")
+    if not cached_result:
+        return None
+    logger.info(f"Similar cache hit for {describe_task(similar_task)} (similarity {similarity:.3f})")
+    return json.loads(cached_result)
+
+async def publish_result(task: str, session: str, result: Any, run_id: str, cached: Any = False,
+                         recording: Optional[str] = None):
+    """
+    Deliver a task result: to the result sinks, like the API does for every
+    result including cached ones, and for its session to the Ably channel
+    'browser-result'.
+    
+    The message carries the recording's path relative to ARTIFACTS_DIR, if the
+    run was recorded.
+    
+    Raises:
+        Exception: If publishing fails, as the session gets no result otherwise
+    """
+    if result_sinks:
+        result_sinks.submit(build_result_record(run_id, "realtime", task, result, cached=cached, session=session))
+    try:
+        logger.debug("Publishing result to Ably channel 'browser-result'")
+        message = {'task': task, 'session': session, 'result': json.dumps(result)}
+        if recording:
+            message['recording'] = recording
+        await ably.channels.get('browser-result').publish('result', message)
+        logger.info("Result published successfully to Ably")
+    except Exception as e:
+        logger.error(f"Ably publishing error: {str(e)}", exc_info=True)
+        # Re-raise as this is critical for the application flow
+        raise
+
+async def fetch_result(task: str, session: str, run_id: Optional[str] = None,
+                       resume_from: Optional[Dict[str, Any]] = None, settings: Optional[Settings] = None):
     """
     Process a task using the browser agent and publish results to Ably.
     
+    The run is checkpointed after every step. If it is interrupted by a
+    shutdown its checkpoint is kept, and resume_interrupted_runs() continues it
+    after the worker restarts.
+    
     Args:
         task (str): The task description to process
         session (str): Session identifier for result tracking
+        run_id (Optional[str]): Identifier of the run, generated if not given
+        resume_from (Optional[Dict[str, Any]]): Checkpoint of an interrupted run to continue
+        settings (Optional[Settings]): Settings of the task, the current ones if not given
         
     Returns:
         str: The serialized result of the task execution
@@ -146,7 +299,11 @@ async def fetch_result(task: str, session: str):
         ValueError: If task or session is invalid
         Exception: For various execution errors
     """
-    logger.info(f"Processing task for session {session}: {task[:100]}...")  # Log first 100 chars
+    run_id = run_id or new_run_id()
+    # Messages are handled one after another in the polling task, so unbind when done
+    binding = bind_task(run_id)
+    logger.info(f"Processing {describe_task(task)} for session {session}")
+    settings = settings or settings_manager.settings
     
     try:
         # Validate input parameters
@@ -155,33 +312,93 @@ async def fetch_result(task: str, session: str):
             raise ValueError("Task and session are required parameters")
 
         cache_key = f"browseragent:cache:{task}"
-        logger.debug(f"Generated cache key: {cache_key}")
         
         # Try to get from cache
         try:
             logger.debug("Attempting to fetch from cache")
             cached_result = redis_client.get(cache_key)
             if cached_result:
-                logger.info(f"Cache hit for task: {task}")
+                logger.info("Cache hit")
                 decoded_result = json.loads(cached_result)
                 logger.debug(f"Successfully decoded cached result: {type(decoded_result)}")
+                if resume_from and checkpoint_store:
+                    checkpoint_store.delete(run_id)
+                await publish_result(task, session, decoded_result, run_id, cached=True)
                 return decoded_result
+            similar_result = fetch_similar_cached_result(task)
+            if similar_result is not None:
+                if resume_from and checkpoint_store:
+                    checkpoint_store.delete(run_id)
+                await publish_result(task, session, similar_result, run_id, cached="similar")
+                return similar_result
         except redis.RedisError as e:
             logger.error(f"Redis error while fetching cache: {str(e)}", exc_info=True)
             logger.warning("Continuing without cache due to Redis error")
         
+        recorder = None
+        checkpointer = None
         try:
-            # Initialize and run agent
-            logger.info("Initializing browser agent")
-            agent = Agent(
-                llm=llm,
-                task=task,
-                browser=browser,
-                controller=controller,
-                validate_output=False
-            )
-            logger.info("Starting agent execution with max_steps=30")
-            result = await agent.run(max_steps=30)
+            spiller = HistorySpiller(run_dir(run_id) / "history", window=settings.history_memory_window)
+            if settings.recording_format != "none":
+                recorder = TaskRecorder(
+                    run_dir(run_id),
+                    fmt=settings.recording_format,
+                    max_width=settings.recording_max_width,
+                    append=resume_from is not None
+                )
+
+            max_steps = settings.max_steps
+            agent_task = task
+            if checkpoint_store:
+                checkpointer = RunCheckpointer(
+                    checkpoint_store,
+                    run_id,
+                    service="realtime",
+                    task=task,
+                    max_steps=max_steps,
+                    meta={"session": session, "settings": settings.request_values()},
+                    resume_from=resume_from
+                )
+                if resume_from:
+                    agent_task = build_resume_task(resume_from)
+                    max_steps = checkpointer.remaining_steps
+                    logger.info(f"Resuming run {checkpointer.run_id} with {max_steps} steps remaining")
+
+            # Wait for a slot on the task's domains and reuse a context warm for them
+            domains = extract_domains(task)
+            async with domain_scheduler.acquire(domains), context_pool.lease(domains) as browser_context:
+                logger.info("Initializing browser agent")
+                agent = Agent(
+                    llm=llm,
+                    task=agent_task,
+                    browser=browser,
+                    browser_context=browser_context,
+                    controller=controller,
+                    validate_output=False,
+                    generate_gif=False,
+                    register_new_step_callback=chain_step_callbacks(
+                        track_step,
+                        recorder.on_step if recorder else None,
+                        spiller.on_step,
+                        health_monitor.heartbeat_callback("worker", settings.health_stale_after)
+                    )
+                )
+                spiller.attach(agent)
+                if checkpointer:
+                    checkpointer.attach(agent)
+                logger.info(f"Starting agent execution with max_steps={max_steps}")
+                try:
+                    async with checkpointer.heartbeat() if checkpointer else nullcontext():
+                        result = await agent.run(max_steps=max_steps)
+                except asyncio.CancelledError:
+                    # Keep the checkpoint so the run resumes after restart
+                    if checkpointer:
+                        checkpointer.suspend()
+                        checkpointer = None
+                    raise
+                finally:
+                    if recorder:
+                        await recorder.close()
             
             if not result or not result.history:
                 logger.error("Agent returned empty or invalid result")
@@ -195,33 +412,28 @@ async def fetch_result(task: str, session: str):
             
             # Try to cache the result
             try:
-                logger.debug("Attempting to cache result")
-                redis_client.setex(cache_key, 300, json.dumps(result_serializable))
-                logger.info(f"Result cached successfully with TTL: 300 seconds")
+                if settings.cache_ttl > 0:
+                    logger.debug("Attempting to cache result")
+                    redis_client.setex(cache_key, settings.cache_ttl, json.dumps(result_serializable))
+                    logger.info(f"Result cached successfully with TTL: {settings.cache_ttl} seconds")
+                    if semantic_cache and semantic_cache.enabled_for(task):
+                        semantic_cache.add(task, settings.cache_ttl)
             except redis.RedisError as e:
                 logger.error(f"Redis error while setting cache: {str(e)}", exc_info=True)
                 logger.warning("Continuing without caching due to Redis error")
             
-            logger.info(f"Task {task[:50]}... completed successfully")
-            
-            # Publish result to Ably
-            try:
-                logger.debug("Publishing result to Ably channel 'browser-result'")
-                await ably.channels.get('browser-result').publish(
-                    'result', 
-                    {'task': task, 'session': session, 'result': json.dumps(result_serializable)}
-                )
-                logger.info("Result published successfully to Ably")
-            except Exception as e:
-                logger.error(f"Ably publishing error: {str(e)}", exc_info=True)
-                # Re-raise as this is critical for the application flow
-                raise
-                
+            logger.info("Task completed successfully")
+            if checkpointer:
+                checkpointer.finish()
+            recording = f"{run_id}/{recorder.path.name}" if recorder and recorder.path else None
+            await publish_result(task, session, result_serializable, run_id, recording=recording)
             return result_serializable
             
         except Exception as e:
             error_msg = f"Error processing task: {str(e)}"
             logger.error(error_msg, exc_info=True)
+            if checkpointer:
+                checkpointer.finish()
             
             # Publish error to Ably
             try:
@@ -238,8 +450,66 @@ async def fetch_result(task: str, session: str):
             
     except Exception as e:
         logger.error(f"Critical error in fetch_result: {str(e)}", exc_info=True)
-        logger.error("Stack trace:", stack_info=True)
         raise
+    finally:
+        reset_task(binding)
+
+async def resume_interrupted_runs():
+    """
+    Resume runs whose checkpoints are not owned by a live worker.
+
+    Each run that this worker manages to claim is continued in the background
+    from its last checkpoint. Called at startup and on every poll so that runs
+    left by crashed workers are picked up once their lease expires. At most
+    CHECKPOINT_RESUME_CONCURRENCY resumed runs are in flight per worker.
+    """
+    if not checkpoint_store:
+        return
+    try:
+        run_ids = checkpoint_store.list_runs("realtime")
+    except Exception as e:
+        logger.error(f"Failed to list checkpoints: {str(e)}", exc_info=True)
+        return
+
+    for run_id in run_ids:
+        if len(resumed_runs) >= settings_manager.settings.checkpoint_resume_concurrency:
+            logger.info(f"{len(resumed_runs)} resumed runs in flight, leaving the rest for a later check")
+            break
+        try:
+            if not checkpoint_store.claim(run_id):
+                continue
+            checkpoint = checkpoint_store.load(run_id)
+            if not checkpoint:
+                checkpoint_store.release(run_id)
+                continue
+            if not checkpoint.get("task") or not checkpoint["meta"].get("session"):
+                logger.warning(f"Discarding incomplete checkpoint {run_id}")
+                checkpoint_store.delete(run_id)
+                continue
+        except Exception as e:
+            logger.error(f"Failed to claim checkpoint {run_id}: {str(e)}", exc_info=True)
+            continue
+
+        logger.info(f"Resuming interrupted run {run_id} for session {checkpoint['meta'].get('session')}")
+        try:
+            settings = settings_manager.settings.with_overrides(checkpoint["meta"].get("settings") or {})
+        except ValueError as e:
+            logger.warning(f"Settings of run {run_id} are no longer valid, resuming with the current ones: {str(e)}")
+            settings = settings_manager.settings
+        resumed = asyncio.create_task(fetch_result(
+            checkpoint["task"],
+            checkpoint["meta"].get("session"),
+            run_id=run_id,
+            resume_from=checkpoint,
+            settings=settings
+        ))
+        resumed_runs.add(resumed)
+        resumed.add_done_callback(resumed_runs.discard)
+        resumed.add_done_callback(_log_resumed_run_outcome)
+
+def _log_resumed_run_outcome(task: asyncio.Task):
+    if not task.cancelled() and task.exception():
+        logger.error(f"Resumed run failed: {str(task.exception())}")
 
 async def ably_message_handler(message: Message):
     """
@@ -259,11 +529,17 @@ async def ably_message_handler(message: Message):
         session = message.data.get('session')
         
         if not task or not session:
-            logger.error(f"Missing required fields in message: {message.data}")
+            logger.error(f"Missing required fields in message {message.id}")
+            return
+        
+        try:
+            settings = settings_manager.settings.with_overrides(message.data.get('settings') or {})
+        except ValueError as e:
+            logger.error(f"Invalid settings in message {message.id}: {str(e)}")
             return
         
         logger.info(f"Processing message for session {session}")
-        await fetch_result(task, session)
+        await fetch_result(task, session, settings=settings)
         logger.info(f"Message processing completed for session {session}")
         
     except Exception as e:
@@ -284,12 +560,16 @@ async def poll_ably_channel():
     logger.info(f"Starting to poll Ably channel: {channel_name}")
         
     retry_count = 0
-    max_retries = 3
-    retry_delay = 5  # seconds
     
     try:
         while True:
+            # Read once per poll so that reloaded settings apply to the next one
+            settings = settings_manager.settings
+            # The worker is considered hung if neither the poll loop nor an agent step progressed for this long
+            health_monitor.heartbeat("worker", settings.health_stale_after)
             try:
+                await resume_interrupted_runs()
+
                 logger.debug(f"Fetching history from channel {channel_name}")
                 history = await ably.channels.get(channel_name).history()
                 retry_count = 0  # Reset counter on successful connection
@@ -305,8 +585,8 @@ async def poll_ably_channel():
                         logger.error(f"Error processing message: {str(e)}", exc_info=True)
                         continue  # Continue with next message
                 
-                logger.debug("Waiting 10 seconds before next poll")
-                await asyncio.sleep(10)  # Poll every 10 seconds
+                logger.debug(f"Waiting {settings.poll_interval} seconds before next poll")
+                await asyncio.sleep(settings.poll_interval)
                 
             except asyncio.CancelledError:
                 logger.info("Ably channel polling cancelled - shutting down")
@@ -315,13 +595,13 @@ async def poll_ably_channel():
                 logger.error(f"Error polling Ably channel: {str(e)}", exc_info=True)
                 retry_count += 1
                 
-                if retry_count >= max_retries:
-                    logger.warning("Max retries reached, implementing longer backoff")
-                    await asyncio.sleep(60)  # Wait longer between retry batches
+                if retry_count >= settings.poll_max_retries:
+                    logger.warning(f"Max retries reached, backing off for {settings.poll_backoff_delay} seconds")
+                    await asyncio.sleep(settings.poll_backoff_delay)  # Wait longer between retry batches
                     retry_count = 0
                 else:
-                    logger.info(f"Retry attempt {retry_count}/{max_retries} in {retry_delay} seconds")
-                    await asyncio.sleep(retry_delay)
+                    logger.info(f"Retry attempt {retry_count}/{settings.poll_max_retries} in {settings.poll_retry_delay} seconds")
+                    await asyncio.sleep(settings.poll_retry_delay)
     except asyncio.CancelledError:
         logger.info("Ably channel polling cancelled - shutting down")
         raise
@@ -333,10 +613,24 @@ async def cleanup():
     """
     logger.info("Starting cleanup process")
     try:
-        # Close browser
+        # Close pooled browser contexts, then the browser
+        logger.debug("Closing pooled browser contexts")
+        await context_pool.close()
         logger.debug("Attempting to close browser")
         await browser.close()
         logger.info("Browser closed successfully")
+        if fetch_cache:
+            fetch_cache.close()
+        
+        # Deliver spooled results; whatever is left is sent after restart
+        if result_sinks:
+            logger.debug("Flushing result sinks")
+            await result_sinks.close()
+        
+        # Hand interrupted runs over to the next worker straight away
+        if checkpoint_store:
+            logger.debug("Releasing claimed checkpoints")
+            checkpoint_store.release_all()
         
         # Close Redis connection
         logger.debug("Closing Redis connection")
@@ -362,6 +656,15 @@ if __name__ == "__main__":
         
         try:
             logger.info("Starting application")
+            health_server = await serve_health(
+                health_monitor,
+                port=int(os.getenv("HEALTH_PORT", 8080)),
+                routes={"/debug/config": settings_manager.describe}
+            )
+            watchdog_task = asyncio.create_task(browser_watchdog.run())
+            settings_watcher = asyncio.create_task(settings_manager.watch())
+            if result_sinks:
+                result_sinks.start()
             await poll_ably_channel()
         except asyncio.CancelledError:
             logger.info("Main loop cancelled - initiating shutdown")
@@ -375,6 +678,7 @@ if __name__ == "__main__":
         signal_name = signal.Signals(sig).name
         logger.info(f"Received shutdown signal: {signal_name}")
         logger.info("Initiating graceful shutdown...")
+        health_monitor.shutting_down = True
         
         tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
         
@@ -0,0 +1,447 @@
+import asyncio
+import base64
+import io
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, List, Optional, Tuple
+
+from PIL import Image, ImageChops, ImageStat
+
+logger = logging.getLogger(__name__)
+
+RECORDING_FORMATS = ('gif', 'webp', 'mp4')
+SEGMENTED_FORMATS = ('webp', 'mp4')
+
+GIF_FILENAME = 'recording.gif'
+MANIFEST_FILENAME = 'recording.json'
+SEGMENT_PREFIX = 'segment-'
+
+# GIF block markers
+_GIF_EXTENSION = 0x21
+_GIF_IMAGE = 0x2C
+_GIF_TRAILER = 0x3B
+_GIF_LOOP_FOREVER = b'\x21\xFF\x0BNETSCAPE2.0\x03\x01\x00\x00\x00'
+
+
+def find_recording(directory: Path) -> Optional[Path]:
+    """
+    Return the entry point of a recording in a run directory.
+
+    Args:
+        directory (Path): Per-task artifact directory
+
+    Returns:
+        Optional[Path]: The GIF file, or the segment manifest for segmented formats
+    """
+    for name in (GIF_FILENAME, MANIFEST_FILENAME):
+        path = directory / name
+        if path.is_file():
+            return path
+    return None
+
+
+def is_segment_name(name: str) -> bool:
+    """Return True if name is a segment file written by TaskRecorder."""
+    stem, _, ext = name.partition('.')
+    return (
+        stem.startswith(SEGMENT_PREFIX)
+        and stem[len(SEGMENT_PREFIX):].isdigit()
+        and ext in SEGMENTED_FORMATS
+    )
+
+
+def _parse_single_frame_gif(data: bytes) -> Tuple[bytes, int, bytes]:
+    """
+    Split a single-frame GIF produced by Pillow into its palette and image data.
+
+    Returns:
+        Tuple[bytes, int, bytes]: Colour table, its size exponent and the LZW image block
+    """
+    packed = data[10]
+    pos = 13
+    palette, size_bits = b'', 0
+    if packed & 0x80:
+        size_bits = packed & 0x07
+        table_size = 3 * (2 ** (size_bits + 1))
+        palette = data[pos:pos + table_size]
+        pos += table_size
+
+    while pos < len(data):
+        marker = data[pos]
+        if marker == _GIF_EXTENSION:
+            pos += 2
+            while data[pos]:
+                pos += data[pos] + 1
+            pos += 1
+        elif marker == _GIF_IMAGE:
+            local_packed = data[pos + 9]
+            pos += 10
+            if local_packed & 0x80:
+                size_bits = local_packed & 0x07
+                table_size = 3 * (2 ** (size_bits + 1))
+                palette = data[pos:pos + table_size]
+                pos += table_size
+            start = pos
+            pos += 1  # LZW minimum code size
+            while data[pos]:
+                pos += data[pos] + 1
+            pos += 1
+            return palette, size_bits, data[start:pos]
+        else:
+            break
+    raise ValueError("GIF frame contains no image data")
+
+
+def _complete_gif_length(data: bytes) -> int:
+    """
+    Return the length of a GIF up to its trailer, without an incomplete last frame.
+
+    A frame cut short by a crash is dropped along with its graphic control extension.
+
+    Raises:
+        ValueError: If data does not start with a GIF header
+    """
+    if len(data) < 13 or data[:6] not in (b'GIF87a', b'GIF89a'):
+        raise ValueError("Not a GIF file")
+    pos = 13
+    if data[10] & 0x80:
+        pos += 3 * (2 ** ((data[10] & 0x07) + 1))
+    complete = pos
+
+    def skip_sub_blocks(pos: int) -> int:
+        while pos < len(data) and data[pos]:
+            pos += data[pos] + 1
+        return pos + 1
+
+    while pos < len(data):
+        marker = data[pos]
+        if marker == _GIF_EXTENSION and pos + 1 < len(data):
+            label = data[pos + 1]
+            pos = skip_sub_blocks(pos + 2)
+            if pos <= len(data) and label != 0xF9:
+                complete = pos
+        elif marker == _GIF_IMAGE and pos + 10 <= len(data):
+            local_packed = data[pos + 9]
+            pos += 10
+            if local_packed & 0x80:
+                pos += 3 * (2 ** ((local_packed & 0x07) + 1))
+            pos = skip_sub_blocks(pos + 1)
+            if pos <= len(data):
+                complete = pos
+        else:
+            break
+    return min(complete, len(data))
+
+
+class _GifStreamWriter:
+    """
+    Appends frames to an animated GIF one at a time.
+
+    Every frame carries its own colour table, so nothing but the current frame is
+    held in memory. The trailer is rewritten after each frame, so the file on disk
+    is always a complete, playable GIF while the run is still in progress. With
+    `append`, frames are added to the end of an existing GIF at the same path.
+    """
+
+    def __init__(self, path: Path, append: bool = False):
+        self.path = path
+        self.append = append
+        self._file = None
+        self._size: Optional[Tuple[int, int]] = None
+
+    def _reopen(self) -> bool:
+        """Open the existing GIF for appending; return False if there is none to continue."""
+        try:
+            data = self.path.read_bytes()
+            length = _complete_gif_length(data)
+        except (OSError, ValueError):
+            return False
+        self._size = (int.from_bytes(data[6:8], 'little'), int.from_bytes(data[8:10], 'little'))
+        self._file = open(self.path, 'r+b')
+        self._file.truncate(length)
+        self._file.seek(length)
+        return True
+
+    def write(self, frame: Image.Image, duration_ms: int) -> None:
+        if self._file is None and self.append and self._reopen():
+            if frame.size != self._size:
+                frame = frame.resize(self._size, Image.Resampling.LANCZOS)
+        elif self._file is None:
+            self._size = frame.size
+            self._file = open(self.path, 'wb')
+            width, height = frame.size
+            self._file.write(b'GIF89a')
+            self._file.write(width.to_bytes(2, 'little') + height.to_bytes(2, 'little'))
+            self._file.write(bytes([0x70, 0, 0]))  # no global colour table
+            self._file.write(_GIF_LOOP_FOREVER)
+        else:
+            self._file.seek(-1, os.SEEK_END)  # overwrite the previous trailer
+            if frame.size != self._size:
+                frame = frame.resize(self._size, Image.Resampling.LANCZOS)
+
+        buffer = io.BytesIO()
+        frame.convert('P', palette=Image.Palette.ADAPTIVE).save(buffer, format='GIF')
+        palette, size_bits, image_data = _parse_single_frame_gif(buffer.getvalue())
+        palette = palette.ljust(3 * (2 ** (size_bits + 1)), b'\x00')
+
+        delay = max(1, min(0xFFFF, duration_ms // 10)).to_bytes(2, 'little')
+        width, height = self._size
+        self._file.write(b'\x21\xF9\x04\x04' + delay + b'\x00\x00')
+        self._file.write(b'\x2C\x00\x00\x00\x00')
+        self._file.write(width.to_bytes(2, 'little') + height.to_bytes(2, 'little'))
+        self._file.write(bytes([0x80 | size_bits]))
+        self._file.write(palette)
+        self._file.write(image_data)
+        self._file.write(bytes([_GIF_TRAILER]))
+        self._file.flush()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class _SegmentWriter:
+    """
+    Writes a recording as a sequence of short, self-contained segment files.
+
+    At most `segment_frames` frames are in flight at any time. A JSON manifest
+    listing the finished segments is rewritten after each one. With `append`,
+    new segments continue the manifest already in the directory.
+    """
+
+    def __init__(self, directory: Path, fmt: str, segment_frames: int, fps: int = 2, append: bool = False):
+        self.directory = directory
+        self.fmt = fmt
+        self.segment_frames = segment_frames
+        self.fps = fps
+        self._frames: List[Tuple[Image.Image, int]] = []
+        self._segments: List[dict] = self._load_segments() if append else []
+        self._size: Optional[Tuple[int, int]] = None
+
+    def _load_segments(self) -> List[dict]:
+        try:
+            manifest = json.loads((self.directory / MANIFEST_FILENAME).read_text())
+        except (OSError, ValueError):
+            return []
+        if manifest.get('format') != self.fmt:
+            return []
+        return manifest.get('segments', [])
+
+    def write(self, frame: Image.Image, duration_ms: int) -> None:
+        if self._size is None:
+            width, height = frame.size
+            # Video encoders require even dimensions
+            self._size = (width - width % 2, height - height % 2) if self.fmt == 'mp4' else frame.size
+        if frame.size != self._size:
+            frame = frame.resize(self._size, Image.Resampling.LANCZOS)
+        self._frames.append((frame, duration_ms))
+        if len(self._frames) >= self.segment_frames:
+            self._flush_segment()
+
+    def close(self) -> None:
+        if self._frames:
+            self._flush_segment()
+
+    def _flush_segment(self) -> None:
+        name = f"{SEGMENT_PREFIX}{len(self._segments) + 1:05d}.{self.fmt}"
+        path = self.directory / name
+        frames, self._frames = self._frames, []
+        if self.fmt == 'webp':
+            images = [frame for frame, _ in frames]
+            images[0].save(
+                path,
+                format='WEBP',
+                save_all=True,
+                append_images=images[1:],
+                duration=[duration for _, duration in frames],
+                loop=0,
+                quality=70,
+            )
+        else:
+            self._write_mp4(path, frames)
+
+        self._segments.append({
+            'file': name,
+            'frames': len(frames),
+            'duration_ms': sum(duration for _, duration in frames),
+        })
+        manifest = {'format': self.fmt, 'segments': self._segments}
+        tmp_path = self.directory / f"{MANIFEST_FILENAME}.tmp"
+        tmp_path.write_text(json.dumps(manifest))
+        os.replace(tmp_path, self.directory / MANIFEST_FILENAME)
+
+    def _write_mp4(self, path: Path, frames: List[Tuple[Image.Image, int]]) -> None:
+        import imageio.v2 as imageio
+        import numpy as np
+
+        writer = imageio.get_writer(path, fps=self.fps, codec='libx264', macro_block_size=1)
+        try:
+            for frame, duration in frames:
+                pixels = np.asarray(frame)
+                for _ in range(max(1, round(duration * self.fps / 1000))):
+                    writer.append_data(pixels)
+        finally:
+            writer.close()
+
+
+class TaskRecorder:
+    """
+    Incrementally records the screenshots of an agent run to a per-task directory.
+
+    Frames are decoded, downscaled, de-duplicated and encoded on a background
+    thread as steps complete, so memory use does not grow with the number of
+    steps and no encoding work is left for the end of the run. Consecutive
+    near-identical frames are merged into a single longer frame.
+
+    Use `on_step` as the agent's `register_new_step_callback` and await `close()`
+    once the run has finished.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        fmt: str = 'gif',
+        max_width: int = 800,
+        frame_duration_ms: int = 1000,
+        dedupe_threshold: float = 1.0,
+        segment_frames: int = 10,
+        max_pending_frames: int = 8,
+        append: bool = False,
+    ):
+        """
+        Args:
+            directory (Path): Per-task artifact directory
+            fmt (str): One of 'gif', 'webp' or 'mp4'
+            max_width (int): Frames wider than this are downscaled
+            frame_duration_ms (int): Display time of a single step
+            dedupe_threshold (float): Mean per-channel difference under which frames are merged
+            segment_frames (int): Frames per segment for segmented formats
+            max_pending_frames (int): Frames queued for encoding before new ones are dropped
+            append (bool): Continue the recording already in the directory, e.g. of a resumed run
+
+        Raises:
+            ValueError: If fmt is not a supported recording format
+            RuntimeError: If fmt is 'mp4' and imageio is not installed
+        """
+        if fmt not in RECORDING_FORMATS:
+            raise ValueError(f"Unsupported recording format '{fmt}', expected one of {RECORDING_FORMATS}")
+        if fmt == 'mp4':
+            try:
+                import imageio  # noqa: F401
+            except ImportError:
+                raise RuntimeError("MP4 recording requires the 'imageio[ffmpeg]' package")
+
+        self.directory = directory
+        self.fmt = fmt
+        self.max_width = max_width
+        self.frame_duration_ms = frame_duration_ms
+        self.dedupe_threshold = dedupe_threshold
+        self.max_pending_frames = max_pending_frames
+
+        if fmt == 'gif':
+            self._writer = _GifStreamWriter(directory / GIF_FILENAME, append=append)
+        else:
+            self._writer = _SegmentWriter(directory, fmt, segment_frames, append=append)
+
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='recorder')
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._pending: Optional[Image.Image] = None
+        self._pending_duration = 0
+        self._closed = False
+        self.frames_written = 0
+        self.frames_dropped = 0
+
+    @property
+    def path(self) -> Optional[Path]:
+        """Entry point of the recording, or None if no frame has been written yet."""
+        return find_recording(self.directory)
+
+    async def on_step(self, state: Any, model_output: Any, step: int) -> None:
+        """Step callback for browser_use agents, which await it; records the step's screenshot."""
+        screenshot = getattr(state, 'screenshot', None)
+        if screenshot:
+            self.add_frame(screenshot)
+
+    def add_frame(self, screenshot_b64: str) -> None:
+        """
+        Queue a base64-encoded screenshot for encoding without blocking the caller.
+
+        If the encoder falls behind by more than max_pending_frames the frame is
+        dropped, which keeps memory bounded regardless of run length.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            if self._queued >= self.max_pending_frames:
+                self.frames_dropped += 1
+                logger.debug("Recorder is behind, dropping frame")
+                return
+            self._queued += 1
+        self._executor.submit(self._process_frame, screenshot_b64)
+
+    async def close(self) -> Optional[Path]:
+        """
+        Encode any remaining frames and finish the recording.
+
+        Returns:
+            Optional[Path]: Entry point of the finished recording, if any frames were captured
+        """
+        with self._lock:
+            if self._closed:
+                return self.path
+            self._closed = True
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(self._executor, self._finish)
+        finally:
+            self._executor.shutdown(wait=False)
+        logger.debug(f"Recording finished: {self.frames_written} frames written, {self.frames_dropped} dropped")
+        return self.path
+
+    def _process_frame(self, screenshot_b64: str) -> None:
+        try:
+            frame = self._prepare_frame(screenshot_b64)
+            if self._pending is not None and self._is_duplicate(self._pending, frame):
+                self._pending_duration += self.frame_duration_ms
+                return
+            self._write_pending()
+            self._pending = frame
+            self._pending_duration = self.frame_duration_ms
+        except Exception as e:
+            logger.error(f"Failed to record frame: {str(e)}", exc_info=True)
+        finally:
+            with self._lock:
+                self._queued -= 1
+
+    def _prepare_frame(self, screenshot_b64: str) -> Image.Image:
+        with Image.open(io.BytesIO(base64.b64decode(screenshot_b64))) as image:
+            frame = image.convert('RGB')
+        if frame.width > self.max_width:
+            height = max(1, round(frame.height * self.max_width / frame.width))
+            frame = frame.resize((self.max_width, height), Image.Resampling.LANCZOS)
+        return frame
+
+    def _is_duplicate(self, previous: Image.Image, frame: Image.Image) -> bool:
+        if previous.size != frame.size:
+            return False
+        difference = ImageStat.Stat(ImageChops.difference(previous, frame)).mean
+        return sum(difference) / len(difference) <= self.dedupe_threshold
+
+    def _write_pending(self) -> None:
+        if self._pending is None:
+            return
+        self._writer.write(self._pending, self._pending_duration)
+        self.frames_written += 1
+        self._pending = None
+
+    def _finish(self) -> None:
+        try:
+            self._write_pending()
+        finally:
+            self._writer.close()
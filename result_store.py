@@ -0,0 +1,179 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+import redis
+
+logger = logging.getLogger(__name__)
+
+STATUS_PENDING = 'pending'
+STATUS_SUCCEEDED = 'succeeded'
+
+# Run a command on a record only while it is the pending claim of the given run.
+# ARGV[1] is the run's task id; returns 1 if the command ran, 0 otherwise.
+_OWNED_PENDING_CHECK = """
+local raw = redis.call('GET', KEYS[1])
+if not raw then
+    return 0
+end
+local record = cjson.decode(raw)
+if record['status'] ~= 'pending' or record['task_id'] ~= ARGV[1] then
+    return 0
+end
+"""
+_RELEASE_SCRIPT = _OWNED_PENDING_CHECK + """
+redis.call('DEL', KEYS[1])
+return 1
+"""
+_RENEW_SCRIPT = _OWNED_PENDING_CHECK + """
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return 1
+"""
+
+
+def request_fingerprint(payload: Dict[str, Any]) -> str:
+    """Return a stable hash of a request body, used to detect idempotency key reuse."""
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+class IdempotencyConflict(Exception):
+    """Raised when an idempotency key is reused with a different request body."""
+
+
+class ResultStore:
+    """
+    Durable status and result records for idempotent task submissions.
+
+    Records live in Redis independently of the short-lived result cache, so
+    they survive service restarts and outlast the cache TTL. A record is either
+    `pending` (a run owns the key) or `succeeded` (the final response is
+    stored). Pending records expire after `pending_ttl` so a key held by a
+    crashed run can be claimed again; a live run keeps its claim by renewing
+    it (see hold). Failed runs release the key so the client's retry starts
+    a fresh run. Renewals and releases only touch the run's own claim.
+    """
+
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        result_ttl: int = 86400,
+        pending_ttl: int = 1800,
+        prefix: str = 'browseragent:idempotency',
+    ):
+        """
+        Args:
+            redis_client (redis.Redis): Connection used to persist records
+            result_ttl (int): Seconds a finished result is kept
+            pending_ttl (int): Seconds an in-progress claim is held without being renewed
+            prefix (str): Key prefix for stored records
+        """
+        self.redis = redis_client
+        self.result_ttl = result_ttl
+        self.pending_ttl = pending_ttl
+        self.prefix = prefix
+        self._release_script = redis_client.register_script(_RELEASE_SCRIPT)
+        self._renew_script = redis_client.register_script(_RENEW_SCRIPT)
+
+    def _key(self, idempotency_key: str) -> str:
+        return f"{self.prefix}:{idempotency_key}"
+
+    def claim(self, idempotency_key: str, fingerprint: str, task_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Claim a key for a new run, or return the existing record for it.
+
+        Args:
+            idempotency_key (str): Client supplied Idempotency-Key header
+            fingerprint (str): Fingerprint of the request body
+            task_id (str): Identifier of the run that will own the key
+
+        Returns:
+            Optional[Dict[str, Any]]: None if the caller now owns the key and should
+            run the task, otherwise the stored record of the original submission
+
+        Raises:
+            IdempotencyConflict: If the key was used for a different request body
+            redis.RedisError: If the store is unavailable
+        """
+        record = {
+            'status': STATUS_PENDING,
+            'fingerprint': fingerprint,
+            'task_id': task_id,
+            'started_at': time.time(),
+        }
+        if self.redis.set(self._key(idempotency_key), json.dumps(record), nx=True, ex=self.pending_ttl):
+            logger.debug("Idempotency key claimed")
+            return None
+
+        existing = self.get(idempotency_key)
+        if existing is None:
+            # The previous record expired between SET and GET, try once more
+            return self.claim(idempotency_key, fingerprint, task_id)
+        if existing.get('fingerprint') != fingerprint:
+            raise IdempotencyConflict("Idempotency-Key was already used for a different request")
+        logger.info(f"Idempotent replay, original run status: {existing.get('status')}")
+        return existing
+
+    def get(self, idempotency_key: str) -> Optional[Dict[str, Any]]:
+        """Return the stored record for a key, if any."""
+        raw = self.redis.get(self._key(idempotency_key))
+        return json.loads(raw) if raw else None
+
+    def complete(self, idempotency_key: str, fingerprint: str, response: Dict[str, Any]) -> None:
+        """
+        Store the final response of a run under its key.
+
+        Args:
+            idempotency_key (str): Key claimed by this run
+            fingerprint (str): Fingerprint of the request body
+            response (Dict[str, Any]): Response returned to the original caller
+        """
+        record = {
+            'status': STATUS_SUCCEEDED,
+            'fingerprint': fingerprint,
+            'completed_at': time.time(),
+            'response': response,
+        }
+        self.redis.set(self._key(idempotency_key), json.dumps(record), ex=self.result_ttl)
+
+    def renew(self, idempotency_key: str, task_id: str) -> bool:
+        """
+        Extend the pending claim of a run by pending_ttl.
+
+        Returns:
+            bool: False if the key is no longer claimed by this run
+        """
+        return bool(self._renew_script(keys=[self._key(idempotency_key)], args=[task_id, self.pending_ttl]))
+
+    async def _renew_claim(self, idempotency_key: str, task_id: str) -> None:
+        while True:
+            await asyncio.sleep(self.pending_ttl / 3)
+            try:
+                if not self.renew(idempotency_key, task_id):
+                    logger.warning(f"Idempotency key of run {task_id} is no longer claimed by it")
+                    return
+            except redis.RedisError as e:
+                logger.error(f"Redis error while renewing idempotency key: {str(e)}", exc_info=True)
+
+    @asynccontextmanager
+    async def hold(self, idempotency_key: str, task_id: str) -> AsyncIterator[None]:
+        """Keep renewing a run's pending claim for the duration of the block."""
+        renewer = asyncio.create_task(self._renew_claim(idempotency_key, task_id))
+        try:
+            yield
+        finally:
+            renewer.cancel()
+
+    def release(self, idempotency_key: str, task_id: str) -> bool:
+        """
+        Drop the claim of a failed run so a retry can start a new one.
+
+        A claim that expired and was taken over by another request is left alone.
+
+        Returns:
+            bool: Whether the run's claim was dropped
+        """
+        return bool(self._release_script(keys=[self._key(idempotency_key)], args=[task_id]))
@@ -0,0 +1,269 @@
+import hashlib
+import logging
+import math
+import re
+import time
+from typing import Dict, FrozenSet, Optional, Set, Tuple
+
+import redis
+
+from domains import extract_domains, normalize_domain
+
+logger = logging.getLogger(__name__)
+
+Vector = Dict[int, float]
+
+_WORD_PATTERN = re.compile(r'[a-z0-9]+')
+_NUMBER_PATTERN = re.compile(r'\d+(?:[.,]\d+)*')
+
+# Contractions are spelled out so that a negation is always the word 'not'
+_CONTRACTIONS = ((re.compile(r"\bcan't\b"), 'can not'), (re.compile(r"\bwon't\b"), 'will not'), (re.compile(r"n't\b"), ' not'))
+
+# Words that carry no meaning of their own in a task: function words and the
+# usual ways of phrasing a request. Tasks differing only in these can share a result.
+# Particles such as 'in', 'out', 'up', 'on' and 'to', verbs such as 'open' and
+# 'check', and negations are deliberately not listed: "log in" and "log out", or
+# "sign up" and "sign out", differ only in them.
+STOP_WORDS = frozenset({
+    'a', 'an', 'the', 'of', 'at', 'for', 'with', 'by', 'about', 'via',
+    'and', 'or', 'is', 'are', 'was', 'be', 'it', 'its', 'this', 'that', 'these', 'those',
+    'what', 'which', 'how', 'much', 'many', 'does', 'do', 'did', 'can', 'could', 'would', 'will',
+    'please', 'me', 'my', 'i', 'you', 'your', 'us', 'we', 'tell', 'show', 'give', 'let', 'know',
+    'find', 'get', 'look', 'lookup', 'search', 'see', 'go', 'visit',
+    'website', 'site', 'page', 'current', 'currently', 'there',
+})
+
+# Ways of phrasing a request that span several words, e.g. "look up", dropped as a whole
+REQUEST_PHRASES = frozenset({('look', 'up'), ('find', 'out')})
+
+# Different words for the same thing, mapped to one canonical content word
+SYNONYMS = {
+    'cost': 'price', 'costs': 'price', 'priced': 'price', 'prices': 'price', 'pricing': 'price',
+}
+
+
+def content_words(text: str) -> Tuple[str, ...]:
+    """Return the words of a text that carry meaning, canonicalized, in order."""
+    text = text.lower()
+    for pattern, replacement in _CONTRACTIONS:
+        text = pattern.sub(replacement, text)
+    words = _WORD_PATTERN.findall(text)
+    kept = []
+    index = 0
+    while index < len(words):
+        if tuple(words[index:index + 2]) in REQUEST_PHRASES:
+            index += 2
+            continue
+        if words[index] not in STOP_WORDS:
+            kept.append(SYNONYMS.get(words[index], words[index]))
+        index += 1
+    return tuple(kept)
+
+
+def _normalize(vector: Vector) -> Vector:
+    norm = math.sqrt(sum(value * value for value in vector.values()))
+    return {index: value / norm for index, value in vector.items()} if norm else vector
+
+
+def cosine(a: Vector, b: Vector) -> float:
+    """Cosine similarity of two L2-normalized sparse vectors."""
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(value * b.get(index, 0.0) for index, value in a.items())
+
+
+class HashedNgramEmbedder:
+    """
+    Embeds text as a sparse vector of hashed unigrams and bigrams of its
+    content words (see content_words). Needs no model and no network, and is
+    stable across processes, so vectors from different workers are comparable.
+
+    Tasks are only compared once their content words match (see
+    task_signature), so the similarity mostly measures word order.
+    """
+
+    def __init__(self, dimensions: int = 1 << 20, bigram_weight: float = 0.5):
+        self.dimensions = dimensions
+        self.bigram_weight = bigram_weight
+
+    def _add(self, vector: Vector, feature: str, weight: float) -> None:
+        digest = hashlib.blake2b(feature.encode(), digest_size=8).digest()
+        index = int.from_bytes(digest[:4], 'little') % self.dimensions
+        sign = 1.0 if digest[4] & 1 else -1.0
+        vector[index] = vector.get(index, 0.0) + sign * weight
+
+    def embed(self, text: str) -> Vector:
+        words = content_words(text)
+        vector: Vector = {}
+        for word in words:
+            self._add(vector, f"w:{word}", 1.0)
+        for first, second in zip(words, words[1:]):
+            self._add(vector, f"b:{first} {second}", self.bigram_weight)
+        return _normalize(vector)
+
+
+class SentenceTransformerEmbedder:
+    """Embeds text with a local sentence-transformers model. Needs sentence-transformers."""
+
+    def __init__(self, model_name: str):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError("SEMANTIC_CACHE_MODEL needs sentence-transformers: pip install sentence-transformers") from e
+        self.model = SentenceTransformer(model_name)
+
+    def embed(self, text: str) -> Vector:
+        values = self.model.encode(text, normalize_embeddings=True)
+        return {index: float(value) for index, value in enumerate(values)}
+
+
+def task_signature(task: str) -> Tuple[Tuple[str, ...], Tuple[str, ...], FrozenSet[str]]:
+    """
+    Return the numbers, domains and content words of a task.
+
+    Paraphrases only match when these are identical, so that the same
+    question about a different product id, site or model ("iphone 15" vs
+    "iphone 15 pro"), or a different action on the same thing ("book" vs
+    "cancel"), is never served from cache. Embedding similarity alone
+    cannot be trusted with such one-word differences.
+    """
+    numbers = tuple(sorted(set(_NUMBER_PATTERN.findall(task))))
+    return numbers, tuple(sorted(extract_domains(task))), frozenset(content_words(task))
+
+
+class SemanticCache:
+    """
+    Finds cached tasks that are paraphrases of a new task.
+
+    Every cached task is embedded into a local in-memory index, bucketed by
+    its signature (numbers, domains and content words, see task_signature). The tasks cached
+    by any worker are listed in a Redis sorted set scored by their expiry,
+    and each worker adds new ones to its index every `sync_interval`
+    seconds. A lookup returns the most similar live task of the same
+    signature if its cosine similarity reaches `threshold`; the caller then
+    reads that task's exact cache entry.
+
+    Only tasks whose domains are all opted in (`domains`) use the index;
+    '*' opts in every task, including tasks that name no domain.
+    """
+
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        embedder: object,
+        threshold: float = 0.9,
+        domains: Optional[Set[str]] = None,
+        max_entries: int = 5000,
+        sync_interval: float = 5.0,
+        key: str = 'browseragent:semantic:tasks',
+    ):
+        """
+        Args:
+            redis_client (redis.Redis): Connection shared by all workers
+            embedder: Object with an embed(text) method returning a normalized sparse vector
+            threshold (float): Minimum cosine similarity of a hit
+            domains (Optional[Set[str]]): Opted-in domains, or {'*'}
+            max_entries (int): Most recent cached tasks kept in the index
+            sync_interval (float): Seconds between index syncs from Redis
+            key (str): Redis key of the sorted set of cached tasks
+        """
+        self.redis = redis_client
+        self.embedder = embedder
+        self.threshold = threshold
+        self.domains = domains or set()
+        self.max_entries = max_entries
+        self.sync_interval = sync_interval
+        self.key = key
+        self._index: Dict[tuple, Dict[str, Tuple[Vector, float]]] = {}
+        self._last_sync = 0.0
+
+    def enabled_for(self, task: str) -> bool:
+        if '*' in self.domains:
+            return True
+        domains = extract_domains(task)
+        return bool(domains) and all(domain in self.domains for domain in domains)
+
+    def _insert(self, task: str, expires_at: float) -> None:
+        bucket = self._index.setdefault(task_signature(task), {})
+        if task in bucket:
+            bucket[task] = (bucket[task][0], expires_at)
+        else:
+            bucket[task] = (self.embedder.embed(task), expires_at)
+
+    def _sync(self) -> None:
+        now = time.time()
+        if now - self._last_sync < self.sync_interval:
+            return
+        self._last_sync = now
+        try:
+            self.redis.zremrangebyscore(self.key, '-inf', now)
+            entries = self.redis.zrevrangebyscore(self.key, '+inf', now, start=0, num=self.max_entries, withscores=True)
+        except redis.RedisError as e:
+            logger.error(f"Redis error while syncing semantic cache: {str(e)}", exc_info=True)
+            return
+        for member, expires_at in entries:
+            self._insert(member.decode() if isinstance(member, bytes) else member, expires_at)
+        for signature in list(self._index):
+            bucket = self._index[signature]
+            for task in [task for task, (_, expires_at) in bucket.items() if expires_at <= now]:
+                del bucket[task]
+            if not bucket:
+                del self._index[signature]
+
+    def lookup(self, task: str) -> Optional[Tuple[str, float]]:
+        """
+        Find a cached task similar enough to be answered by the same result.
+
+        Returns:
+            Optional[Tuple[str, float]]: The cached task and its similarity, or None
+        """
+        self._sync()
+        bucket = self._index.get(task_signature(task))
+        if not bucket:
+            return None
+        now = time.time()
+        vector = self.embedder.embed(task)
+        best = max(
+            ((cached_task, cosine(vector, cached_vector)) for cached_task, (cached_vector, expires_at) in bucket.items()
+             if expires_at > now and cached_task != task),
+            key=lambda match: match[1],
+            default=None
+        )
+        if best is None or best[1] < self.threshold:
+            return None
+        return best
+
+    def add(self, task: str, ttl: int) -> None:
+        """Index a task whose result was just cached for ttl seconds."""
+        expires_at = time.time() + ttl
+        self._insert(task, expires_at)
+        try:
+            self.redis.zadd(self.key, {task: expires_at})
+        except redis.RedisError as e:
+            logger.error(f"Redis error while indexing semantic cache entry: {str(e)}", exc_info=True)
+
+
+def parse_domains(spec: str) -> Set[str]:
+    """Parse a comma separated list of opted-in domains; '*' stays as is."""
+    return {normalize_domain(domain.strip()) for domain in spec.split(',') if domain.strip()}
+
+
+def create_semantic_cache(enabled: bool, redis_client: redis.Redis, threshold: float = 0.9,
+                          domains: str = '', model: str = '') -> Optional[SemanticCache]:
+    """
+    Create the similarity cache from service configuration.
+
+    Args:
+        enabled (bool): Whether similarity lookups are used at all
+        redis_client (redis.Redis): Connection shared by all workers
+        threshold (float): Minimum cosine similarity of a hit
+        domains (str): Comma separated opted-in domains, or '*'
+        model (str): sentence-transformers model name; hashed word n-grams are used if empty
+
+    Returns:
+        Optional[SemanticCache]: The cache, or None if disabled
+    """
+    if not enabled:
+        return None
+    embedder = SentenceTransformerEmbedder(model) if model else HashedNgramEmbedder()
+    return SemanticCache(redis_client, embedder, threshold=threshold, domains=parse_domains(domains))
@@ -0,0 +1,310 @@
+import asyncio
+import json
+import logging
+import os
+import time
+import tomllib
+from pathlib import Path
+from typing import Any, Dict, List, Literal, Mapping, Optional, Tuple
+
+from pydantic import BaseModel, ConfigDict, Field, field_validator
+
+logger = logging.getLogger(__name__)
+
+# Settings used to build long-lived objects at startup; changes need a restart
+STRUCTURAL_SETTINGS = frozenset({
+    'headless', 'llm_routes', 'llm_cheap_route', 'llm_max_concurrency', 'llm_hedge', 'llm_temperature',
+    'idempotency_result_ttl', 'idempotency_pending_ttl',
+    'checkpoint_backend', 'checkpoint_dir', 'checkpoint_lease_ttl',
+    'semantic_cache_enabled', 'semantic_cache_threshold', 'semantic_cache_domains', 'semantic_cache_model',
+    'domain_max_concurrency', 'domain_rate_per_minute', 'domain_limits', 'domain_max_wait',
+    'fetch_cache_enabled', 'fetch_cache_dir', 'fetch_cache_max_bytes', 'fetch_cache_domain_ttls',
+    'context_pool_size', 'context_pool_idle_ttl',
+    'browser_watchdog_interval', 'browser_probe_timeout', 'browser_failure_threshold', 'browser_page_failure_threshold',
+    'result_sink_spool_dir', 'result_sink_batch_size', 'result_sink_flush_interval',
+})
+
+# Longest a task result may stay cached (one week)
+MAX_CACHE_TTL = 7 * 24 * 3600
+
+# Settings a single task may override
+REQUEST_SETTINGS = frozenset({'max_steps', 'cache_ttl', 'postback_timeout'})
+
+# Defaults that differ between the services
+SERVICE_DEFAULTS: Dict[str, Dict[str, Any]] = {
+    'api': {'headless': False, 'max_steps': 100},
+    'realtime': {'llm_routes': ['anthropic:claude-3-5-sonnet-20241022'], 'llm_temperature': 0.5},
+}
+
+
+class Settings(BaseModel):
+    """
+    Tuning parameters of a service.
+
+    Each field can be set in the config file under its own name, or through
+    the environment variable of the same name in upper case (CACHE_TTL,
+    LLM_ROUTES, ...). See load_settings() for the precedence.
+    """
+
+    model_config = ConfigDict(extra='forbid', frozen=True)
+
+    cache_ttl: int = Field(300, ge=0, le=MAX_CACHE_TTL, description="Seconds a task result stays cached, 0 to not cache")
+    max_steps: int = Field(30, ge=1, description="Step budget of an agent run")
+    poll_interval: float = Field(10.0, gt=0, description="Seconds between Ably channel polls")
+    poll_retry_delay: float = Field(5.0, ge=0, description="Seconds before retrying a failed poll")
+    poll_backoff_delay: float = Field(60.0, ge=0, description="Seconds to back off after poll_max_retries failures")
+    poll_max_retries: int = Field(3, ge=1, description="Failed polls in a row before backing off")
+    postback_timeout: float = Field(10.0, gt=0, description="Seconds to wait for a postback URL")
+    headless: bool = Field(True, description="Run the browser without a window")
+    llm_routes: List[str] = Field(
+        default_factory=lambda: ['anthropic:claude-3-5-sonnet-latest'], min_length=1,
+        description="provider:model routes in fallback order"
+    )
+    llm_cheap_route: Optional[str] = Field(None, description="provider:model route for simple steps")
+    llm_max_concurrency: int = Field(8, ge=1, description="Concurrent calls per LLM provider")
+    llm_hedge: bool = Field(True, description="Hedge slow LLM calls on the next route")
+    llm_temperature: Optional[float] = Field(None, ge=0, le=2, description="Sampling temperature of every route")
+    planner_max_subtasks: int = Field(5, ge=1, description="Upper bound on sub-tasks in planner mode")
+    planner_max_parallel: int = Field(3, ge=1, description="Sub-tasks of a planned task running at once")
+    planner_subtask_max_steps: int = Field(30, ge=1, description="Step budget per sub-task, capped by max_steps")
+    recording_format: Literal['gif', 'webp', 'mp4', 'none'] = Field('gif', description="Format of task recordings, or none")
+    recording_max_width: int = Field(800, ge=1, description="Width recordings are downscaled to")
+    history_memory_window: int = Field(3, ge=1, description="Agent steps kept fully in memory; older screenshots go to disk")
+    profiling_enabled: bool = Field(False, description="Allow clients to request per-task profiling")
+    profile_sample_interval: float = Field(0.01, gt=0, description="Seconds between profiler samples")
+    health_stale_after: float = Field(600.0, gt=0, description="Seconds without progress before the realtime worker counts as hung")
+    idempotency_result_ttl: int = Field(86400, ge=1, description="Seconds idempotent results are kept")
+    idempotency_pending_ttl: int = Field(1800, ge=1, description="Seconds a crashed idempotent run holds its key")
+    checkpoint_backend: Literal['redis', 'disk', 'none'] = Field('redis', description="Where run checkpoints are stored")
+    checkpoint_dir: str = Field('checkpoints', min_length=1, description="Directory of the disk checkpoint backend")
+    checkpoint_lease_ttl: int = Field(300, ge=1, description="Seconds before a dead worker's run can be resumed elsewhere")
+    checkpoint_resume_interval: float = Field(60.0, gt=0, description="Seconds between checks for interrupted runs")
+    checkpoint_resume_concurrency: int = Field(2, ge=1, description="Interrupted runs a worker resumes at once")
+    semantic_cache_enabled: bool = Field(False, description="Serve paraphrased tasks from cache")
+    semantic_cache_threshold: float = Field(0.9, gt=0, le=1, description="Minimum cosine similarity of a semantic cache hit")
+    semantic_cache_domains: str = Field('', description="Comma separated domains opted in to the semantic cache, or *")
+    semantic_cache_model: str = Field('', description="sentence-transformers model; hashed word n-grams if empty")
+    domain_max_concurrency: int = Field(2, ge=1, description="Tasks per domain running at once across all workers")
+    domain_rate_per_minute: int = Field(30, ge=1, description="Task starts per domain per minute across all workers")
+    domain_limits: str = Field('', description="Per-domain overrides as domain=concurrency:rate_per_minute")
+    domain_max_wait: float = Field(300.0, ge=0, description="Seconds to wait for a domain slot before running anyway")
+    fetch_cache_enabled: bool = Field(False, description="Serve browser GET requests through a local HTTP cache")
+    fetch_cache_dir: str = Field('fetch_cache', min_length=1, description="Fetch cache directory shared by the host's workers")
+    fetch_cache_max_bytes: int = Field(512 * 1024 * 1024, ge=1, description="Size cap of the fetch cache")
+    fetch_cache_domain_ttls: str = Field('', description="Per-domain fetch cache lifetimes as domain=seconds")
+    context_pool_size: int = Field(4, ge=0, description="Idle browser contexts kept warm for reuse")
+    context_pool_idle_ttl: float = Field(600.0, ge=0, description="Seconds an idle browser context is kept")
+    browser_watchdog_interval: float = Field(15.0, gt=0, description="Seconds between browser health checks")
+    browser_probe_timeout: float = Field(10.0, gt=0, description="Seconds the browser or a page has to answer a check")
+    browser_failure_threshold: int = Field(2, ge=1, description="Failed checks in a row before the browser is recycled")
+    browser_page_failure_threshold: int = Field(3, ge=1, description="Failed checks in a row before an idle page is closed")
+    result_sink_spool_dir: str = Field('sink_spool', min_length=1, description="Local buffer for results not yet delivered")
+    result_sink_batch_size: int = Field(100, ge=1, description="Results per sink batch")
+    result_sink_flush_interval: float = Field(5.0, gt=0, description="Seconds between result sink flushes")
+
+    @field_validator('llm_routes', mode='before')
+    @classmethod
+    def split_routes(cls, v):
+        if isinstance(v, str):
+            return [spec.strip() for spec in v.split(',') if spec.strip()]
+        return v
+
+    @field_validator('recording_format', 'checkpoint_backend', mode='before')
+    @classmethod
+    def lower_case_choice(cls, v):
+        return v.lower() if isinstance(v, str) else v
+
+    @field_validator('llm_cheap_route', mode='before')
+    @classmethod
+    def empty_route_is_none(cls, v):
+        return v or None
+
+    def request_values(self) -> Dict[str, Any]:
+        """Return the REQUEST_SETTINGS values, e.g. to give a resumed task the settings it started with."""
+        return self.model_dump(include=REQUEST_SETTINGS)
+
+    def with_overrides(self, overrides: Mapping[str, Any]) -> 'Settings':
+        """
+        Return the settings for one task, with some values overridden.
+
+        Only REQUEST_SETTINGS can be overridden, and max_steps can only be lowered.
+
+        Raises:
+            ValueError: If an override is not allowed or not valid
+        """
+        if not overrides:
+            return self
+        not_allowed = sorted(set(overrides) - REQUEST_SETTINGS)
+        if not_allowed:
+            raise ValueError(
+                f"Settings cannot be overridden per task: {', '.join(not_allowed)} "
+                f"(allowed: {', '.join(sorted(REQUEST_SETTINGS))})"
+            )
+        settings = Settings.model_validate({**self.model_dump(), **overrides})
+        if settings.max_steps > self.max_steps:
+            raise ValueError(f"max_steps cannot be raised above the configured {self.max_steps}")
+        return settings
+
+
+def read_config_file(path: Path) -> Dict[str, Any]:
+    """
+    Read a config file: JSON, TOML, or YAML (needs PyYAML), chosen by extension.
+
+    Raises:
+        OSError: If the file cannot be read
+        ValueError: If the file is not a valid config file
+    """
+    suffix = path.suffix.lower()
+    text = path.read_text(encoding='utf-8')
+    if suffix == '.json':
+        values = json.loads(text)
+    elif suffix == '.toml':
+        values = tomllib.loads(text)
+    elif suffix in ('.yaml', '.yml'):
+        try:
+            import yaml
+        except ImportError as e:
+            raise ImportError("YAML config files need PyYAML: pip install pyyaml") from e
+        values = yaml.safe_load(text) or {}
+    else:
+        raise ValueError(f"Unsupported config file type '{suffix}', expected .json, .toml, .yaml or .yml")
+    if not isinstance(values, dict):
+        raise ValueError(f"Config file {path} must contain a mapping of settings")
+    return values
+
+
+def load_settings(service: str, config_file: Optional[Path] = None,
+                  environ: Optional[Mapping[str, str]] = None) -> Tuple[Settings, Dict[str, str]]:
+    """
+    Load and validate the settings of a service.
+
+    Later sources win: built-in defaults, the service's defaults
+    (SERVICE_DEFAULTS), top-level keys of the config file, the file's section
+    named after the service (e.g. [realtime]), then environment variables.
+    Empty environment variables count as unset.
+
+    Args:
+        service (str): 'api' or 'realtime'
+        config_file (Optional[Path]): JSON, TOML or YAML config file
+        environ (Optional[Mapping[str, str]]): Environment, os.environ by default
+
+    Returns:
+        Tuple[Settings, Dict[str, str]]: The settings, and the source of every field
+
+    Raises:
+        ValueError: If a source contains unknown or invalid settings
+    """
+    environ = os.environ if environ is None else environ
+    values: Dict[str, Any] = {}
+    sources = {name: 'default' for name in Settings.model_fields}
+
+    def apply(layer: Mapping[str, Any], source: str) -> None:
+        for name, value in layer.items():
+            values[name] = value
+            sources[name] = source
+
+    apply(SERVICE_DEFAULTS.get(service, {}), 'default')
+    if config_file:
+        file_values = read_config_file(config_file)
+        sections = {name: file_values.pop(name) for name in SERVICE_DEFAULTS if isinstance(file_values.get(name), dict)}
+        apply(file_values, f"file:{config_file}")
+        apply(sections.get(service, {}), f"file:{config_file}[{service}]")
+    apply({name: environ[name.upper()] for name in Settings.model_fields if environ.get(name.upper())}, 'env')
+    return Settings.model_validate(values), sources
+
+
+class SettingsManager:
+    """
+    Holds the current settings of a service and reloads them when the config file changes.
+
+    Code that runs per task reads `settings` when the task starts, so changed
+    values apply to the next task. STRUCTURAL_SETTINGS are only read at
+    startup: a reload keeps their old values and lists the new ones as
+    pending a restart. A reload that fails validation keeps the old settings.
+    Environment variables win over the file, so settings set there don't
+    change on reload.
+    """
+
+    def __init__(self, service: str, config_file: Optional[str] = None, reload_interval: float = 5.0):
+        """
+        Args:
+            service (str): 'api' or 'realtime'
+            config_file (Optional[str]): Path of the config file, if any
+            reload_interval (float): Seconds between checks of the config file
+
+        Raises:
+            ValueError: If the settings are not valid
+        """
+        self.service = service
+        self.config_file = Path(config_file) if config_file else None
+        self.reload_interval = reload_interval
+        self._mtime = self._file_mtime()
+        self.settings, self.sources = load_settings(service, self.config_file)
+        self.pending_restart: Dict[str, Any] = {}
+        self.loaded_at = time.time()
+        self.last_error: Optional[str] = None
+
+    def _file_mtime(self) -> Optional[float]:
+        try:
+            return self.config_file.stat().st_mtime if self.config_file else None
+        except OSError:
+            return None
+
+    def reload(self) -> bool:
+        """
+        Reload the settings from the config file and environment.
+
+        Returns:
+            bool: Whether the new settings were applied
+        """
+        try:
+            settings, sources = load_settings(self.service, self.config_file)
+        except (OSError, ImportError, ValueError) as e:
+            self.last_error = str(e)
+            logger.error(f"Invalid settings in {self.config_file}, keeping the current ones: {str(e)}")
+            return False
+
+        self.pending_restart = {
+            name: getattr(settings, name) for name in STRUCTURAL_SETTINGS
+            if getattr(settings, name) != getattr(self.settings, name)
+        }
+        settings = settings.model_copy(update={name: getattr(self.settings, name) for name in self.pending_restart})
+        changed = [name for name in Settings.model_fields if getattr(settings, name) != getattr(self.settings, name)]
+        for name in changed:
+            logger.info(f"Setting {name} changed from {getattr(self.settings, name)!r} to {getattr(settings, name)!r}")
+        if self.pending_restart:
+            logger.warning(f"Restart to apply changed settings: {', '.join(sorted(self.pending_restart))}")
+
+        self.sources = {
+            name: self.sources[name] if name in self.pending_restart else source for name, source in sources.items()
+        }
+        self.settings = settings
+        self.loaded_at = time.time()
+        self.last_error = None
+        return True
+
+    async def watch(self) -> None:
+        """Reload the settings whenever the config file's modification time changes."""
+        if not self.config_file:
+            return
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            mtime = self._file_mtime()
+            if mtime is not None and mtime != self._mtime:
+                self._mtime = mtime
+                logger.info(f"Config file {self.config_file} changed, reloading settings")
+                self.reload()
+
+    def describe(self) -> Dict[str, Any]:
+        """Return the effective settings, where each came from and what awaits a restart."""
+        return {
+            'service': self.service,
+            'config_file': str(self.config_file) if self.config_file else None,
+            'loaded_at': self.loaded_at,
+            'settings': self.settings.model_dump(),
+            'sources': self.sources,
+            'structural': sorted(STRUCTURAL_SETTINGS),
+            'per_request': sorted(REQUEST_SETTINGS),
+            'pending_restart': self.pending_restart,
+            'last_error': self.last_error,
+        }
@@ -0,0 +1,415 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+SINK_KINDS = ('ndjson', 'parquet', 'sqlite', 'postgres', 'postback', 'ably')
+
+# Columns every sink receives; anything else goes into the JSON 'metadata' column
+RECORD_FIELDS = ('id', 'service', 'task', 'result', 'cached', 'created_at', 'metadata')
+
+
+def build_result_record(record_id: str, service: str, task: str, result: Any,
+                        cached: Any = False, **metadata: Any) -> Dict[str, Any]:
+    """
+    Build the flat record that result sinks deliver.
+
+    Args:
+        record_id (str): Unique id of the run; sinks that can deduplicate use it as key
+        service (str): Service that produced the result
+        task (str): The task description
+        result (Any): The task result
+        cached (Any): Cache status of the result
+        **metadata: Extra fields stored as JSON, e.g. the realtime session
+
+    Returns:
+        Dict[str, Any]: The record
+    """
+    return {
+        'id': record_id,
+        'service': service,
+        'task': task,
+        'result': result if isinstance(result, str) else json.dumps(result),
+        'cached': str(cached).lower(),
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'metadata': json.dumps(metadata),
+    }
+
+
+class ResultSink:
+    """A destination for batches of result records. write_batch raises if the batch was not delivered."""
+
+    name = 'sink'
+
+    async def write_batch(self, records: List[Dict[str, Any]]) -> None:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+
+class NDJSONSink(ResultSink):
+    """Appends records to one newline-delimited JSON file per UTC day."""
+
+    name = 'ndjson'
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+
+    def _write(self, records: List[Dict[str, Any]]) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f"results-{datetime.now(timezone.utc):%Y%m%d}.ndjson"
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(''.join(json.dumps(record) + '\n' for record in records))
+            f.flush()
+            os.fsync(f.fileno())
+
+    async def write_batch(self, records: List[Dict[str, Any]]) -> None:
+        await asyncio.to_thread(self._write, records)
+
+
+class ParquetSink(ResultSink):
+    """Writes every batch as its own Parquet file. Needs pyarrow."""
+
+    name = 'parquet'
+
+    def __init__(self, directory: str):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError as e:
+            raise ImportError("The parquet result sink needs pyarrow: pip install pyarrow") from e
+        self.directory = Path(directory)
+
+    def _write(self, records: List[Dict[str, Any]]) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        name = f"results-{datetime.now(timezone.utc):%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}.parquet"
+        temporary = self.directory / f".{name}.tmp"
+        pq.write_table(pa.Table.from_pylist(records), temporary)
+        os.replace(temporary, self.directory / name)
+
+    async def write_batch(self, records: List[Dict[str, Any]]) -> None:
+        await asyncio.to_thread(self._write, records)
+
+
+class SQLiteSink(ResultSink):
+    """Inserts records into a 'results' table, ignoring ids that were already delivered."""
+
+    name = 'sqlite'
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def _write(self, records: List[Dict[str, Any]]) -> None:
+        with sqlite3.connect(self.path, timeout=30) as db:
+            db.execute(
+                'CREATE TABLE IF NOT EXISTS results (id TEXT PRIMARY KEY, service TEXT, task TEXT, '
+                'result TEXT, cached TEXT, created_at TEXT, metadata TEXT)'
+            )
+            db.executemany(
+                'INSERT OR IGNORE INTO results VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [tuple(record[field] for field in RECORD_FIELDS) for record in records]
+            )
+        db.close()
+
+    async def write_batch(self, records: List[Dict[str, Any]]) -> None:
+        await asyncio.to_thread(self._write, records)
+
+
+class PostgresSink(ResultSink):
+    """Inserts records into a Postgres table, ignoring ids that were already delivered. Needs psycopg."""
+
+    name = 'postgres'
+
+    def __init__(self, dsn: str, table: str = 'browser_agent_results'):
+        try:
+            import psycopg  # noqa: F401
+        except ImportError as e:
+            raise ImportError("The postgres result sink needs psycopg: pip install 'psycopg[binary]'") from e
+        self.dsn = dsn
+        self.table = table
+
+    async def write_batch(self, records: List[Dict[str, Any]]) -> None:
+        import psycopg
+
+        async with await psycopg.AsyncConnection.connect(self.dsn) as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(
+                    f'CREATE TABLE IF NOT EXISTS {self.table} (id TEXT PRIMARY KEY, service TEXT, task TEXT, '
+                    'result TEXT, cached TEXT, created_at TIMESTAMPTZ, metadata JSONB)'
+                )
+                await cur.executemany(
+                    f'INSERT INTO {self.table} VALUES (%s, %s, %s, %s, %s, %s, %s) ON CONFLICT (id) DO NOTHING',
+                    [tuple(record[field] for field in RECORD_FIELDS) for record in records]
+                )
+
+
+class PostbackSink(ResultSink):
+    """POSTs each batch as {"results": [...]} to a fixed URL."""
+
+    name = 'postback'
+
+    def __init__(self, url: str, timeout: float = 10.0):
+        self.url = url
+        self.timeout = timeout
+
+    async def write_batch(self, records: List[Dict[str, Any]]) -> None:
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout)) as session:
+            async with session.post(self.url, json={'results': records}) as response:
+                response.raise_for_status()
+
+
+class AblySink(ResultSink):
+    """Publishes each batch to an Ably channel in a single request, one message per record."""
+
+    name = 'ably'
+
+    def __init__(self, ably: Any, channel: str):
+        self.ably = ably
+        self.channel = channel
+
+    async def write_batch(self, records: List[Dict[str, Any]]) -> None:
+        from ably.types.message import Message
+
+        await self.ably.channels.get(self.channel).publish(
+            [Message(name='result', data=record) for record in records]
+        )
+
+
+class BatchingSinkWriter:
+    """
+    Delivers records to one sink in batches, at least once.
+
+    `submit` appends the record to a spool file on disk before returning, so
+    records survive a crash or a sink outage. A background task seals the
+    spool into a batch when it holds `batch_size` records or every
+    `flush_interval` seconds, and writes sealed batches to the sink in order.
+    A batch file is deleted only after the sink accepted it; failed batches
+    are retried with exponential backoff, and batches left over from a
+    previous run are delivered at startup. A record can therefore be
+    delivered more than once, which is why sinks that can deduplicate use
+    the record id as key.
+    """
+
+    def __init__(self, sink: ResultSink, spool_dir: Path, batch_size: int = 100,
+                 flush_interval: float = 5.0, max_retry_delay: float = 60.0):
+        """
+        Args:
+            sink (ResultSink): Destination of the batches
+            spool_dir (Path): Directory of this sink's spool
+            batch_size (int): Records that trigger a flush before the interval elapses
+            flush_interval (float): Seconds between flushes
+            max_retry_delay (float): Upper bound of the backoff after a failed delivery
+        """
+        self.sink = sink
+        self.spool_dir = spool_dir
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retry_delay = max_retry_delay
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        self._current = self.spool_dir / 'current.ndjson'
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._flush_requested: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._retry_delay = 0.0
+        self._seal()
+
+    def submit(self, record: Dict[str, Any]) -> None:
+        """Spool a record for delivery."""
+        with self._lock:
+            with open(self._current, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record) + '\n')
+            self._pending += 1
+            full = self._pending >= self.batch_size
+        if full and self._flush_requested is not None:
+            self._flush_requested.set()
+
+    def _seal(self) -> None:
+        """Turn the current spool file into a batch file."""
+        with self._lock:
+            if self._current.exists() and self._current.stat().st_size:
+                os.replace(self._current, self.spool_dir / f"batch-{time.time_ns():020d}.ndjson")
+            self._pending = 0
+
+    def _batches(self) -> List[Path]:
+        return sorted(self.spool_dir.glob('batch-*.ndjson'))
+
+    @property
+    def backlog(self) -> int:
+        """Number of sealed batches waiting for delivery."""
+        return len(self._batches())
+
+    async def flush(self) -> bool:
+        """
+        Seal the spool and deliver every waiting batch.
+
+        Returns:
+            bool: True if nothing is left waiting
+        """
+        self._seal()
+        for path in self._batches():
+            with open(path, encoding='utf-8') as f:
+                records = [json.loads(line) for line in f if line.strip()]
+            try:
+                if records:
+                    await self.sink.write_batch(records)
+            except Exception as e:
+                logger.error(f"Result sink {self.sink.name} failed, keeping {self.backlog} batch(es) spooled: {str(e)}")
+                return False
+            path.unlink()
+            logger.debug(f"Delivered {len(records)} result(s) to sink {self.sink.name}")
+        return True
+
+    async def _run(self) -> None:
+        while True:
+            if self._retry_delay:
+                # Back off while the sink is down, even if batches fill up
+                await asyncio.sleep(self._retry_delay)
+            else:
+                try:
+                    await asyncio.wait_for(self._flush_requested.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            self._flush_requested.clear()
+            if await self.flush():
+                self._retry_delay = 0.0
+            else:
+                self._retry_delay = min(self.max_retry_delay, max(1.0, self._retry_delay * 2))
+
+    def start(self) -> None:
+        self._flush_requested = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self, timeout: float = 10.0) -> None:
+        """Stop the background task and make a last delivery attempt; undelivered batches stay spooled."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        try:
+            await asyncio.wait_for(self.flush(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Result sink {self.sink.name} did not flush in {timeout}s, batches stay spooled")
+        await self.sink.close()
+
+
+class ResultSinks:
+    """Fans result records out to every configured sink writer."""
+
+    def __init__(self, writers: List[BatchingSinkWriter]):
+        self.writers = writers
+
+    def submit(self, record: Dict[str, Any]) -> None:
+        for writer in self.writers:
+            try:
+                writer.submit(record)
+            except OSError as e:
+                logger.error(f"Failed to spool result for sink {writer.sink.name}: {str(e)}", exc_info=True)
+
+    def start(self) -> None:
+        for writer in self.writers:
+            writer.start()
+
+    async def close(self) -> None:
+        await asyncio.gather(*(writer.close() for writer in self.writers))
+
+
+def create_sink(kind: str, target: str, ably: Any = None, postback_timeout: float = 10.0) -> ResultSink:
+    """
+    Create a sink from its kind and target.
+
+    Raises:
+        ValueError: If the kind is unknown or the target missing
+    """
+    if not target:
+        raise ValueError(f"Result sink '{kind}' needs a target, e.g. {kind}:<path, url or channel>")
+    if kind == 'ndjson':
+        return NDJSONSink(target)
+    elif kind == 'parquet':
+        return ParquetSink(target)
+    elif kind == 'sqlite':
+        return SQLiteSink(target)
+    elif kind == 'postgres':
+        return PostgresSink(target)
+    elif kind == 'postback':
+        return PostbackSink(target, timeout=postback_timeout)
+    elif kind == 'ably':
+        if ably is None:
+            raise ValueError("The ably result sink needs an Ably client")
+        return AblySink(ably, target)
+    raise ValueError(f"Unknown result sink '{kind}', expected one of {SINK_KINDS}")
+
+
+def parse_sink_specs(spec: str) -> List[Tuple[str, str]]:
+    """
+    Parse result sink specifications into (kind, target) pairs.
+
+    Entries are 'kind:target' separated by whitespace, which cannot appear in
+    a URL, so targets may contain commas, e.g. 'ndjson:results
+    postgres:postgresql://db/results?options=-c%20a=1,b=2'. Targets that
+    contain whitespace, like keyword/value Postgres DSNs, are given as a JSON
+    list of entries instead: '["ndjson:results", "postgres:host=db dbname=results"]'.
+
+    Raises:
+        ValueError: If the JSON list is malformed or entries look comma separated
+    """
+    spec = spec.strip()
+    if spec.startswith('['):
+        try:
+            entries = json.loads(spec)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid result sink list: {str(e)}") from e
+        if not isinstance(entries, list) or not all(isinstance(entry, str) for entry in entries):
+            raise ValueError("Result sink list must be a JSON list of 'kind:target' strings")
+    else:
+        entries = spec.split()
+
+    specs = []
+    for entry in filter(None, (entry.strip() for entry in entries)):
+        kind, _, target = entry.partition(':')
+        if any(f",{other}:" in target for other in SINK_KINDS):
+            raise ValueError(f"Result sink '{entry}' looks like several sinks; separate sinks with spaces, not commas")
+        specs.append((kind.strip().lower(), target.strip()))
+    return specs
+
+
+def create_result_sinks(spec: str, spool_dir: str, batch_size: int = 100, flush_interval: float = 5.0,
+                        ably: Any = None, postback_timeout: float = 10.0) -> Optional[ResultSinks]:
+    """
+    Create result sinks from 'kind:target' entries (see parse_sink_specs),
+    e.g. 'ndjson:results sqlite:results.db postback:https://example.com/results'.
+
+    Args:
+        spec (str): Sink specifications; empty disables result sinks
+        spool_dir (str): Spool directory of this service; each sink gets a subdirectory
+        batch_size (int): Records per batch
+        flush_interval (float): Seconds between flushes
+        ably: Ably client used by ably sinks
+        postback_timeout (float): Request timeout of postback sinks
+
+    Returns:
+        Optional[ResultSinks]: The sinks, or None if none are configured
+    """
+    writers = []
+    for index, (kind, target) in enumerate(parse_sink_specs(spec)):
+        sink = create_sink(kind, target, ably=ably, postback_timeout=postback_timeout)
+        writers.append(BatchingSinkWriter(
+            sink, Path(spool_dir) / f"{index}-{sink.name}", batch_size=batch_size, flush_interval=flush_interval
+        ))
+    return ResultSinks(writers) if writers else None
@@ -0,0 +1,14 @@
+import sys
+from pathlib import Path
+
+import fakeredis
+import pytest
+
+# The services are flat modules in the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture
+def redis_client():
+    """An in-memory Redis that runs Lua scripts (needs lupa)."""
+    return fakeredis.FakeStrictRedis()
@@ -0,0 +1,92 @@
+"""Fakes for running real browser_use agents in tests without a browser or an LLM provider."""
+import base64
+import io
+import os
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+os.environ.setdefault('ANONYMIZED_TELEMETRY', 'false')
+
+from browser_use import ActionResult, Agent, Controller
+from browser_use.browser.views import BrowserState
+from browser_use.dom.views import DOMElementNode
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from PIL import Image
+
+
+class ToolCallingFakeChatModel(GenericFakeChatModel):
+    """Replays scripted AIMessages; structured output reads their tool calls."""
+
+    def bind_tools(self, tools: Any, **kwargs: Any) -> Any:
+        return self
+
+
+def screenshot(color) -> str:
+    buffer = io.BytesIO()
+    Image.new('RGB', (40, 30), color).save(buffer, format='PNG')
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+class FakeBrowserContext:
+    """Stands in for a browser_use BrowserContext; every state is a new page with a new screenshot."""
+
+    def __init__(self):
+        self.config = SimpleNamespace(wait_between_actions=0)
+        self.session = None
+        self.pages = 0
+
+    async def get_state(self, *args: Any, **kwargs: Any) -> BrowserState:
+        self.pages += 1
+        return BrowserState(
+            element_tree=DOMElementNode(tag_name='body', xpath='', attributes={}, children=[], is_visible=True, parent=None),
+            selector_map={},
+            url=f"https://example.com/{self.pages}",
+            title=f"Page {self.pages}",
+            tabs=[],
+            screenshot=screenshot(((self.pages * 60) % 256, 0, 0)),
+        )
+
+    async def get_selector_map(self) -> Dict[int, Any]:
+        return {}
+
+    async def remove_highlights(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+
+def agent_step(action: Dict[str, Any], goal: str = 'continue') -> AIMessage:
+    """An LLM answer choosing a single action."""
+    return AIMessage(content='', tool_calls=[{
+        'name': 'AgentOutput',
+        'args': {
+            'current_state': {'evaluation_previous_goal': 'ok', 'memory': '', 'next_goal': goal},
+            'action': [action],
+        },
+        'id': f"call-{goal}",
+    }])
+
+
+def make_agent(notes: List[str], answer: str = '42', **kwargs: Any) -> Agent:
+    """
+    A real Agent that takes a 'note' step per entry of notes, then finishes with answer.
+
+    Extra keyword arguments are passed to Agent, e.g. register_new_step_callback.
+    """
+    controller = Controller()
+
+    @controller.action('Note a finding')
+    async def note(text: str):
+        return ActionResult(extracted_content=text, include_in_memory=True)
+
+    messages = [agent_step({'note': {'text': text}}, goal=f"note {text}") for text in notes]
+    messages.append(agent_step({'done': {'text': answer, 'success': True}}, goal='finish'))
+    return Agent(
+        task='Find the answer',
+        llm=ToolCallingFakeChatModel(messages=iter(messages)),
+        browser_context=FakeBrowserContext(),
+        controller=controller,
+        **kwargs,
+    )
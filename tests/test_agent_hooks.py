@@ -0,0 +1,46 @@
+import asyncio
+
+from fakes import make_agent
+
+from agent_hooks import chain_step_callbacks
+
+
+def test_chained_callbacks_run_inside_a_real_agent():
+    calls = []
+
+    def sync_callback(state, model_output, step):
+        calls.append(('sync', step))
+
+    async def async_callback(state, model_output, step):
+        calls.append(('async', step, state.url))
+
+    agent = make_agent(['a'], register_new_step_callback=chain_step_callbacks(sync_callback, None, async_callback))
+    history = asyncio.run(agent.run(max_steps=5))
+
+    assert history.final_result() == '42'
+    assert len(history.history) == 2
+    assert calls == [
+        ('sync', 2), ('async', 2, 'https://example.com/1'),
+        ('sync', 3), ('async', 3, 'https://example.com/2'),
+    ]
+
+
+def test_failing_callback_does_not_break_the_run():
+    seen = []
+
+    def broken(state, model_output, step):
+        raise RuntimeError('boom')
+
+    async def failing_coroutine(state, model_output, step):
+        raise RuntimeError('boom')
+
+    agent = make_agent(['a'], register_new_step_callback=chain_step_callbacks(
+        broken, failing_coroutine, lambda state, model_output, step: seen.append(step)
+    ))
+    history = asyncio.run(agent.run(max_steps=5))
+    assert history.final_result() == '42'
+    assert seen == [2, 3]
+
+
+def test_nothing_to_chain():
+    assert chain_step_callbacks(None, None) is None
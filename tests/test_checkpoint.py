@@ -0,0 +1,128 @@
+import asyncio
+import time
+
+import pytest
+from fakes import make_agent
+
+from checkpoint import DiskCheckpointStore, RedisCheckpointStore, RunCheckpointer, build_resume_task
+
+
+@pytest.fixture(params=['redis', 'disk'])
+def make_store(request, redis_client, tmp_path):
+    def make(owner, lease_ttl=300):
+        if request.param == 'redis':
+            return RedisCheckpointStore(redis_client, lease_ttl=lease_ttl, owner=owner)
+        return DiskCheckpointStore(tmp_path, lease_ttl=lease_ttl, owner=owner)
+    return make
+
+
+def checkpoint(run_id='run1'):
+    return {'run_id': run_id, 'service': 'api', 'task': 'task', 'meta': {}, 'history': []}
+
+
+def test_save_load_list_delete(make_store):
+    store = make_store('a')
+    store.save('run1', checkpoint())
+    assert store.load('run1')['task'] == 'task'
+    assert store.list_runs('api') == ['run1']
+    assert store.list_runs('realtime') == []
+    store.delete('run1')
+    assert store.load('run1') is None
+    assert store.list_runs('api') == []
+
+
+def test_live_run_cannot_be_claimed_by_another_worker(make_store):
+    owner, other = make_store('a'), make_store('b')
+    owner.save('run1', checkpoint())
+    assert not other.claim('run1')
+    assert not other.renew('run1')
+    assert owner.renew('run1')
+    owner.release('run1')
+    assert other.claim('run1')
+
+
+def test_release_leaves_another_workers_claim(make_store):
+    owner, other = make_store('a'), make_store('b')
+    assert other.claim('run1')
+    owner.release('run1')
+    assert not owner.claim('run1')
+
+
+def test_heartbeat_keeps_lease_through_a_long_step(redis_client):
+    owner = RedisCheckpointStore(redis_client, lease_ttl=1, owner='a')
+    other = RedisCheckpointStore(redis_client, lease_ttl=1, owner='b')
+    checkpointer = RunCheckpointer(owner, 'run1', 'api', 'task', max_steps=10)
+    checkpointer.save()
+
+    async def slow_step():
+        async with checkpointer.heartbeat():
+            await asyncio.sleep(1.5)
+            return other.claim('run1')
+
+    assert asyncio.run(slow_step()) is False
+    time.sleep(1.1)
+    assert other.claim('run1')
+
+
+def test_remaining_steps_after_resume(make_store):
+    resume_from = {'task': 'task', 'history': [{}, {}, {}], 'created_at': 1.0}
+    checkpointer = RunCheckpointer(make_store('a'), 'run1', 'api', 'task', max_steps=5, resume_from=resume_from)
+    assert checkpointer.remaining_steps == 2
+    assert checkpointer.created_at == 1.0
+
+
+def test_build_resume_task_summarises_progress():
+    prompt = build_resume_task({'task': 'Find X', 'history': [{
+        'state': {'url': 'https://example.com'},
+        'model_output': {'current_state': {'next_goal': 'Open example.com'}},
+        'result': [{'extracted_content': 'found it'}],
+    }]})
+    assert prompt.startswith('Find X\n')
+    assert '1. Open example.com (https://example.com)' in prompt
+    assert 'Result: found it' in prompt
+    assert 'The browser was last on https://example.com.' in prompt
+
+
+def test_real_agent_run_is_checkpointed_after_every_step(make_store):
+    store = make_store('a')
+    checkpointer = RunCheckpointer(store, 'run1', 'api', 'Find the answer', max_steps=10, meta={'session': 's'})
+    saved = []
+    save = checkpointer.save
+
+    def recording_save():
+        save()
+        saved.append(len(store.load('run1')['history']))
+
+    checkpointer.save = recording_save
+    agent = make_agent(['a', 'b'])
+    checkpointer.attach(agent)
+    history = asyncio.run(agent.run(max_steps=10))
+
+    assert history.final_result() == '42'
+    # Saved once each step finished, so the last step is never missing
+    assert saved == [1, 2, 3]
+    checkpoint = store.load('run1')
+    assert [item['state']['url'] for item in checkpoint['history']] == [
+        'https://example.com/1', 'https://example.com/2', 'https://example.com/3'
+    ]
+    assert checkpoint['history'][0]['result'][0]['extracted_content'] == 'a'
+    assert 'screenshot' not in checkpoint['history'][0]['state']
+    assert checkpoint['meta'] == {'session': 's'}
+
+
+def test_resumed_real_agent_keeps_previous_steps(make_store):
+    store = make_store('a')
+    first = RunCheckpointer(store, 'run1', 'api', 'Find the answer', max_steps=10)
+    agent = make_agent(['a'])
+    first.attach(agent)
+    asyncio.run(agent.run(max_steps=1))
+    interrupted = store.load('run1')
+    assert len(interrupted['history']) == 1
+
+    resumed = RunCheckpointer(store, 'run1', 'api', 'Find the answer', max_steps=10, resume_from=interrupted)
+    assert resumed.remaining_steps == 9
+    assert 'note a' in build_resume_task(interrupted)
+    agent = make_agent([])
+    resumed.attach(agent)
+    asyncio.run(agent.run(max_steps=resumed.remaining_steps))
+    assert len(store.load('run1')['history']) == 2
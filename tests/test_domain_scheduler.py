@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+
+from domain_scheduler import DomainLimit, DomainScheduler, parse_domain_limits
+
+
+def make_scheduler(redis_client, concurrency=1, rate=100, **kwargs):
+    return DomainScheduler(redis_client, DomainLimit(concurrency, rate), poll_interval=0.01, **kwargs)
+
+
+def test_parse_domain_limits():
+    limits = parse_domain_limits('www.Example.com=2:30, other.org=1:10')
+    assert limits == {'example.com': DomainLimit(2, 30), 'other.org': DomainLimit(1, 10)}
+    with pytest.raises(ValueError):
+        parse_domain_limits('example.com=2')
+
+
+def test_concurrency_limit_holds_until_release(redis_client):
+    scheduler = make_scheduler(redis_client, max_wait=0.05)
+
+    async def scenario():
+        async with scheduler.acquire(['example.com']):
+            assert not await scheduler._acquire_one('example.com', 'other')
+        assert await scheduler._acquire_one('example.com', 'other')
+
+    asyncio.run(scenario())
+
+
+def test_rate_limit(redis_client):
+    scheduler = make_scheduler(redis_client, concurrency=10, rate=2, max_wait=0.05)
+
+    async def scenario():
+        assert await scheduler._acquire_one('example.com', 'a')
+        assert await scheduler._acquire_one('example.com', 'b')
+        assert not await scheduler._acquire_one('example.com', 'c')
+
+    asyncio.run(scenario())
+
+
+def test_renewal_refreshes_expiry_of_active_set(redis_client):
+    scheduler = make_scheduler(redis_client, lease_ttl=120)
+    active_key = scheduler._keys('example.com')[0]
+
+    async def scenario():
+        assert await scheduler._acquire_one('example.com', 'token')
+
+    asyncio.run(scenario())
+    redis_client.expire(active_key, 5)
+    scheduler._extend(['example.com'], 'token')
+    assert redis_client.ttl(active_key) > 200
+
+
+def test_renewal_restores_a_slot_lost_with_its_key(redis_client):
+    scheduler = make_scheduler(redis_client, max_wait=0.05)
+    active_key = scheduler._keys('example.com')[0]
+
+    async def scenario():
+        assert await scheduler._acquire_one('example.com', 'token')
+        redis_client.delete(active_key)
+        scheduler._extend(['example.com'], 'token')
+        assert redis_client.zscore(active_key, 'token') is not None
+        assert not await scheduler._acquire_one('example.com', 'other')
+
+    asyncio.run(scenario())
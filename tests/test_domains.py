@@ -0,0 +1,19 @@
+from domains import extract_domains, normalize_domain
+
+
+def test_normalize_domain_strips_www_and_case():
+    assert normalize_domain('WWW.Example.COM.') == 'example.com'
+
+
+def test_extract_domains_from_urls_and_bare_hosts():
+    task = 'Compare https://www.amazon.com/dp/B0 with bestbuy.com and amazon.com'
+    assert extract_domains(task) == ['amazon.com', 'bestbuy.com']
+
+
+def test_extract_domains_ignores_file_names():
+    task = 'Summarize README.md and file.txt, then compare them with the docs on python.org'
+    assert extract_domains(task) == ['python.org']
+
+
+def test_extract_domains_keeps_any_url_host():
+    assert extract_domains('Open http://intranet.corp/report.md') == ['intranet.corp']
@@ -0,0 +1,136 @@
+import asyncio
+import threading
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from fetch_cache import FetchCache, freshness_lifetime
+
+
+class Handler(BaseHTTPRequestHandler):
+    hits = 0
+
+    def do_GET(self):
+        Handler.hits += 1
+        cache_control = 'public, max-age=60' if self.path == '/public' else 'max-age=60'
+        body = f"hello {self.headers.get('Cookie', 'anonymous')}".encode()
+        self.send_response(200)
+        self.send_header('Cache-Control', cache_control)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    Handler.hits = 0
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = FetchCache(tmp_path)
+    yield cache
+    cache.close()
+
+
+class FakeResponse:
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers
+        self._body = body
+
+    async def body(self):
+        return self._body
+
+
+class FakeRequest:
+    """A Playwright request; like Playwright, `headers` leaves out the Cookie header."""
+
+    def __init__(self, url, cookie=None):
+        self.method = 'GET'
+        self.url = url
+        self.headers = {'accept': '*/*'}
+        self._all_headers = {**self.headers, **({'cookie': cookie} if cookie else {})}
+
+    async def all_headers(self):
+        return self._all_headers
+
+
+class FakeRoute:
+    """A Playwright route whose fetch goes to the real server with the context's cookies."""
+
+    def __init__(self, url, cookie=None):
+        self.request = FakeRequest(url, cookie)
+        self.fulfilled = None
+
+    async def fetch(self, headers, max_redirects):
+        cookie = self.request._all_headers.get('cookie')
+        request = urllib.request.Request(self.request.url, headers={**headers, **({'Cookie': cookie} if cookie else {})})
+
+        def get():
+            with urllib.request.urlopen(request) as response:
+                return FakeResponse(response.status, dict(response.headers), response.read())
+
+        return await asyncio.to_thread(get)
+
+    async def fulfill(self, status, headers, body):
+        self.fulfilled = body
+
+    async def fallback(self):
+        raise AssertionError('unexpected fallback')
+
+
+def browse(cache, url, cookie=None):
+    route = FakeRoute(url, cookie)
+    asyncio.run(cache._handle_route(route))
+    return route.fulfilled
+
+
+def test_freshness_lifetime():
+    assert freshness_lifetime({'cache-control': 'max-age=60'}) == 60
+    assert freshness_lifetime({'cache-control': 'private, max-age=60'}) is None
+    assert freshness_lifetime({'cache-control': 'max-age=60', 'age': '20'}) == 40
+    assert freshness_lifetime({'cache-control': 'max-age=60', 'set-cookie': 'a=b'}) is None
+
+
+def test_anonymous_responses_are_shared(cache, server):
+    assert browse(cache, f"{server}/page") == b'hello anonymous'
+    assert browse(cache, f"{server}/page") == b'hello anonymous'
+    assert Handler.hits == 1
+
+
+def test_responses_to_cookie_requests_are_not_shared(cache, server):
+    assert browse(cache, f"{server}/page", cookie='session=alice') == b'hello session=alice'
+    # Neither an anonymous context nor another user gets Alice's page
+    assert browse(cache, f"{server}/page") == b'hello anonymous'
+    assert browse(cache, f"{server}/page", cookie='session=bob') == b'hello session=bob'
+    assert Handler.hits == 3
+
+
+def test_cached_anonymous_page_is_not_served_to_cookie_requests(cache, server):
+    browse(cache, f"{server}/page")
+    assert browse(cache, f"{server}/page", cookie='session=alice') == b'hello session=alice'
+    assert Handler.hits == 2
+
+
+def test_public_responses_are_shared_with_cookie_requests(cache, server):
+    assert browse(cache, f"{server}/public", cookie='session=alice') == b'hello session=alice'
+    assert browse(cache, f"{server}/public", cookie='session=bob') == b'hello session=alice'
+    assert Handler.hits == 1
+
+
+def test_authorization_requests_are_not_stored(cache, server):
+    headers = {'authorization': 'Bearer token'}
+    assert not cache.store(f"{server}/page", headers, 200, {'Cache-Control': 'max-age=60'}, b'secret')
+    assert cache.store(f"{server}/page", headers, 200, {'Cache-Control': 'public, max-age=60'}, b'shared')
+    assert cache.lookup(f"{server}/page", {}).body == b'shared'
@@ -0,0 +1,122 @@
+import asyncio
+from types import SimpleNamespace
+
+from fakes import make_agent
+
+from health import BrowserWatchdog, HealthMonitor
+
+
+class FakePage:
+    def __init__(self, url, responsive=True):
+        self.url = url
+        self.responsive = responsive
+        self.closed = False
+
+    async def evaluate(self, expression):
+        if not self.responsive:
+            await asyncio.sleep(10)
+        return 1
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeCDPSession:
+    async def send(self, method):
+        if method == 'SystemInfo.getProcessInfo':
+            return {'processInfo': [{'type': 'renderer', 'id': 2}, {'type': 'browser', 'id': 1}]}
+        return {}
+
+    async def detach(self):
+        pass
+
+
+class FakePlaywrightBrowser:
+    def __init__(self, *contexts):
+        self.contexts = list(contexts)
+
+    def is_connected(self):
+        return True
+
+    async def new_browser_cdp_session(self):
+        return FakeCDPSession()
+
+
+def make_watchdog(*contexts, **kwargs):
+    browser = SimpleNamespace(playwright_browser=FakePlaywrightBrowser(*contexts), playwright=None)
+    return BrowserWatchdog(browser, probe_timeout=0.01, **kwargs)
+
+
+def test_page_is_closed_only_after_consecutive_failures():
+    page = FakePage('https://slow.example.com', responsive=False)
+    watchdog = make_watchdog(SimpleNamespace(pages=[page]), page_failure_threshold=3)
+
+    async def checks():
+        for _ in range(2):
+            assert await watchdog.check()
+            assert not page.closed
+        assert await watchdog.check()
+        assert page.closed
+
+    asyncio.run(checks())
+
+
+def test_failure_count_resets_when_page_answers():
+    page = FakePage('https://example.com', responsive=False)
+    watchdog = make_watchdog(SimpleNamespace(pages=[page]), page_failure_threshold=2)
+
+    async def checks():
+        await watchdog.check()
+        page.responsive = True
+        await watchdog.check()
+        page.responsive = False
+        await watchdog.check()
+        assert not page.closed
+
+    asyncio.run(checks())
+
+
+def test_pages_of_busy_contexts_are_not_probed():
+    busy_page = FakePage('https://busy.example.com', responsive=False)
+    busy = SimpleNamespace(pages=[busy_page])
+    watchdog = make_watchdog(busy, page_failure_threshold=1, is_context_busy=lambda context: context is busy)
+    asyncio.run(watchdog.check())
+    assert not busy_page.closed
+
+
+def test_browser_pid_is_recorded_from_cdp():
+    watchdog = make_watchdog()
+    asyncio.run(watchdog.check())
+    assert watchdog.browser_pid == 1
+
+
+def test_liveness_reports_stale_heartbeats(redis_client):
+    monitor = HealthMonitor('test', redis_client)
+    monitor.heartbeat('worker', stale_after=-1)
+    alive, report = monitor.liveness()
+    assert not alive
+    assert 'worker' in report['stale_heartbeats']
+
+
+def test_real_agent_steps_record_heartbeats(redis_client):
+    monitor = HealthMonitor('realtime', redis_client)
+    monitor.heartbeat('worker', stale_after=-1)
+    agent = make_agent(['a'], register_new_step_callback=monitor.heartbeat_callback('worker', stale_after=60))
+    history = asyncio.run(agent.run(max_steps=5))
+    assert history.final_result() == '42'
+    alive, report = monitor.liveness()
+    assert alive and report['stale_heartbeats'] == {}
+
+
+def test_readiness_requires_redis_and_healthy_browser(redis_client):
+    watchdog = make_watchdog()
+    monitor = HealthMonitor('test', redis_client, watchdog=watchdog)
+    ready, report = asyncio.run(monitor.readiness())
+    assert ready and report['redis']['ok']
+    watchdog.consecutive_failures = 1
+    assert not asyncio.run(monitor.readiness())[0]
+
+
+def test_recycle_only_kills_processes_of_this_service():
+    from health import _browser_processes
+    assert _browser_processes(1) == []
@@ -0,0 +1,45 @@
+import asyncio
+
+from fakes import make_agent, screenshot
+
+from history_spill import HistorySpiller
+
+
+def page_screenshot(page):
+    return screenshot(((page * 60) % 256, 0, 0))
+
+
+def run_spilled_agent(tmp_path, notes, window):
+    spiller = HistorySpiller(tmp_path / 'history', window=window)
+    agent = make_agent(notes, register_new_step_callback=spiller.on_step)
+    spiller.attach(agent)
+    history = asyncio.run(agent.run(max_steps=10))
+    return spiller, agent, history
+
+
+def test_real_agent_history_is_spilled_outside_the_window(tmp_path):
+    spiller, agent, history = run_spilled_agent(tmp_path, ['a', 'b', 'c', 'd'], window=1)
+    assert history.final_result() == '42'
+
+    # browser_use calls the step callback before the step's history item is
+    # added, so the newest finished step is spilled one step later
+    items = agent.state.history.history
+    assert len(items) == 5
+    assert [step.index for step in spiller.spilled] == [0, 1, 2]
+    assert sorted(path.name for path in (tmp_path / 'history').iterdir()) == [
+        'step-00001.json.gz', 'step-00002.json.gz', 'step-00003.json.gz'
+    ]
+    assert [item.state.screenshot is None for item in items] == [True, True, True, False, False]
+    assert [step.url for step in spiller.spilled] == [
+        'https://example.com/1', 'https://example.com/2', 'https://example.com/3'
+    ]
+
+    step = spiller.spilled[1]
+    assert step.load()['result'][0]['extracted_content'] == 'b'
+    assert step.screenshot() == page_screenshot(2)
+
+
+def test_iter_screenshots_yields_the_whole_run_in_order(tmp_path):
+    spiller, _, _ = run_spilled_agent(tmp_path, ['a', 'b', 'c'], window=1)
+    assert spiller.spilled
+    assert list(spiller.iter_screenshots()) == [page_screenshot(n) for n in range(1, 5)]
@@ -0,0 +1,140 @@
+import asyncio
+import os
+from typing import Any, List, Optional
+
+import pytest
+from langchain_core.language_models import BaseChatModel
+from langchain_core.language_models.fake_chat_models import FakeListChatModel, GenericFakeChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from llm_router import LLMRouter, is_easy_step, is_rate_limit_error
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+
+class FakeChatModel(BaseChatModel):
+    """Chat model answering `reply` after `delay` seconds, or raising `error`."""
+
+    reply: str = 'ok'
+    delay: float = 0.0
+    error: Optional[Exception] = None
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return 'fake'
+
+    def bind_tools(self, tools: Any, **kwargs: Any) -> Any:
+        return self
+
+    def _answer(self) -> ChatResult:
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.reply))])
+
+    def _generate(self, messages: List[BaseMessage], stop: Any = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        return self._answer()
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Any = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self.delay)
+        return self._answer()
+
+
+def test_falls_back_to_next_route_on_error():
+    broken = FakeChatModel(error=RuntimeError('boom'))
+    router = LLMRouter.from_models([('a', broken), ('b', FakeListChatModel(responses=['from b']))])
+    assert router.invoke('hi').content == 'from b'
+    assert asyncio.run(router.ainvoke('hi')).content == 'from b'
+    assert broken.calls == 2
+    assert not router.routes[0][0].cooling_down
+
+
+def test_rate_limited_route_cools_down():
+    limited = FakeChatModel(error=RateLimitError('too many requests'))
+    backup = FakeChatModel(reply='from b')
+    router = LLMRouter.from_models([('a', limited), ('b', backup)], cooldown_seconds=60)
+
+    assert is_rate_limit_error(limited.error)
+    assert asyncio.run(router.ainvoke('hi')).content == 'from b'
+    assert router.routes[0][0].cooling_down
+    # The rate limited route is skipped while it cools down
+    assert asyncio.run(router.ainvoke('hi')).content == 'from b'
+    assert limited.calls == 1
+    assert backup.calls == 2
+
+
+def test_all_routes_failing_raises_last_error():
+    router = LLMRouter.from_models([
+        ('a', FakeChatModel(error=RuntimeError('first'))),
+        ('b', FakeChatModel(error=RuntimeError('second'))),
+    ])
+    with pytest.raises(RuntimeError, match='second'):
+        asyncio.run(router.ainvoke('hi'))
+
+
+def test_slow_call_is_hedged_after_p95():
+    slow = FakeChatModel(reply='slow', delay=5)
+    fast = FakeChatModel(reply='fast')
+    router = LLMRouter.from_models([('a', slow), ('b', fast)], hedge_min_samples=3, hedge_min_delay=0.05)
+    for latency in (0.01, 0.02, 0.03):
+        router.routes[0][0].record_latency(latency)
+
+    async def scenario():
+        started = asyncio.get_running_loop().time()
+        result = await router.ainvoke('hi')
+        return result, asyncio.get_running_loop().time() - started
+
+    result, elapsed = asyncio.run(scenario())
+    assert result.content == 'fast'
+    assert elapsed < 1
+    assert fast.calls == 1
+
+
+def test_no_hedging_before_enough_samples():
+    slow = FakeChatModel(reply='slow', delay=0.1)
+    fast = FakeChatModel(reply='fast')
+    router = LLMRouter.from_models([('a', slow), ('b', fast)], hedge_min_samples=3, hedge_min_delay=0.01)
+    assert asyncio.run(router.ainvoke('hi')).content == 'slow'
+    assert fast.calls == 0
+
+
+def test_easy_steps_go_to_cheap_model():
+    main = FakeChatModel(reply='main')
+    cheap = FakeChatModel(reply='cheap')
+    router = LLMRouter.from_models([('main', main)], cheap_model=('cheap', cheap))
+
+    assert asyncio.run(router.ainvoke([HumanMessage(content='short page')])).content == 'cheap'
+    image = [{'type': 'text', 'text': 'page'}, {'type': 'image_url', 'image_url': {'url': 'data:'}}]
+    assert not is_easy_step([HumanMessage(content=image)])
+    assert asyncio.run(router.ainvoke([HumanMessage(content=image)])).content == 'main'
+    assert asyncio.run(router.ainvoke([HumanMessage(content='x' * 10000)])).content == 'main'
+
+
+def test_browser_use_agent_accepts_router():
+    pytest.importorskip('browser_use')
+    os.environ.setdefault('ANONYMIZED_TELEMETRY', 'false')
+    from browser_use import Agent, Browser
+
+    class ToolCallingFake(GenericFakeChatModel):
+        def bind_tools(self, tools: Any, **kwargs: Any) -> Any:
+            return self
+
+    answer = AIMessage(content='', tool_calls=[{
+        'name': 'AgentOutput',
+        'args': {
+            'current_state': {'evaluation_previous_goal': 'ok', 'memory': '', 'next_goal': 'finish'},
+            'action': [{'done': {'text': '42', 'success': True}}],
+        },
+        'id': 'call-1',
+    }])
+    broken = FakeChatModel(error=RuntimeError('boom'))
+    router = LLMRouter.from_models([('a', broken), ('b', ToolCallingFake(messages=iter([answer])))])
+    agent = Agent(task='answer', llm=router, page_extraction_llm=router, browser=Browser())
+
+    output = asyncio.run(agent.get_next_action([HumanMessage(content='page state')]))
+    assert output.action[0].model_dump(exclude_unset=True) == {'done': {'text': '42', 'success': True}}
+    assert broken.calls == 1
@@ -0,0 +1,62 @@
+import asyncio
+import logging
+
+from fakes import make_agent
+
+from agent_hooks import chain_step_callbacks
+from logging_config import CorrelationFilter, bind_task, describe_task, reset_task, step_var, task_id_var, track_step
+
+
+def correlation():
+    record = logging.LogRecord('test', logging.INFO, __file__, 1, 'message', None, None)
+    CorrelationFilter().filter(record)
+    return record.task_id, record.step
+
+
+def test_reset_task_restores_previous_ids():
+    async def handle(run_id, seen):
+        binding = bind_task(run_id)
+        try:
+            await track_step(None, None, 3)
+            seen.append(correlation())
+        finally:
+            reset_task(binding)
+
+    async def poll_loop():
+        # Messages are handled one after another in the same asyncio task
+        seen = []
+        await handle('run-1', seen)
+        after_first = correlation()
+        await handle('run-2', seen)
+        return seen, after_first, correlation()
+
+    seen, after_first, after_second = asyncio.run(poll_loop())
+    assert seen == [('run-1', 3), ('run-2', 3)]
+    assert after_first == after_second == (None, None)
+    assert task_id_var.get() is None and step_var.get() is None
+
+
+def test_real_agent_steps_tag_log_records():
+    seen = []
+
+    async def scenario():
+        binding = bind_task('run-1')
+        try:
+            agent = make_agent(['a'], register_new_step_callback=chain_step_callbacks(
+                track_step, lambda state, model_output, step: seen.append(correlation())
+            ))
+            history = await agent.run(max_steps=5)
+        finally:
+            reset_task(binding)
+        return history, correlation()
+
+    history, after = asyncio.run(scenario())
+    assert history.final_result() == '42'
+    assert seen == [('run-1', 2), ('run-1', 3)]
+    assert after == (None, None)
+
+
+def test_describe_task_hides_task_text():
+    description = describe_task('log in with password hunter2')
+    assert 'hunter2' not in description
+    assert description == describe_task('log in with password hunter2')
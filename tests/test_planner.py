@@ -0,0 +1,47 @@
+import asyncio
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from planner import parse_subtasks, run_planned
+
+
+def test_parse_subtasks():
+    assert parse_subtasks('Sure: ["a", " b ", 3, ""]', 5) == ['a', 'b']
+    assert parse_subtasks('no plan', 5) == []
+    assert parse_subtasks('["a", "b", "c"]', 2) == ['a', 'b']
+
+
+def test_unsplittable_task_runs_as_single_run():
+    llm = FakeListChatModel(responses=['["the task"]'])
+    calls = []
+
+    async def run_subtask(task):
+        calls.append(('subtask', task))
+        return {'result': 'sub'}
+
+    async def run_single(task):
+        calls.append(('single', task))
+        return {'result': 'single', 'cached': False}
+
+    result = asyncio.run(run_planned('the task', llm, run_subtask, run_single))
+    assert result == {'result': 'single', 'cached': False}
+    assert calls == [('single', 'the task')]
+
+
+def test_subtasks_run_and_merge_with_failures_reported():
+    llm = FakeListChatModel(responses=['["price on a.com", "price on b.com"]', 'merged'])
+
+    async def run_subtask(task):
+        if 'b.com' in task:
+            raise RuntimeError('site down')
+        return {'result': '10', 'cached': True}
+
+    async def run_single(task):
+        raise AssertionError('should not run')
+
+    result = asyncio.run(run_planned('compare prices', llm, run_subtask, run_single))
+    assert result['result'] == 'merged'
+    assert result['subtasks'] == [
+        {'task': 'price on a.com', 'result': '10', 'cached': True},
+        {'task': 'price on b.com', 'error': 'site down'},
+    ]
@@ -0,0 +1,113 @@
+import asyncio
+import json
+import threading
+import time
+
+from profiling import (BROWSER_TRACE_FILENAME, CPU_PROFILE_FILENAME, WAITS_FILENAME, StackSampler, TaskProfiler,
+                       TaskWaitSampler, parse_profile_header)
+from settings import load_settings
+
+
+class FakePlaywrightBrowser:
+    def __init__(self):
+        self.calls = []
+
+    async def start_tracing(self, path, screenshots):
+        self.calls.append('start')
+        with open(path, 'w') as f:
+            f.write('{"traceEvents": []}')
+
+    async def stop_tracing(self):
+        self.calls.append('stop')
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.playwright_browser = FakePlaywrightBrowser()
+
+    async def get_playwright_browser(self):
+        return self.playwright_browser
+
+
+def busy_loop(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_stack_sampler_records_busy_threads(tmp_path):
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_loop, args=(stop,), name='busy-worker')
+    sampler = StackSampler(interval=0.005)
+    worker.start()
+    sampler.start()
+    time.sleep(0.2)
+    sampler.stop()
+    stop.set()
+    worker.join()
+
+    busy = [stack for stack in sampler.samples if 'busy_loop (test_profiling.py' in stack]
+    assert busy
+    assert all(stack.startswith('busy-worker;') for stack in busy)
+    sampler.write(tmp_path / CPU_PROFILE_FILENAME)
+    lines = (tmp_path / CPU_PROFILE_FILENAME).read_text().splitlines()
+    assert lines and all(line.rsplit(' ', 1)[1].isdigit() for line in lines)
+
+
+def test_task_wait_sampler_attributes_sleep():
+    async def scenario():
+        task = asyncio.create_task(asyncio.sleep(0.2))
+        sampler = TaskWaitSampler(task, interval=0.01)
+        sampler.start()
+        await task
+        await sampler.stop()
+        return sampler
+
+    sampler = asyncio.run(scenario())
+    assert sampler.seconds['sleep'] > 0.1
+    assert any(frame.startswith('sleep: ') for frame in sampler.frames)
+
+
+def test_profiling_is_off_by_default():
+    settings, _ = load_settings('api', environ={})
+    assert settings.profiling_enabled is False
+    assert parse_profile_header(None) == {'profile': False, 'browser_trace': False}
+    assert parse_profile_header('nonsense') == {'profile': False, 'browser_trace': False}
+    assert parse_profile_header('true') == {'profile': True, 'browser_trace': False}
+    assert parse_profile_header('browser') == {'profile': True, 'browser_trace': True}
+
+
+def test_profiler_skips_browser_trace_unless_requested(tmp_path):
+    browser = FakeBrowser()
+
+    async def scenario():
+        profiler = TaskProfiler(tmp_path, interval=0.005)
+        await profiler.start(browser)
+        await asyncio.sleep(0.05)
+        return await profiler.stop()
+
+    artifacts = asyncio.run(scenario())
+    assert artifacts == [CPU_PROFILE_FILENAME, WAITS_FILENAME]
+    assert browser.playwright_browser.calls == []
+    assert json.loads((tmp_path / WAITS_FILENAME).read_text())['seconds']
+
+
+def test_only_one_browser_trace_at_a_time(tmp_path):
+    browser = FakeBrowser()
+
+    async def scenario():
+        first = TaskProfiler(tmp_path / 'first', browser_trace=True, interval=0.005)
+        second = TaskProfiler(tmp_path / 'second', browser_trace=True, interval=0.005)
+        await first.start(browser)
+        await second.start(browser)
+        await asyncio.sleep(0.02)
+        traced = await first.stop(), await second.stop()
+        # The trace is free again once the first task is done
+        third = TaskProfiler(tmp_path / 'third', browser_trace=True, interval=0.005)
+        await third.start(browser)
+        return traced + (await third.stop(),)
+
+    first, second, third = asyncio.run(scenario())
+    assert BROWSER_TRACE_FILENAME in first
+    assert BROWSER_TRACE_FILENAME not in second
+    assert BROWSER_TRACE_FILENAME in third
+    assert browser.playwright_browser.calls == ['start', 'stop', 'start', 'stop']
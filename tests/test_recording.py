@@ -0,0 +1,117 @@
+import asyncio
+import base64
+import io
+import json
+
+from fakes import make_agent
+from PIL import Image
+
+from recording import (GIF_FILENAME, MANIFEST_FILENAME, TaskRecorder, _GifStreamWriter, _SegmentWriter,
+                       find_recording)
+
+
+def frame(color, size=(40, 30)):
+    return Image.new('RGB', size, color)
+
+
+def screenshot(color):
+    buffer = io.BytesIO()
+    frame(color).save(buffer, format='PNG')
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+def gif_frames(path):
+    with Image.open(path) as image:
+        colors = []
+        for index in range(image.n_frames):
+            image.seek(index)
+            colors.append(image.convert('RGB').getpixel((0, 0)))
+        return colors
+
+
+def test_gif_stream_writer_is_playable_after_every_frame(tmp_path):
+    path = tmp_path / GIF_FILENAME
+    writer = _GifStreamWriter(path)
+    writer.write(frame((255, 0, 0)), 1000)
+    assert gif_frames(path) == [(255, 0, 0)]
+    writer.write(frame((0, 0, 255), size=(80, 60)), 500)
+    writer.close()
+    assert gif_frames(path) == [(255, 0, 0), (0, 0, 255)]
+    with Image.open(path) as image:
+        assert image.size == (40, 30)
+
+
+def test_gif_append_continues_recording(tmp_path):
+    path = tmp_path / GIF_FILENAME
+    writer = _GifStreamWriter(path)
+    writer.write(frame((255, 0, 0)), 1000)
+    writer.close()
+
+    resumed = _GifStreamWriter(path, append=True)
+    resumed.write(frame((0, 255, 0)), 1000)
+    resumed.close()
+    assert gif_frames(path) == [(255, 0, 0), (0, 255, 0)]
+
+    # Without append a new run starts over
+    fresh = _GifStreamWriter(path)
+    fresh.write(frame((0, 0, 255)), 1000)
+    fresh.close()
+    assert gif_frames(path) == [(0, 0, 255)]
+
+
+def test_gif_append_drops_frame_cut_short_by_crash(tmp_path):
+    path = tmp_path / GIF_FILENAME
+    writer = _GifStreamWriter(path)
+    writer.write(frame((255, 0, 0)), 1000)
+    writer.write(frame((0, 255, 0)), 1000)
+    writer.close()
+    path.write_bytes(path.read_bytes()[:-20])
+
+    resumed = _GifStreamWriter(path, append=True)
+    resumed.write(frame((0, 0, 255)), 1000)
+    resumed.close()
+    assert gif_frames(path) == [(255, 0, 0), (0, 0, 255)]
+
+
+def test_segment_append_continues_manifest(tmp_path):
+    writer = _SegmentWriter(tmp_path, 'webp', segment_frames=1)
+    writer.write(frame((255, 0, 0)), 1000)
+    writer.close()
+
+    resumed = _SegmentWriter(tmp_path, 'webp', segment_frames=1, append=True)
+    resumed.write(frame((0, 255, 0)), 1000)
+    resumed.close()
+
+    manifest = json.loads((tmp_path / MANIFEST_FILENAME).read_text())
+    assert [segment['file'] for segment in manifest['segments']] == ['segment-00001.webp', 'segment-00002.webp']
+    assert all((tmp_path / segment['file']).is_file() for segment in manifest['segments'])
+
+
+def test_recorder_merges_duplicate_frames(tmp_path):
+    recorder = TaskRecorder(tmp_path, fmt='gif')
+    assert find_recording(tmp_path) is None
+
+    async def scenario():
+        for color in ((255, 0, 0), (255, 0, 0), (0, 0, 255)):
+            recorder.add_frame(screenshot(color))
+        return await recorder.close()
+
+    path = asyncio.run(scenario())
+    assert path == tmp_path / GIF_FILENAME == find_recording(tmp_path)
+    assert gif_frames(path) == [(255, 0, 0), (0, 0, 255)]
+    with Image.open(path) as image:
+        assert image.info['duration'] == 2000
+
+
+def test_recorder_records_a_real_agent_run(tmp_path):
+    recorder = TaskRecorder(tmp_path, fmt='gif')
+    agent = make_agent(['a', 'b'], register_new_step_callback=recorder.on_step)
+
+    async def scenario():
+        history = await agent.run(max_steps=5)
+        return history, await recorder.close()
+
+    history, path = asyncio.run(scenario())
+    assert history.final_result() == '42'
+    assert recorder.frames_written == 3
+    assert len(gif_frames(path)) == 3
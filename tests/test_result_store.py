@@ -0,0 +1,76 @@
+import asyncio
+import time
+
+import pytest
+
+from result_store import STATUS_PENDING, STATUS_SUCCEEDED, IdempotencyConflict, ResultStore, request_fingerprint
+
+
+@pytest.fixture
+def store(redis_client):
+    return ResultStore(redis_client, result_ttl=60, pending_ttl=60)
+
+
+def test_fingerprint_ignores_key_order():
+    assert request_fingerprint({'a': 1, 'b': 2}) == request_fingerprint({'b': 2, 'a': 1})
+
+
+def test_first_claim_owns_key_and_retry_sees_pending(store):
+    assert store.claim('key', 'fp', 'run1') is None
+    existing = store.claim('key', 'fp', 'run2')
+    assert existing['status'] == STATUS_PENDING
+    assert existing['task_id'] == 'run1'
+
+
+def test_reuse_with_different_body_conflicts(store):
+    store.claim('key', 'fp', 'run1')
+    with pytest.raises(IdempotencyConflict):
+        store.claim('key', 'other', 'run2')
+
+
+def test_completed_response_is_replayed(store):
+    store.claim('key', 'fp', 'run1')
+    store.complete('key', 'fp', {'status': 'success'})
+    existing = store.claim('key', 'fp', 'run2')
+    assert existing['status'] == STATUS_SUCCEEDED
+    assert existing['response'] == {'status': 'success'}
+
+
+def test_release_drops_only_own_claim(store, redis_client):
+    store.claim('key', 'fp', 'run1')
+    redis_client.delete(store._key('key'))
+    assert store.claim('key', 'fp', 'run2') is None
+    assert not store.release('key', 'run1')
+    assert store.get('key')['task_id'] == 'run2'
+    assert store.release('key', 'run2')
+    assert store.get('key') is None
+
+
+def test_release_keeps_completed_result(store):
+    store.claim('key', 'fp', 'run1')
+    store.complete('key', 'fp', {'status': 'success'})
+    assert not store.release('key', 'run1')
+    assert store.get('key')['status'] == STATUS_SUCCEEDED
+
+
+def test_renew_extends_only_own_claim(store, redis_client):
+    store.claim('key', 'fp', 'run1')
+    redis_client.expire(store._key('key'), 5)
+    assert not store.renew('key', 'run2')
+    assert redis_client.ttl(store._key('key')) <= 5
+    assert store.renew('key', 'run1')
+    assert redis_client.ttl(store._key('key')) > 5
+
+
+def test_hold_keeps_claim_past_pending_ttl(redis_client):
+    store = ResultStore(redis_client, pending_ttl=1)
+    store.claim('key', 'fp', 'run1')
+
+    async def long_run():
+        async with store.hold('key', 'run1'):
+            await asyncio.sleep(1.5)
+
+    asyncio.run(long_run())
+    assert store.get('key')['task_id'] == 'run1'
+    time.sleep(1.1)
+    assert store.get('key') is None
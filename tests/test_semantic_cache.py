@@ -0,0 +1,82 @@
+import pytest
+
+from semantic_cache import HashedNgramEmbedder, SemanticCache, content_words, task_signature
+
+CACHED_TASK = 'find the price of iphone 15 on amazon.com'
+
+
+@pytest.fixture
+def cache(redis_client):
+    cache = SemanticCache(redis_client, HashedNgramEmbedder(), domains={'*'})
+    cache.add(CACHED_TASK, ttl=60)
+    return cache
+
+
+def test_content_words_drop_filler_and_fold_synonyms():
+    assert content_words('What does the iPhone 15 cost?') == ('iphone', '15', 'price')
+
+
+@pytest.mark.parametrize('task', [
+    'Find the price of the iPhone 15 on amazon.com',
+    'What does the iPhone 15 cost on amazon.com?',
+    'On amazon.com, look up the price of the iphone 15',
+])
+def test_paraphrase_hits(cache, task):
+    match = cache.lookup(task)
+    assert match is not None
+    assert match[0] == CACHED_TASK
+    assert match[1] >= cache.threshold
+
+
+@pytest.mark.parametrize('task', [
+    'find the price of iphone 15 pro on amazon.com',
+    'find the price of iphone 16 on amazon.com',
+    'find the price of iphone 15 on bestbuy.com',
+    'find the reviews of iphone 15 on amazon.com',
+])
+def test_near_misses_are_rejected(cache, task):
+    assert cache.lookup(task) is None
+
+
+def test_different_action_is_rejected(redis_client):
+    cache = SemanticCache(redis_client, HashedNgramEmbedder(), domains={'*'})
+    cache.add('Book a table at nobu.com for 4', ttl=60)
+    assert cache.lookup('Cancel a table at nobu.com for 4') is None
+    assert task_signature('Book a table at nobu.com for 4') != task_signature('Cancel a table at nobu.com for 4')
+
+
+@pytest.mark.parametrize('cached, task', [
+    ('log in to example.com', 'log out of example.com'),
+    ('sign up for the newsletter on example.com', 'sign me out of the newsletter on example.com'),
+    ('check the weather in paris', 'check the weather out of paris'),
+    ('subscribe to the newsletter on example.com', "don't subscribe to the newsletter on example.com"),
+])
+def test_opposite_particles_and_negations_are_rejected(redis_client, cached, task):
+    cache = SemanticCache(redis_client, HashedNgramEmbedder(), domains={'*'})
+    cache.add(cached, ttl=60)
+    assert cache.lookup(task) is None
+    assert task_signature(cached) != task_signature(task)
+
+
+def test_negation_spellings_match():
+    assert content_words("Don't subscribe to the newsletter") == content_words('do not subscribe to the newsletter')
+
+
+def test_index_is_shared_between_workers_through_redis(redis_client):
+    writer = SemanticCache(redis_client, HashedNgramEmbedder(), domains={'*'})
+    reader = SemanticCache(redis_client, HashedNgramEmbedder(), domains={'*'}, sync_interval=0)
+    writer.add(CACHED_TASK, ttl=60)
+    assert reader.lookup('What does the iPhone 15 cost on amazon.com?')[0] == CACHED_TASK
+
+
+def test_expired_entries_do_not_match(redis_client):
+    cache = SemanticCache(redis_client, HashedNgramEmbedder(), domains={'*'}, sync_interval=0)
+    cache.add(CACHED_TASK, ttl=-1)
+    assert cache.lookup('What does the iPhone 15 cost on amazon.com?') is None
+
+
+def test_enabled_only_for_opted_in_domains(redis_client):
+    cache = SemanticCache(redis_client, HashedNgramEmbedder(), domains={'amazon.com'})
+    assert cache.enabled_for(CACHED_TASK)
+    assert not cache.enabled_for('find the price of iphone 15 on bestbuy.com')
+    assert not cache.enabled_for('find the price of iphone 15')
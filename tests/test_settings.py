@@ -0,0 +1,73 @@
+import pytest
+
+from settings import MAX_CACHE_TTL, SettingsManager, load_settings
+
+
+def test_sources_and_precedence(tmp_path):
+    config = tmp_path / 'config.toml'
+    config.write_text('cache_ttl = 900\nplanner_max_parallel = 2\n[realtime]\nmax_steps = 40\n')
+    settings, sources = load_settings('realtime', config, environ={'CACHE_TTL': '60', 'PLANNER_SUBTASK_MAX_STEPS': '12'})
+    assert (settings.cache_ttl, settings.max_steps, settings.planner_max_parallel) == (60, 40, 2)
+    assert settings.planner_subtask_max_steps == 12
+    assert sources['cache_ttl'] == 'env'
+    assert sources['max_steps'] == f"file:{config}[realtime]"
+
+
+def test_invalid_settings_are_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        load_settings('api', environ={'CACHE_TTL': '-1'})
+    with pytest.raises(ValueError):
+        load_settings('api', environ={'PLANNER_MAX_PARALLEL': '0'})
+
+
+def test_service_knobs_are_validated():
+    settings, sources = load_settings('realtime', environ={
+        'RECORDING_FORMAT': 'WEBP', 'CHECKPOINT_BACKEND': 'disk', 'FETCH_CACHE_ENABLED': 'true', 'HEALTH_STALE_AFTER': '30'
+    })
+    assert (settings.recording_format, settings.checkpoint_backend) == ('webp', 'disk')
+    assert settings.fetch_cache_enabled and settings.health_stale_after == 30
+    assert sources['recording_format'] == 'env'
+    for name, value in (('RECORDING_FORMAT', 'avi'), ('CHECKPOINT_BACKEND', 'memcached'),
+                        ('DOMAIN_MAX_CONCURRENCY', '0'), ('SEMANTIC_CACHE_THRESHOLD', '1.5'),
+                        ('RESULT_SINK_BATCH_SIZE', 'many')):
+        with pytest.raises(ValueError):
+            load_settings('api', environ={name: value})
+
+
+def test_request_overrides():
+    settings, _ = load_settings('api', environ={})
+    overridden = settings.with_overrides({'max_steps': 10, 'cache_ttl': 60})
+    assert (overridden.max_steps, overridden.cache_ttl) == (10, 60)
+    assert overridden.planner_subtask_max_steps == settings.planner_subtask_max_steps
+
+    with pytest.raises(ValueError, match='cannot be raised'):
+        settings.with_overrides({'max_steps': settings.max_steps + 1})
+    with pytest.raises(ValueError):
+        settings.with_overrides({'cache_ttl': MAX_CACHE_TTL + 1})
+    with pytest.raises(ValueError, match='cannot be overridden'):
+        settings.with_overrides({'planner_max_parallel': 10})
+
+
+def test_reload_applies_planner_settings_and_defers_structural_ones(tmp_path, monkeypatch):
+    for name in ('PLANNER_MAX_SUBTASKS', 'HEADLESS', 'CACHE_TTL', 'RECORDING_FORMAT', 'CHECKPOINT_BACKEND'):
+        monkeypatch.delenv(name, raising=False)
+    config = tmp_path / 'config.json'
+    config.write_text('{"planner_max_subtasks": 5, "headless": true}')
+    manager = SettingsManager('api', str(config))
+
+    config.write_text('{"planner_max_subtasks": 8, "headless": false, "recording_format": "none", "checkpoint_backend": "disk"}')
+    assert manager.reload()
+    assert manager.settings.planner_max_subtasks == 8
+    assert manager.settings.recording_format == 'none'
+    assert manager.settings.headless is True
+    assert manager.pending_restart == {'headless': False, 'checkpoint_backend': 'disk'}
+
+    config.write_text('{"cache_ttl": "forever"}')
+    assert not manager.reload()
+    assert manager.settings.planner_max_subtasks == 8
+
+
+def test_request_values_recreate_task_settings():
+    settings, _ = load_settings('api', environ={})
+    task_settings = settings.with_overrides({'max_steps': 10, 'cache_ttl': 60})
+    assert settings.with_overrides(task_settings.request_values()) == task_settings
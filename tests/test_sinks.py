@@ -0,0 +1,64 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from sinks import BatchingSinkWriter, ResultSink, SQLiteSink, build_result_record, parse_sink_specs
+
+
+class FlakySink(ResultSink):
+    name = 'flaky'
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.batches = []
+
+    async def write_batch(self, records):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError('sink down')
+        self.batches.append([record['id'] for record in records])
+
+
+def test_parse_sink_specs_keeps_commas_in_targets():
+    dsn = 'postgresql://user:pw@db/results?options=-c%20a=1,b=2'
+    assert parse_sink_specs(f'ndjson:results  postgres:{dsn}\npostback:https://x.com/a,b') == [
+        ('ndjson', 'results'), ('postgres', dsn), ('postback', 'https://x.com/a,b'),
+    ]
+    assert parse_sink_specs('["sqlite:r.db", "postgres:host=db dbname=results"]') == [
+        ('sqlite', 'r.db'), ('postgres', 'host=db dbname=results'),
+    ]
+    assert parse_sink_specs('') == []
+
+
+def test_parse_sink_specs_rejects_comma_separated_lists():
+    with pytest.raises(ValueError, match='spaces'):
+        parse_sink_specs('ndjson:results,sqlite:results.db')
+    with pytest.raises(ValueError):
+        parse_sink_specs('["ndjson:results", 1]')
+
+
+def test_failed_batches_stay_spooled_and_are_delivered_in_order(tmp_path):
+    sink = FlakySink(failures=1)
+    writer = BatchingSinkWriter(sink, tmp_path / 'spool')
+    writer.submit(build_result_record('a', 'api', 't', 'r'))
+    assert not asyncio.run(writer.flush())
+    writer.submit(build_result_record('b', 'api', 't', 'r'))
+    assert writer.backlog == 1
+
+    # A new writer on the same spool, as after a restart, delivers both batches
+    restarted = BatchingSinkWriter(sink, tmp_path / 'spool')
+    assert asyncio.run(restarted.flush())
+    assert sink.batches == [['a'], ['b']]
+    assert restarted.backlog == 0
+
+
+def test_sqlite_sink_ignores_redelivered_records(tmp_path):
+    path = tmp_path / 'results.db'
+    sink = SQLiteSink(str(path))
+    record = build_result_record('run-1', 'realtime', 'task', {'price': 1}, cached=True, session='s')
+    asyncio.run(sink.write_batch([record]))
+    asyncio.run(sink.write_batch([record]))
+    with sqlite3.connect(path) as db:
+        rows = db.execute('SELECT id, result, cached, metadata FROM results').fetchall()
+    assert rows == [('run-1', '{"price": 1}', 'true', '{"session": "s"}')]